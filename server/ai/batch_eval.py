@@ -0,0 +1,287 @@
+"""NumPy 로 여러 포지션을 한 번에 평가하는 배치 평가기.
+
+셀프 플레이 데이터 생성/튜닝처럼 포지션이 수천~수만 개일 때 쓴다. evaluate_board 와
+정확히 같은 값(가치+PST 합, 킹이 없으면 ±inf)을 돌려준다.
+
+입력 형식
+  - codes: (N, 64) 정수 배열. 0 은 빈 칸, k (1..12) 는 평면 k-1 의 기물. 평면 번호는
+           color_index * 6 + type_index (bitboard.PIECE_TYPES 순서), 칸 번호는 y * 8 + x.
+           encode_* 함수들이 만드는 기본 형식이고 가장 빠르다.
+    또는 planes: (N, 12, 64) 0/1 배열 (평면별 점유). 평가 전에 codes 로 바꾼다.
+  - hands: (N, 12) 손패 기물 수 (같은 평면 번호). 손에 든 킹도 생존으로 치므로
+           첫 드롭 전 포지션을 정확히 평가하려면 필요하다. 없으면 0 으로 본다.
+  - stun, move_stack: (N, 64) 칸별 값. 확장 평가(extended=True, evaluate_board_extended 와
+                      같은 값)에만 쓰인다.
+
+만드는 방법
+  - encode_records: codec 레코드 버퍼(bytes/mmap)에서. 포지션마다 파이썬 코드가 돌지 않는다.
+    기본 평가만 필요하면 evaluate_records 가 칸 배열을 만들지 않고 레코드에서 바로 평가한다.
+  - encode_positions: Position 목록에서. 마스크/칸 배열을 한 번에 배열로 옮기고 비트 풀기는
+    numpy 로 하지만, 파이썬 객체에서 값을 꺼내는 비용(포지션당 수 us)은 남는다.
+  - encode_games: Game 목록에서 (테스트/검증용, 느림).
+
+속도 (python -m server.ai.bench batch, N = 10000): evaluate_board_scan 대비 배가 나오는 것은 입력이 이미
+배열이나 레코드 버퍼일 때다 (evaluate_batch, evaluate_records). Position 목록에서 시작하면 encode_positions 가
+대부분을 차지해 몇 배에 그친다.
+
+numpy 는 선택 의존성이다 (pip install .[batch]). 설치되어 있지 않으면 이 모듈의 함수가
+ImportError 를 낸다.
+"""
+from itertools import chain
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy 가 없는 환경
+    np = None
+
+from server.game.attacks import iter_bits
+from server.game.bitboard import PIECE_TYPES, TYPE_INDEX, COLORS, mask_index
+from server.game.pst import SQUARE_SCORES, STASIS_SCORES, HAND_SCORES
+from server.game.zobrist import STUN_MAX, STACK_MIN, STACK_MAX, HAND_MAX
+
+KING_PLANES = (mask_index('w', 'king'), mask_index('b', 'king'))
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("server.ai.batch_eval requires numpy")
+
+
+def _weights():
+    _require_numpy()
+    w = np.zeros((12, 64), dtype=np.int64)
+    for color in COLORS:
+        for ptype in PIECE_TYPES:
+            w[mask_index(color, ptype)] = SQUARE_SCORES[color][ptype]
+    return w
+
+
+def _extended_tables():
+    # (13, stun, move_stack) 표: 0 번은 빈 칸. (12, count) 손패 표.
+    stasis = np.zeros((13, STUN_MAX + 1, STACK_MAX - STACK_MIN + 1), dtype=np.int64)
+    hand = np.zeros((12, HAND_MAX + 1), dtype=np.int64)
+    for color in COLORS:
+        for ptype in PIECE_TYPES:
+            plane = mask_index(color, ptype)
+            stasis[plane + 1] = STASIS_SCORES[color][ptype]
+            hand[plane] = HAND_SCORES[color][ptype]
+    return stasis, hand
+
+
+_WEIGHTS = None
+_SQUARE_TABLE = None
+_RECORD_TABLE = None
+_EXTENDED = None
+
+# 조회표 한 칸(int32)에 점수와 킹 수를 같이 담는다: 점수 + SCORE_BIAS (음수가 되지 않게) 는 아래 22비트,
+# 백 킹은 22 번 비트부터 3비트, 흑 킹은 25 번 비트부터 3비트. 64 칸을 더해도 서로 넘치지 않는다
+# (|칸 점수| < 2**15, 색별 킹 수 <= 7).
+SCORE_BIAS = 1 << 15
+WHITE_KING_SHIFT, BLACK_KING_SHIFT = 22, 25
+KING_COUNT_MASK = 7
+
+
+def weights():
+    """(12, 64) 가중치. weights()[plane, sq] = 그 칸의 기물이 점수에 더하는 값."""
+    global _WEIGHTS, _SQUARE_TABLE, _RECORD_TABLE
+    if _WEIGHTS is None:
+        w = _weights()
+        if np.abs(w).max() >= SCORE_BIAS:
+            raise RuntimeError("square scores do not fit the packed batch table")
+        # (13 코드, 65 칸): 코드 0 은 빈 칸, 65 번째 칸은 손패 (점수 없이 킹 수만)
+        table = np.zeros((13, 65), dtype=np.int32)
+        table[1:, :64] = w
+        table += SCORE_BIAS
+        table[KING_PLANES[0] + 1] += 1 << WHITE_KING_SHIFT
+        table[KING_PLANES[1] + 1] += 1 << BLACK_KING_SHIFT
+        # 칸 sq 의 코드 c 가 [sq * 13 + c] 에 오도록 평평하게 편다
+        _SQUARE_TABLE = np.ascontiguousarray(table[:, :64].T).reshape(-1)
+        # codec 기물 레코드의 (칸 u8, 색 u8, 종류 u8) 을 칸 << 9 | 색 << 8 | 종류 로 바로 찾는 표. 손패(칸 0xFF)는 65 번째 칸.
+        squares = np.minimum(np.arange(256), 64)
+        record = np.zeros((256, 2, 256), dtype=np.int32)
+        for color in range(2):
+            record[:, color, :6] = table[color * 6 + 1:color * 6 + 7, squares].T
+        _RECORD_TABLE = record.reshape(-1)
+        _WEIGHTS = w
+    return _WEIGHTS
+
+
+def _finish(packed, squares, hands=None):
+    # 더한 조회값 -> 점수 (킹이 없으면 ±inf). squares 는 포지션마다 더한 조회 수 (SCORE_BIAS 를 뺀다).
+    scores = (packed & ((1 << WHITE_KING_SHIFT) - 1)) - squares * SCORE_BIAS
+    white = packed >> WHITE_KING_SHIFT & KING_COUNT_MASK
+    black = packed >> BLACK_KING_SHIFT & KING_COUNT_MASK
+    if hands is not None:
+        hands = np.asarray(hands)
+        white = white + hands[:, KING_PLANES[0]]
+        black = black + hands[:, KING_PLANES[1]]
+    return scores, white, black
+
+
+def _scores(scores, white, black):
+    result = scores.astype(np.float64)
+    result[black == 0] = np.inf         # 흑 킹이 없으면 백 승
+    result[white == 0] = -np.inf        # 백 킹이 없으면 백 패 (evaluate_board 와 같은 우선순위)
+    return result
+
+
+_SQUARE_OFFSETS = None if np is None else (np.arange(64) * 13).astype(np.uint16)
+
+
+def planes_to_codes(planes):
+    """(N, 12, 64) 0/1 평면 -> (N, 64) uint8 코드."""
+    _require_numpy()
+    planes = np.asarray(planes, dtype=np.uint8)
+    codes = np.zeros((planes.shape[0], 64), dtype=np.uint8)
+    for plane in range(12):
+        codes += planes[:, plane, :] * np.uint8(plane + 1)
+    return codes
+
+
+def _hand_counts(keys, n, width):
+    # (포지션 번호 * width + 평면 번호) 들 -> (N, width) 개수
+    return np.bincount(keys.ravel(), minlength=n * width).reshape(n, width).astype(np.int16)
+
+
+def encode_positions(positions, extended=False):
+    """Position(비트보드) 목록 -> (codes, hands, stun, move_stack). stun/move_stack 은 extended 일 때만
+    만들고 아니면 None (칸 배열 두 개를 옮기는 비용이 나머지 전부보다 크다).
+    마스크는 한 번에 배열로 옮기고, 비트 풀기와 코드 계산은 numpy 로 한다."""
+    _require_numpy()
+    n = len(positions)
+    # 리틀 엔디언으로 고정해야 바이트 j 의 비트 i 가 칸 j * 8 + i 가 된다
+    masks = np.fromiter(chain.from_iterable(p.masks for p in positions), dtype='<u8', count=n * 12)
+    codes = planes_to_codes(np.unpackbits(masks.view(np.uint8).reshape(n, 12, 8), axis=2, bitorder='little'))
+    # 손패: 포지션마다 map 으로 pid -> 종류를 한 번에 옮기고, 종류 -> 평면 번호는 끝에 한꺼번에 바꾼다
+    keys = []
+    for color, base in (('w', 0), ('b', 6)):
+        hand_types, lengths = [], []
+        for p in positions:
+            hand = p.hands[color]
+            hand_types.extend(map(p.types.__getitem__, hand))
+            lengths.append(len(hand))
+        rows = np.repeat(np.arange(base, n * 12, 12, dtype=np.intp), lengths)
+        keys.append(rows + np.fromiter(map(TYPE_INDEX.__getitem__, hand_types), dtype=np.intp, count=len(rows)))
+    hands = _hand_counts(np.concatenate(keys), n, 12)
+    stun = move_stack = None
+    if extended:
+        stun = np.fromiter(chain.from_iterable(p.stun for p in positions), dtype=np.int16,
+                           count=n * 64).reshape(n, 64)
+        move_stack = np.fromiter(chain.from_iterable(p.move_stack for p in positions), dtype=np.int16,
+                                 count=n * 64).reshape(n, 64)
+    return codes, hands, stun, move_stack
+
+
+def _record_dtype(size):
+    dtype = np.dtype([('magic', 'S2'), ('version', 'u1'), ('turn', 'u1'), ('flags', 'u1'), ('reserved', 'V3'),
+                      ('board', 'u1', 64),
+                      ('pieces', [('type', 'u1'), ('color', 'u1'), ('sq', 'u1'), ('slot', 'u1'),
+                                  ('move_stack', '<i2'), ('stun', '<u2')], 32)])
+    if dtype.itemsize != size:
+        raise RuntimeError("batch_eval record dtype does not match the codec layout")
+    return dtype
+
+
+def encode_records(buf, extended=False):
+    """server.game.codec 레코드를 이어 붙인 버퍼(bytes, bytearray, mmap) -> (codes, hands, stun, move_stack).
+    구조체 dtype 으로 버퍼를 그대로 읽고 기물 레코드를 칸으로 흩뿌리므로 포지션마다 도는 파이썬 코드가 없다.
+    stun/move_stack 은 extended 일 때만 만든다."""
+    _require_numpy()
+    from server.game.codec import MAGIC, VERSION, POSITION_SIZE, NONE
+    records = np.frombuffer(buf, dtype=_record_dtype(POSITION_SIZE))
+    if len(records) and ((records['magic'] != MAGIC).any() or (records['version'] != VERSION).any()):
+        raise ValueError("not a position record")
+    n = len(records)
+    pieces = records['pieces']
+    piece_codes = pieces['color'] * 6 + pieces['type'] + 1                 # (N, 32) 1..12
+    # 손에 든 기물(칸이 NONE)은 65 번째 열로 보내고 버린다
+    index = (np.minimum(pieces['sq'], 64) + (np.arange(n, dtype=np.intp) * 65)[:, None]).ravel()
+
+    def scatter(values, dtype):
+        out = np.zeros((n, 65), dtype=dtype)
+        out.reshape(-1)[index] = values.ravel()
+        return out[:, :64]
+
+    codes = scatter(piece_codes, np.uint8)
+    in_hand = np.where(pieces['sq'] == NONE, piece_codes, 0).astype(np.intp)
+    hands = _hand_counts(in_hand + (np.arange(n, dtype=np.intp) * 13)[:, None], n, 13)[:, 1:]
+    stun = move_stack = None
+    if extended:
+        stun = scatter(pieces['stun'], np.int16)
+        move_stack = scatter(pieces['move_stack'], np.int16)
+    return codes, hands, stun, move_stack
+
+
+def encode_games(games):
+    """Game 목록 -> (codes, hands, stun, move_stack). 기물을 하나씩 보므로 느리다 (검증용)."""
+    _require_numpy()
+    n = len(games)
+    codes = np.zeros((n, 64), dtype=np.uint8)
+    hands = np.zeros((n, 12), dtype=np.int16)
+    stun = np.zeros((n, 64), dtype=np.int16)
+    move_stack = np.zeros((n, 64), dtype=np.int16)
+    for i, game in enumerate(games):
+        for color in COLORS:
+            for sq in iter_bits(game.occupied[color]):
+                p = game.pieces[game.board[sq >> 3][sq & 7]]
+                codes[i, sq] = mask_index(p.color, p.type) + 1
+                stun[i, sq] = p.stun
+                move_stack[i, sq] = p.move_stack
+            for pid in game.hands[color]:
+                hands[i, mask_index(color, game.pieces[pid].type)] += 1
+    return codes, hands, stun, move_stack
+
+
+def evaluate_batch(codes, hands=None, stun=None, move_stack=None, extended=False):
+    """N 개 포지션의 점수 (float64, 백 기준). evaluate_board 와 같은 값.
+    codes 는 (N, 64) 코드나 (N, 12, 64) 평면. extended 이면 evaluate_board_extended 와 같은 값
+    (stun, move_stack 필요)."""
+    global _EXTENDED
+    _require_numpy()
+    weights()
+    codes = np.asarray(codes)
+    if codes.ndim == 3:
+        codes = planes_to_codes(codes)
+    # 칸마다 [sq * 13 + 코드] 를 모아 더한다 (포지션당 64 번 조회). 점수와 킹 수가 한 번에 나온다.
+    # 인덱스는 표 안에 있으므로 mode='clip' 으로 범위 검사를 건너뛴다.
+    looked_up = np.take(_SQUARE_TABLE, codes.astype(np.uint16) + _SQUARE_OFFSETS, mode='clip')
+    packed = looked_up.sum(axis=1, dtype=np.int32)
+    scores, white, black = _finish(packed, 64, hands)
+    if extended:
+        if stun is None or move_stack is None:
+            raise ValueError("extended evaluation needs stun and move_stack")
+        if _EXTENDED is None:
+            _EXTENDED = _extended_tables()
+        stasis, hand = _EXTENDED
+        stun = np.clip(np.asarray(stun), 0, STUN_MAX).astype(np.intp)
+        move_stack = np.clip(np.asarray(move_stack), STACK_MIN, STACK_MAX).astype(np.intp) - STACK_MIN
+        scores = scores + stasis[codes.astype(np.intp), stun, move_stack].sum(axis=1)
+        if hands is not None:
+            counts = np.clip(np.asarray(hands), 0, HAND_MAX).astype(np.intp)
+            scores = scores + hand[np.arange(12), counts].sum(axis=1)
+    return _scores(scores, white, black)
+
+
+def evaluate_records(buf, extended=False):
+    """server.game.codec 레코드 버퍼 -> 점수. evaluate_batch(*encode_records(buf)[:2]) 와 같은 값.
+    기본 평가는 칸 배열을 만들지 않고 기물 레코드 32 개를 바로 조회표에 넣어 더한다 (손패 킹도 함께 센다).
+    extended 이면 encode_records 로 칸 배열을 만들어 evaluate_batch 로 넘긴다."""
+    _require_numpy()
+    if extended:
+        codes, hands, stun, move_stack = encode_records(buf, extended=True)
+        return evaluate_batch(codes, hands, stun, move_stack, extended=True)
+    from server.game.codec import MAGIC, VERSION, POSITION_SIZE, PIECES_OFFSET, PIECE
+    weights()
+    records = np.frombuffer(buf, dtype=_record_dtype(POSITION_SIZE))
+    if len(records) and ((records['magic'] != MAGIC).any() or (records['version'] != VERSION).any()):
+        raise ValueError("not a position record")
+    n = len(records)
+    # 기물 레코드의 (종류, 색) u16 과 칸 u8 을 복사 없이 보는 뷰
+    type_color = np.ndarray((n, 32), dtype='<u2', buffer=records, offset=PIECES_OFFSET,
+                            strides=(POSITION_SIZE, PIECE.size))
+    squares = np.ndarray((n, 32), dtype=np.uint8, buffer=records, offset=PIECES_OFFSET + 2,
+                         strides=(POSITION_SIZE, PIECE.size))
+    keys = np.left_shift(squares, 9, dtype=np.uint32)
+    np.bitwise_or(keys, type_color, out=keys)
+    packed = np.take(_RECORD_TABLE, keys, mode='clip').sum(axis=1, dtype=np.int32)
+    return _scores(*_finish(packed, 32))
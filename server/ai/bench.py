@@ -0,0 +1,231 @@
+"""AI 마이크로 벤치마크.
+
+    python -m server.ai.bench batch [-n 10000]
+    python -m server.ai.bench leaf [-n 10000]
+    python -m server.ai.bench ordering [-n 10] [--depth 3]
+    python -m server.ai.bench memory [-n 1000]
+"""
+import argparse
+import random
+import time
+
+from server.game.core import Game, Piece
+from server.game.ai_adapter import get_all_actions, apply_action
+
+
+def _playout(game, rng, plies):
+    # 무작위 수를 최대 plies 번 두며 수마다 game 을 낸다 (tests/helpers.py 의 random_playout 기본 동작과 같다)
+    for _ in range(plies):
+        actions = get_all_actions(game, game.turn)
+        if not actions:
+            return
+        ok, msg = apply_action(game, rng.choice(actions))
+        yield game
+        if msg == "win":
+            return
+        game.end_turn()
+
+
+def sample_games(n, seed=0, max_plies=60):
+    """무작위 대국에서 포지션 n 개를 뽑는다 (초반~중반이 고르게 섞이도록 대국마다 길이를 다르게)."""
+    rng = random.Random(seed)
+    games = []
+    while len(games) < n:
+        for game in _playout(Game(), rng, rng.randrange(1, max_plies)):
+            games.append(game.to_position().to_game(game_id=game.id))
+            if len(games) >= n:
+                break
+    return games
+
+
+def _per_call(fn, items):
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - start) / len(items)
+
+
+def bench_batch(n=10000, seed=0):
+    """배치 평가기: 평가만, 그리고 입력 만들기(Position 목록 / codec 레코드 버퍼)까지 포함한 비용."""
+    from server.ai.batch_eval import encode_games, encode_positions, encode_records, evaluate_batch, evaluate_records
+    from server.ai.model import evaluate_board, evaluate_board_scan
+    from server.game.codec import encode_game
+
+    games = sample_games(n, seed)
+    positions = [g.to_position() for g in games]
+    records = b''.join(encode_game(g) for g in games)
+    expected = [evaluate_board(g) for g in games]
+
+    scan = _per_call(evaluate_board_scan, games)
+    incremental = _per_call(evaluate_board, games)
+
+    def per_batch(fn, *args):
+        best = float('inf')
+        for _ in range(5):
+            start = time.perf_counter()
+            result = fn(*args)
+            best = min(best, time.perf_counter() - start)
+        return result, best / n
+
+    (codes, hands, _, _), encode = per_batch(encode_positions, positions)
+    (record_codes, record_hands, _, _), decode = per_batch(encode_records, records)
+    scores, batch = per_batch(evaluate_batch, codes, hands)
+    record_scores, fused = per_batch(evaluate_records, records)
+
+    assert list(scores) == expected, "batch scores disagree with evaluate_board"
+    assert list(evaluate_batch(record_codes, record_hands)) == expected
+    assert list(record_scores) == expected
+    assert list(evaluate_batch(*encode_games(games[:100])[:2])) == expected[:100]
+
+    print(f"positions: {n}")
+    print(f"evaluate_board_scan : {scan * 1e6:8.2f} us/pos")
+    print(f"evaluate_board      : {incremental * 1e6:8.2f} us/pos  (Game 에 증분 점수가 있을 때)")
+    print(f"evaluate_batch      : {batch * 1e6:8.2f} us/pos  ({scan / batch:.0f}x vs scan, 이미 만든 codes/hands)")
+    print(f"evaluate_records    : {fused * 1e6:8.2f} us/pos  ({scan / fused:.0f}x vs scan, 레코드 버퍼에서 끝까지)")
+    print(f"encode_positions    : {encode * 1e6:8.2f} us/pos  "
+          f"(+ evaluate_batch: {scan / (encode + batch):.0f}x vs scan, Position 목록에서 끝까지)")
+    print(f"encode_records      : {decode * 1e6:8.2f} us/pos  "
+          f"(+ evaluate_batch: {scan / (decode + batch):.0f}x vs scan)")
+
+
+def bench_leaf(n=10000, seed=0):
+    """말단 평가 한 번의 비용: 기본 평가 vs 확장 평가 (증분/전체 스캔).
+    확장 항은 make/unmake 안에서 갱신되므로 그 비용도 함께 잰다."""
+    from server.ai.model import evaluate_board, evaluate_board_extended, evaluate_board_extended_scan
+
+    games = sample_games(n, seed)
+    assert all(evaluate_board_extended(g) == evaluate_board_extended_scan(g) for g in games)
+
+    base = _per_call(evaluate_board, games)
+    extended = _per_call(evaluate_board_extended, games)
+    scan = _per_call(evaluate_board_extended_scan, games)
+
+    pairs = []
+    for g in games[:min(n, 2000)]:
+        actions = get_all_actions(g, g.turn)
+        if actions:
+            pairs.append((g, actions[0]))
+
+    def make_unmake(pair):
+        undo = pair[0].make_action(pair[1])
+        if undo is not None:
+            pair[0].unmake_action(undo)
+
+    print(f"positions: {n}")
+    print(f"evaluate_board               : {base * 1e6:8.3f} us/leaf")
+    print(f"evaluate_board_extended      : {extended * 1e6:8.3f} us/leaf  (+{(extended - base) * 1e6:.3f} us)")
+    print(f"evaluate_board_extended_scan : {scan * 1e6:8.3f} us/leaf")
+    print(f"make_action + unmake_action  : {_per_call(make_unmake, pairs) * 1e6:8.3f} us/action  "
+          f"(확장 항 증분 갱신 포함)")
+
+
+def bench_ordering(n=10, seed=0, depth=3):
+    """킬러/history 정렬 유무에 따른 고정 깊이 탐색의 노드 수와 컷오프 통계."""
+    from server.ai.model import negamax, SearchContext
+
+    games = sample_games(n, seed, max_plies=40)
+    inf = float('inf')
+    results = {}
+    for history in (False, True):
+        nodes = cutoffs = first = 0
+        chosen = []
+        start = time.perf_counter()
+        for game in games:
+            ctx = SearchContext(history=history)
+            chosen.append(negamax(game, depth, -inf, inf, game.turn, ctx=ctx))
+            nodes += ctx.nodes
+            cutoffs += ctx.cutoffs
+            first += ctx.first_cutoffs
+        elapsed = time.perf_counter() - start
+        results[history] = chosen
+        rate = first / cutoffs if cutoffs else 0.0
+        print(f"history={history!s:5}: {nodes:9d} nodes  {cutoffs:8d} cutoffs  "
+              f"first-move cutoff {rate:6.1%}  {elapsed:6.2f} s")
+    assert results[False] == results[True], "move ordering changed the search result"
+
+
+class _DictObject:
+    """필드를 인스턴스 __dict__ 에 두는 객체. Piece/Game 에 __slots__ 를 쓰기 전의 배치 (memory 비교 기준)."""
+
+
+def _dict_game(game, copy_piece):
+    # game 과 같은 상태를 __dict__ 기반 객체로 새로 만든다 (기물/보드/손패도 새로). history 는 비운다.
+    new = _DictObject()
+    for name in Game.__slots__:
+        setattr(new, name, getattr(game, name))
+    new.pieces = {pid: copy_piece(p) for pid, p in game.pieces.items()}
+    new.board = [row[:] for row in game.board]
+    new.hands = {'w': game.hands['w'][:], 'b': game.hands['b'][:]}
+    new.history = []
+    new.first_turn_done = game.first_turn_done.copy()
+    new.action_done = game.action_done.copy()
+    new.occupied = game.occupied.copy()
+    new.king_count = game.king_count.copy()
+    new.legal_cache = (None, {})
+    return new
+
+
+def _dict_piece(p):
+    new = _DictObject()
+    for name in Piece.__slots__:
+        setattr(new, name, getattr(p, name))
+    return new
+
+
+def bench_memory(n=1000, seed=0):
+    """게임 하나와 복제 하나가 새로 잡는 메모리(tracemalloc)와 복제 시간.
+    기준(dict): 같은 상태를 __dict__ 기반 객체로 만들고, 복제는 __slots__ 이전 fast_clone 처럼 copy.copy 로 한다."""
+    import copy
+    import tracemalloc
+    from server.game.store import estimate_bytes
+
+    games = sample_games(n, seed)
+    dict_games = [_dict_game(g, _dict_piece) for g in games]
+
+    def allocated(make, items):
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        kept = [make(g) for g in items]
+        size = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        del kept
+        return size / n
+
+    rows = [
+        ("per game", allocated(lambda g: _dict_game(g, _dict_piece), games),
+         allocated(lambda g: g.to_position().to_game(game_id=g.id), games)),
+        ("per clone", allocated(lambda g: _dict_game(g, copy.copy), dict_games),
+         allocated(lambda g: g.fast_clone(), games)),
+    ]
+    dict_clone = _per_call(lambda g: _dict_game(g, copy.copy), dict_games)
+    clone = _per_call(lambda g: g.fast_clone(), games)
+    estimate = sum(map(estimate_bytes, games)) / n
+    dict_estimate = sum(map(estimate_bytes, dict_games)) / n
+
+    print(f"positions: {n}")
+    print(f"{'':10s}  {'dict':>10s}  {'slots':>10s}")
+    for name, before, after in rows:
+        print(f"{name:10s}  {before / 1024:6.2f} KiB  {after / 1024:6.2f} KiB")
+    print(f"{'estimate':10s}  {dict_estimate / 1024:6.2f} KiB  {estimate / 1024:6.2f} KiB  (estimate_bytes)")
+    print(f"{'clone':10s}  {dict_clone * 1e6:7.2f} us  {clone * 1e6:7.2f} us")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('bench', choices=['batch', 'leaf', 'ordering', 'memory'])
+    parser.add_argument('-n', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--depth', type=int, default=3)
+    args = parser.parse_args(argv)
+    if args.bench == 'batch':
+        bench_batch(args.n, args.seed)
+    elif args.bench == 'leaf':
+        bench_leaf(args.n, args.seed)
+    elif args.bench == 'ordering':
+        bench_ordering(args.n, args.seed, args.depth)
+    elif args.bench == 'memory':
+        bench_memory(args.n, args.seed)
+
+
+if __name__ == '__main__':
+    main()
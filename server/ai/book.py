@@ -0,0 +1,212 @@
+"""오프닝 북.
+
+첫 킹 드롭과 초반 드롭은 분기 수가 가장 많아 매 게임 처음부터 탐색하기 비싸다. 오프라인에서
+미리 탐색한 (포지션 키 -> 점수가 매겨진 수들) 을 파일로 저장해 두고, mmap 으로 열어 바로 찾는다.
+
+파일 형식 (리틀 엔디언)
+  헤더 16바이트: b'SCBK' | 버전 u32 | 레코드 수 u32 | 예약 4바이트
+  레코드 16바이트: 포지션 키 u64 (Game.hash) | action 코드 u16 (ai_adapter.encode_action) | 점수 i32 | 패딩
+레코드는 (키, 점수 내림차순) 으로 정렬되어 있어 키로 이진 탐색한다. 점수는 둘 차례 기준이다.
+
+    python -m server.ai.book build server/data/opening_book.bin --plies 2 --depth 3
+    python -m server.ai.book info server/data/opening_book.bin
+"""
+import argparse
+import math
+import mmap
+import os
+import struct
+import time
+
+from server.ai.model import negamax, SearchContext
+from server.ai.tt import TranspositionTable
+from server.game.core import Game
+from server.game.ai_adapter import get_all_actions, encode_action, decode_action
+
+MAGIC = b'SCBK'
+VERSION = 2   # 2: zobrist 키가 손패 stun 을 담는다
+HEADER = struct.Struct('<4sII4x')
+RECORD = struct.Struct('<QHi2x')
+SCORE_MAX = 2 ** 31 - 1
+
+
+def clamp_score(value):
+    if math.isinf(value):
+        return SCORE_MAX if value > 0 else -SCORE_MAX
+    return max(-SCORE_MAX, min(SCORE_MAX, int(value)))
+
+
+class OpeningBook:
+    """읽기 전용 북. 파일을 mmap 하므로 여러 프로세스가 열어도 페이지 캐시를 공유한다."""
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < HEADER.size:
+            raise ValueError(f"not an opening book: {path}")
+        magic, version, count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"not an opening book: {path}")
+        if HEADER.size + count * RECORD.size > len(self._mm):
+            raise ValueError(f"truncated opening book: {path}")
+        self.count = count
+        self.probes = 0
+        self.hits = 0
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self._mm.close()
+
+    def _record(self, i):
+        return RECORD.unpack_from(self._mm, HEADER.size + i * RECORD.size)
+
+    def records(self):
+        for i in range(self.count):
+            yield self._record(i)
+
+    def probe(self, key):
+        """[(action 코드, 점수)] 점수 높은 순. 없으면 []."""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            if self._record(mid)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        found = []
+        for i in range(lo, self.count):
+            k, code, score = self._record(i)
+            if k != key:
+                break
+            found.append((code, score))
+        return found
+
+    def choose(self, game, excluded_actions=None):
+        """북에 있는 수 중 지금 둘 수 있는 점수가 가장 높은 (action, 점수). 없으면 None."""
+        self.probes += 1
+        for code, score in self.probe(game.hash):
+            action = decode_action(game, game.turn, code)
+            if action is not None and not (excluded_actions and action in excluded_actions):
+                self.hits += 1
+                return action, score
+        return None
+
+
+def write_book(path, records):
+    """(키, 코드, 점수) 들을 북 파일로 쓴다. 같은 (키, 코드) 는 나중 것이 이긴다.
+    임시 파일에 쓴 뒤 교체하므로, 이미 열려 있는 북(mmap)은 이전 내용을 계속 본다."""
+    table = {}
+    for key, code, score in records:
+        table[(key, code)] = clamp_score(score)
+    rows = sorted(((key, -score, code) for (key, code), score in table.items()))
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(rows)))
+        for key, neg_score, code in rows:
+            f.write(RECORD.pack(key, code, -neg_score))
+    os.replace(tmp, path)
+    return len(rows)
+
+
+def load_book(path):
+    """파일이 없으면 None."""
+    if not path or not os.path.exists(path):
+        return None
+    return OpeningBook(path)
+
+
+# ---- 빌더 ----
+
+def score_actions(game, depth, keep=None, tt=None, drop_width=None):
+    """루트의 수를 하나씩 (depth - 1) 깊이로 전부 탐색해 점수 높은 순 [(action, 점수)] 를 돌려준다.
+    알파베타 창을 좁히지 않으므로 모든 수의 점수가 정확하다 (오프라인 전용)."""
+    inf = float('inf')
+    scored = []
+    for action in get_all_actions(game, game.turn):
+        undo = game.make_action(action)
+        if undo is None:
+            continue
+        try:
+            value, _ = negamax(game, depth - 1, -inf, inf, game.turn, tt=tt, ply=1,
+                               ctx=SearchContext(drop_width=drop_width))
+        finally:
+            game.unmake_action(undo)
+        scored.append((-value, action))
+    scored.sort(key=lambda item: -item[0])
+    return [(action, value) for value, action in scored[:keep]]
+
+
+def build_book(plies=2, depth=3, keep=3, replies=None, color='b', drop_width=None, progress=None):
+    """초기 포지션부터 plies 수 동안 나올 수 있는 포지션을 탐색해 레코드 목록을 만든다.
+    color(AI) 차례에서는 점수 상위 keep 개 수로만 다음 포지션을 펼치고, 상대 차례에서는 상위
+    replies 개(None 이면 모든 수)로 펼친다. 모든 포지션에 상위 keep 개 수를 기록한다."""
+    tt = TranspositionTable(64)
+    records = []
+    seen = set()
+    frontier = [Game()]
+    for ply in range(plies):
+        next_frontier = []
+        for game in frontier:
+            if game.hash in seen:
+                continue
+            seen.add(game.hash)
+            scored = score_actions(game, depth, tt=tt, drop_width=drop_width)
+            records.extend((game.hash, encode_action(game, a), v) for a, v in scored[:keep])
+            width = keep if game.turn == color else replies
+            if ply + 1 < plies:
+                for action, value in scored[:width]:
+                    if math.isinf(value):
+                        continue
+                    child = game.to_position().to_game(game_id=game.id)
+                    if child.make_action(action) is not None:
+                        next_frontier.append(child)
+            if progress is not None:
+                progress(ply, len(seen), len(records))
+        frontier = next_frontier
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="opening book builder")
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build')
+    build.add_argument('path')
+    build.add_argument('--plies', type=int, default=2)
+    build.add_argument('--depth', type=int, default=3)
+    build.add_argument('--keep', type=int, default=3)
+    build.add_argument('--replies', type=int, default=None)
+    build.add_argument('--color', choices=['w', 'b'], default='b')
+    build.add_argument('--drop-width', type=int, default=None)
+    build.add_argument('--merge', action='store_true', help="기존 파일의 레코드도 유지")
+    info = sub.add_parser('info')
+    info.add_argument('path')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        start = time.perf_counter()
+
+        def progress(ply, positions, records):
+            if positions % 16 == 0:
+                print(f"ply {ply}: {positions} positions, {records} records", flush=True)
+
+        records = build_book(args.plies, args.depth, args.keep, args.replies, args.color, args.drop_width, progress)
+        if args.merge:
+            old = load_book(args.path)
+            if old is not None:
+                records = list(old.records()) + records
+                old.close()
+        count = write_book(args.path, records)
+        print(f"wrote {count} records to {args.path} in {time.perf_counter() - start:.1f}s")
+    else:
+        book = OpeningBook(args.path)
+        keys = len({key for key, _, _ in book.records()})
+        print(f"{args.path}: {len(book)} records, {keys} positions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,295 @@
+"""엔드게임 결과 캐시.
+
+보드 위 기물이 적은 포지션(is_endgame)은 여러 게임에서 반복해서 나온다. 잡힌 기물은 잡은 쪽 손으로
+가므로 32개 기물은 항상 보드나 손패 어딘가에 있고, 그래서 '손패가 빈 적은 기물' 포지션은 생기지 않는다.
+대신 보드 위 기물 수만 본다 (손패는 키에 들어 있으므로 구분된다). 그 탐색 결과 (깊이, 경계 종류, 점수, 최선 수) 를 mmap 한 파일에 저장해 두고 재시작/다른 워커 프로세스에서도
+치환표처럼 쓴다. 점수는 평가 설정(extended_eval, drop_width, quiescence)에 따라 달라지므로 파일을 만든
+설정을 헤더에 적어 두고, 설정이 다른 탐색에는 그 파일을 쓰지 않는다.
+
+파일 형식 (리틀 엔디언)
+  헤더 24바이트: b'SCEG' | 버전 u32 | 버킷 수 u32 | 버킷당 슬롯 수 u32
+                | extended_eval u8 | quiescence u8 | drop_width u16 (0 은 제한 없음) | 예약 4바이트
+  슬롯 16바이트: (키 ^ data) u64 | data u64
+    data = 점수 i32 | action 코드 u16 << 32 | 깊이 u8 << 48 | 경계 종류 u8 << 56
+잠금 없이 여러 프로세스가 같이 쓴다. 읽을 때 (키 ^ data) ^ data == 키 인지 확인하므로, 쓰는 도중인
+(찢어진) 슬롯은 그냥 없는 것으로 보인다. 버킷 안의 슬롯은 최근에 저장한 순서로 유지하고 가득 차면
+맨 뒤를 버린다. probe 는 파일에 쓰지 않는다 (탐색 중 읽기마다 공유 페이지를 더럽히거나 다른 프로세스와
+경쟁하지 않도록). 파일 크기가 곧 용량 상한이다.
+
+    python -m server.ai.endgame warm /var/tmp/stasis_endgame.bin --games 200 --depth 4
+    python -m server.ai.endgame info /var/tmp/stasis_endgame.bin
+    AI_ENDGAME=/var/tmp/stasis_endgame.bin python -m server.app      # 서버에서 켜기 (기본은 꺼짐)
+"""
+import argparse
+import mmap
+import os
+import random
+import struct
+import time
+
+from server.ai.book import clamp_score, SCORE_MAX
+from server.game.ai_adapter import encode_action, decode_action
+
+MAGIC = b'SCEG'
+VERSION = 3   # 3: zobrist 키가 손패 stun 을 담는다
+HEADER = struct.Struct('<4sIIIBBH4x')
+SLOT = struct.Struct('<QQ')
+WAYS = 4
+ENDGAME_MAX_PIECES = 8     # 양쪽 킹이 나온 뒤 보드 위 기물이 이 수 이하일 때만 캐시
+
+
+def is_endgame(game):
+    if not (game.first_turn_done['w'] and game.first_turn_done['b']):
+        return False
+    return bin(game.occupied['w'] | game.occupied['b']).count('1') <= ENDGAME_MAX_PIECES
+
+
+def _pack(depth, flag, value, code):
+    return (clamp_score(value) & 0xFFFFFFFF) | code << 32 | min(depth, 255) << 48 | flag << 56
+
+
+def _unpack(data):
+    score = data & 0xFFFFFFFF
+    if score >= 1 << 31:
+        score -= 1 << 32
+    value = float('inf') if score == SCORE_MAX else (-float('inf') if score == -SCORE_MAX else score)
+    return data >> 48 & 0xFF, data >> 56 & 0xFF, value, data >> 32 & 0xFFFF
+
+
+def eval_settings(extended_eval=False, drop_width=None, quiescence=True):
+    """캐시 점수를 만든 평가 설정 (extended_eval, drop_width, quiescence). 같은 설정이면 같은 값."""
+    return bool(extended_eval), drop_width or None, bool(quiescence)
+
+
+def _create(path, buckets, settings):
+    extended_eval, drop_width, quiescence = settings
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, buckets, WAYS, extended_eval, quiescence, drop_width or 0))
+        f.truncate(HEADER.size + buckets * WAYS * SLOT.size)
+    os.replace(tmp, path)
+
+
+def read_settings(path):
+    """파일 헤더의 평가 설정. 엔드게임 캐시 파일이 아니면 ValueError."""
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError(f"not an endgame cache: {path}")
+    magic, version, _, _, extended_eval, quiescence, drop_width = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"not an endgame cache: {path}")
+    return eval_settings(extended_eval, drop_width, quiescence)
+
+
+class EndgameCache:
+    """파일이 없으면 size_mb 크기로 만들고, 있으면 그 파일의 크기(버킷 수)를 그대로 쓴다.
+    기존 파일의 평가 설정이 주어진 설정과 다르면 ValueError (reset 이면 지우고 새로 만든다)."""
+    def __init__(self, path, size_mb=64, buckets=None, extended_eval=False, drop_width=None, quiescence=True,
+                 reset=False):
+        self.path = path
+        self.settings = eval_settings(extended_eval, drop_width, quiescence)
+        if os.path.exists(path):
+            try:
+                found = read_settings(path)
+            except ValueError:
+                if not reset:
+                    raise
+                found = None
+            if found != self.settings:
+                if not reset:
+                    raise ValueError(f"endgame cache {path} was built with (extended_eval, drop_width, quiescence)"
+                                     f"={found}, not {self.settings}")
+                os.remove(path)
+        if not os.path.exists(path):
+            if buckets is None:
+                slots = max(WAYS, int(size_mb * 1024 * 1024) // SLOT.size)
+                buckets = 1
+                while buckets * 2 * WAYS <= slots:
+                    buckets *= 2
+            _create(path, buckets, self.settings)
+        with open(path, 'r+b') as f:
+            self._mm = mmap.mmap(f.fileno(), 0)
+        magic, version, buckets, ways = HEADER.unpack_from(self._mm, 0)[:4]
+        if magic != MAGIC or version != VERSION or HEADER.size + buckets * ways * SLOT.size > len(self._mm):
+            self._mm.close()
+            raise ValueError(f"not an endgame cache: {path}")
+        self.buckets = buckets
+        self.ways = ways
+        self.mask = buckets - 1
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def matches(self, extended_eval=False, drop_width=None, quiescence=True):
+        """이 설정의 탐색 결과를 담는 캐시인지."""
+        return self.settings == eval_settings(extended_eval, drop_width, quiescence)
+
+    def __len__(self):
+        return self.buckets * self.ways
+
+    def close(self):
+        self._mm.flush()
+        self._mm.close()
+
+    def flush(self):
+        self._mm.flush()
+
+    def covers(self, game):
+        return is_endgame(game)
+
+    def _bucket(self, key):
+        """(버킷 첫 슬롯 오프셋, [(키, data)] 슬롯 순서대로). 빈 슬롯이나 찢어진 슬롯은 키 None."""
+        base = HEADER.size + (key & self.mask) * self.ways * SLOT.size
+        slots = []
+        for i in range(self.ways):
+            check, data = SLOT.unpack_from(self._mm, base + i * SLOT.size)
+            slots.append((check ^ data if data else None, data))
+        return base, slots
+
+    def _write(self, base, slots):
+        for i, (key, data) in enumerate(slots):
+            SLOT.pack_into(self._mm, base + i * SLOT.size, key ^ data if data else 0, data)
+
+    def probe_raw(self, key):
+        """(깊이, 경계 종류, 값, action 코드) 또는 None. 읽기만 한다."""
+        self.probes += 1
+        base = HEADER.size + (key & self.mask) * self.ways * SLOT.size
+        for i in range(self.ways):
+            check, data = SLOT.unpack_from(self._mm, base + i * SLOT.size)
+            if data and check ^ data == key:
+                self.hits += 1
+                return _unpack(data)
+        return None
+
+    def store_raw(self, key, depth, flag, value, code):
+        self.stores += 1
+        base, slots = self._bucket(key)
+        kept = []
+        for k, data in slots:
+            if k == key:
+                if _unpack(data)[0] > depth:
+                    return      # 더 깊은 결과가 이미 있음
+            elif k is not None:
+                kept.append((k, data))
+        slots = [(key, _pack(depth, flag, value, code))] + kept
+        slots += [(0, 0)] * (self.ways - len(slots))
+        self._write(base, slots[:self.ways])
+
+    def probe(self, game):
+        """치환표 probe 와 같은 (깊이, 경계 종류, 값, action) 또는 None. 수는 지금 포지션의 pid 로 풀어 준다."""
+        entry = self.probe_raw(game.hash)
+        if entry is None:
+            return None
+        depth, flag, value, code = entry
+        return depth, flag, value, decode_action(game, game.turn, code)
+
+    def store(self, game, depth, flag, value, action):
+        self.store_raw(game.hash, depth, flag, value, encode_action(game, action))
+
+    def usage(self):
+        used = 0
+        for i in range(self.buckets * self.ways):
+            check, data = SLOT.unpack_from(self._mm, HEADER.size + i * SLOT.size)
+            used += data != 0
+        return used / (self.buckets * self.ways)
+
+
+def load_endgame_cache(path, size_mb=64, extended_eval=False, drop_width=None, quiescence=True):
+    """경로가 비어 있으면 None. 파일이 없으면 새로 만든다.
+    파일이 다른 평가 설정으로 만들어졌으면 캐시 없이 탐색하도록 None (파일은 그대로 둔다)."""
+    if not path:
+        return None
+    try:
+        return EndgameCache(path, size_mb, extended_eval=extended_eval, drop_width=drop_width, quiescence=quiescence)
+    except ValueError as e:
+        print(f"endgame cache disabled: {e}")
+        return None
+
+
+# ---- 오프라인 워밍 ----
+
+def endgame_positions(games, seed=0, max_plies=400):
+    """무작위 대국을 두다가 엔드게임 포지션이 나오면 하나씩 낸다 (한 대국에서 여러 개)."""
+    from server.game.core import Game
+    from server.game.ai_adapter import get_all_actions
+    rng = random.Random(seed)
+    for _ in range(games):
+        game = Game()
+        for _ in range(max_plies):
+            actions = get_all_actions(game, game.turn)
+            if not actions:
+                break
+            # 잡는 수를 자주 골라 기물이 빨리 줄어들게 한다
+            captures = [a for a in actions if a[0] == "move" and game.board[a[3][1]][a[3][0]] is not None
+                        and game.pieces[game.board[a[3][1]][a[3][0]]].type != 'king']
+            action = rng.choice(captures) if captures and rng.random() < 0.8 else rng.choice(actions)
+            undo = game.make_action(action)
+            if undo is None or any(not n for n in game.king_count.values()):
+                break
+            if is_endgame(game):
+                yield game.to_position().to_game(game_id=game.id)
+
+
+def warm(cache, games=100, depth=4, seed=0, limit=None, progress=None):
+    """엔드게임 포지션들을 depth 로 탐색해 캐시를 채운다 (최대 limit 개 포지션)."""
+    from server.ai.model import negamax_best_action
+    searched = 0
+    for game in endgame_positions(games, seed):
+        if limit is not None and searched >= limit:
+            break
+        extended_eval, drop_width, quiescence = cache.settings
+        negamax_best_action(game, depth, drop_width=drop_width, extended_eval=extended_eval, quiescence=quiescence,
+                            endgame=cache)
+        searched += 1
+        if progress is not None:
+            progress(searched)
+    cache.flush()
+    return searched
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="endgame cache tools")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('warm')
+    p.add_argument('path')
+    p.add_argument('--size-mb', type=int, default=64)
+    p.add_argument('--games', type=int, default=100)
+    p.add_argument('--depth', type=int, default=4)
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--positions', type=int, default=None, help="탐색할 최대 포지션 수")
+    p.add_argument('--extended-eval', action='store_true', help="확장 평가로 탐색 (서버의 AI_EXTENDED_EVAL 과 맞춘다)")
+    p.add_argument('--drop-width', type=int, default=None, help="서버의 AI_DROP_WIDTH 와 맞춘다")
+    p.add_argument('--no-quiescence', action='store_true')
+    p.add_argument('--reset', action='store_true', help="설정이 다른 기존 파일을 지우고 새로 만든다")
+    p = sub.add_parser('info')
+    p.add_argument('path')
+    args = parser.parse_args(argv)
+
+    if args.command == 'warm':
+        cache = EndgameCache(args.path, args.size_mb, extended_eval=args.extended_eval, drop_width=args.drop_width,
+                             quiescence=not args.no_quiescence, reset=args.reset)
+        start = time.perf_counter()
+
+        def progress(n):
+            if n % 50 == 0:
+                print(f"{n} positions, {cache.stores} stores, usage {cache.usage():.1%}", flush=True)
+
+        n = warm(cache, args.games, args.depth, args.seed, args.positions, progress)
+        cache.close()
+        print(f"searched {n} endgame positions in {time.perf_counter() - start:.1f}s")
+    else:
+        if not os.path.exists(args.path):
+            parser.error(f"no such file: {args.path}")
+        extended_eval, drop_width, quiescence = read_settings(args.path)
+        cache = EndgameCache(args.path, extended_eval=extended_eval, drop_width=drop_width, quiescence=quiescence)
+        print(f"{args.path}: {cache.buckets} buckets x {cache.ways} slots, usage {cache.usage():.1%}, "
+              f"extended_eval={extended_eval} drop_width={drop_width} quiescence={quiescence}")
+        cache.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,120 +1,47 @@
 import math
 import random
 import copy
-from server.game.ai_adapter import clone_game, get_all_actions, apply_action
-
-# 기물 가치 정의
-# 기물 가치 정의
-PIECE_VALUES = {
-    'pawn': 100,
-    'knight': 320,
-    'bishop': 330,
-    'rook': 500,
-    'queen': 900,
-    'king': 30000 
-}
-
-# Piece-Square Tables (PST)
-# 백색 기준 (흑색은 보드를 뒤집어서 사용)
-# 중앙 제어, 기물 발전, 킹 안전 등을 고려한 테이블입니다.
-pst_pawn = [
-     0,  0,  0,  0,  0,  0,  0,  0,
-    50, 50, 50, 50, 50, 50, 50, 50,
-    10, 10, 20, 30, 30, 20, 10, 10,
-     5,  5, 10, 25, 25, 10,  5,  5,
-     0,  0,  0, 20, 20,  0,  0,  0,
-     5, -5,-10,  0,  0,-10, -5,  5,
-     5, 10, 10,-20,-20, 10, 10,  5,
-     0,  0,  0,  0,  0,  0,  0,  0
-]
-
-pst_knight = [
-    -50,-40,-30,-30,-30,-30,-40,-50,
-    -40,-20,  0,  0,  0,  0,-20,-40,
-    -30,  0, 10, 15, 15, 10,  0,-30,
-    -30,  5, 15, 20, 20, 15,  5,-30,
-    -30,  0, 15, 20, 20, 15,  0,-30,
-    -30,  5, 10, 15, 15, 10,  5,-30,
-    -40,-20,  0,  5,  5,  0,-20,-40,
-    -50,-40,-30,-30,-30,-30,-40,-50
-]
-
-pst_bishop = [
-    -20,-10,-10,-10,-10,-10,-10,-20,
-    -10,  0,  0,  0,  0,  0,  0,-10,
-    -10,  0,  5, 10, 10,  5,  0,-10,
-    -10,  5,  5, 10, 10,  5,  5,-10,
-    -10,  0, 10, 10, 10, 10,  0,-10,
-    -10, 10, 10, 10, 10, 10, 10,-10,
-    -10,  5,  0,  0,  0,  0,  5,-10,
-    -20,-10,-10,-10,-10,-10,-10,-20
-]
-
-pst_rook = [
-     0,  0,  0,  0,  0,  0,  0,  0,
-     5, 10, 10, 10, 10, 10, 10,  5,
-    -5,  0,  0,  0,  0,  0,  0, -5,
-    -5,  0,  0,  0,  0,  0,  0, -5,
-    -5,  0,  0,  0,  0,  0,  0, -5,
-    -5,  0,  0,  0,  0,  0,  0, -5,
-    -5,  0,  0,  0,  0,  0,  0, -5,
-     0,  0,  0,  5,  5,  0,  0,  0
-]
-
-pst_queen = [
-    -20,-10,-10, -5, -5,-10,-10,-20,
-    -10,  0,  0,  0,  0,  0,  0,-10,
-    -10,  0,  5,  5,  5,  5,  0,-10,
-     -5,  0,  5,  5,  5,  5,  0, -5,
-      0,  0,  5,  5,  5,  5,  0, -5,
-    -10,  5,  5,  5,  5,  5,  0,-10,
-    -10,  0,  5,  0,  0,  0,  0,-10,
-    -20,-10,-10, -5, -5,-10,-10,-20
-]
-
-pst_king = [
-    -30,-40,-40,-50,-50,-40,-40,-30,
-    -30,-40,-40,-50,-50,-40,-40,-30,
-    -30,-40,-40,-50,-50,-40,-40,-30,
-    -30,-40,-40,-50,-50,-40,-40,-30,
-    -20,-30,-30,-40,-40,-30,-30,-20,
-    -10,-20,-20,-20,-20,-20,-20,-10,
-     20, 20,  0,  0,  0,  0, 20, 20,
-     20, 30, 10,  0,  0, 10, 30, 20
-]
-
-PIECE_SQUARE_TABLES = {
-    'pawn': pst_pawn,
-    'knight': pst_knight,
-    'bishop': pst_bishop,
-    'rook': pst_rook,
-    'queen': pst_queen,
-    'king': pst_king
-}
+import time
+from server.game.ai_adapter import get_all_actions, iter_actions, iter_captures, iter_drops, is_generated
+from server.ai.tt import TranspositionTable, EXACT, LOWER, UPPER
+from server.game.attacks import square, coords, iter_bits
+from server.game.bitboard import TYPE_INDEX
+
+from server.game.pst import count_kings, compute_stasis, PIECE_VALUES, PIECE_SQUARE_TABLES
 
 def is_game_over(game):
-    """한쪽 왕이라도 잡히면 게임이 종료되었는지 확인합니다."""
-    kings_alive = {'w': False, 'b': False}
-    for p in game.pieces.values():
-        if p.type == 'king':
-            # 킹이 보드 위에 있거나, 아직 주인의 손에 있으면(드롭 전) 생존으로 간주
-            if p.pos is not None or p.id in game.hands[p.color]:
-                kings_alive[p.color] = True
-                
-    return not (kings_alive['w'] and kings_alive['b'])
+    """한쪽 왕이라도 잡히면 게임이 종료되었는지 확인합니다. (Game.king_count 로 추적)"""
+    kings = game.king_count
+    return not (kings['w'] and kings['b'])
 
 def evaluate_board(game):
-    """보드 상태를 평가하여 점수를 반환합니다. 백색에게 유리하면 양수, 흑색에게 유리하면 음수입니다."""
-    if is_game_over(game):
-         # 죽은 왕을 체크
-        kings_alive = {'w': False, 'b': False}
-        for p in game.pieces.values():
-            if p.type == 'king':
-                if p.pos is not None or p.id in game.hands[p.color]:
-                    kings_alive[p.color] = True
-        
-        if not kings_alive['w']: return -float('inf') # 백색 패배
-        if not kings_alive['b']: return float('inf')  # 흑색 패배
+    """보드 상태를 평가하여 점수를 반환합니다. 백색에게 유리하면 양수, 흑색에게 유리하면 음수입니다.
+    기물 가치+PST 합은 Game.score 에 증분으로 유지되므로 O(1) 입니다."""
+    kings = game.king_count
+    if not kings['w']: return -float('inf') # 백색 패배
+    if not kings['b']: return float('inf')  # 흑색 패배
+    return game.score
+
+def evaluate_board_extended(game):
+    """evaluate_board 에 손패, stun, move_stack 항(Game.stasis)을 더한 확장 평가. 역시 O(1) 입니다.
+    항별 가중치는 server.game.pst 의 STASIS_SCORES / HAND_SCORES 표에서 옵니다."""
+    kings = game.king_count
+    if not kings['w']: return -float('inf') # 백색 패배
+    if not kings['b']: return float('inf')  # 흑색 패배
+    return game.score + game.stasis
+
+def evaluate_board_extended_scan(game):
+    """evaluate_board_extended 와 같은 값을 전체를 훑어서 계산합니다 (증분 값 검증/벤치마크용)."""
+    value = evaluate_board_scan(game)
+    if math.isinf(value):
+        return value
+    return value + compute_stasis(game)
+
+def evaluate_board_scan(game):
+    """evaluate_board 와 같은 값을 기물 전체를 훑어서 계산합니다 (증분 점수 검증용)."""
+    kings = count_kings(game)
+    if not kings['w']: return -float('inf') # 백색 패배
+    if not kings['b']: return float('inf')  # 흑색 패배
 
     score = 0
     for piece in game.pieces.values():
@@ -165,16 +92,223 @@ def evaluate_board(game):
                 
     return score
 
-def negamax(game, depth, alpha, beta, color, excluded_actions=None):
-    """네가맥스 알고리즘으로 최적의 수를 찾습니다."""
-    
+QS_MAX_NODES = 2000   # 말단 하나에서 quiescence 탐색이 방문할 최대 노드 수
+QS_DELTA = 200        # delta pruning 여유값: 잡는 기물 가치 + 이 값으로도 alpha 에 못 미치면 건너뜀
+
+# history 표: 이동은 (종류, 출발 칸, 도착 칸), 드롭은 (종류, 드롭 칸) 마다 한 칸
+HISTORY_DROP_BASE = 6 * 64 * 64
+HISTORY_SIZE = HISTORY_DROP_BASE + 6 * 64
+
+def history_index(game, action):
+    if action[0] == "move":
+        _, pid, frm, to = action
+        return (TYPE_INDEX[game.pieces[pid].type] * 64 + square(*frm)) * 64 + square(*to)
+    _, pid, to = action
+    return HISTORY_DROP_BASE + TYPE_INDEX[game.pieces[pid].type] * 64 + square(*to)
+
+class SearchTimeout(Exception):
+    """시간/노드 예산을 다 써서 탐색을 중단할 때 발생합니다."""
+
+
+class SearchContext:
+    """한 번의 탐색 동안 공유되는 예산(시간, 노드 수), 탐색 옵션과 노드 카운트.
+    drop_width 가 주어지면 루트를 제외한 노드에서 드롭 칸을 그 수만큼으로 제한합니다.
+    extended_eval 이면 말단에서 evaluate_board_extended 를 씁니다.
+    quiescence 이면 말단에서 잡는 수만 따라가는 quiescence 탐색을 합니다 (말단마다 QS_MAX_NODES 노드까지).
+    history 이면 ply 별 킬러 수(2칸)와 history 표로 루트 아래의 조용한 수/드롭을 정렬합니다.
+    cutoffs / first_cutoffs 는 베타 컷오프 수와 그중 첫 번째 수에서 난 컷오프 수입니다 (정렬 품질 지표).
+    endgame(server.ai.endgame.EndgameCache)이 주어지면 엔드게임 포지션에서 치환표처럼 함께 씁니다."""
+    CHECK_EVERY = 256   # 시계는 이 노드 수마다 한 번만 확인
+
+    def __init__(self, time_ms=None, max_nodes=None, drop_width=None, extended_eval=False, quiescence=True,
+                 history=True, endgame=None):
+        self.deadline = time.perf_counter() + time_ms / 1000 if time_ms is not None else None
+        self.max_nodes = max_nodes
+        self.nodes = 0
+        self.armed = True       # False 이면 예산을 넘겨도 중단하지 않음
+        self.depth = 0          # 마지막으로 완료된 반복의 깊이
+        self.drop_width = drop_width
+        self.evaluate = evaluate_board_extended if extended_eval else evaluate_board
+        self.qs_nodes = QS_MAX_NODES if quiescence else 0
+        self.history = [0] * HISTORY_SIZE if history else None
+        self.killers = []       # ply -> [최근 킬러, 그 전 킬러]
+        if endgame is not None and not endgame.matches(extended_eval, drop_width, quiescence):
+            raise ValueError("endgame cache was built with different evaluation settings")
+        self.endgame = endgame
+        self.cutoffs = 0
+        self.first_cutoffs = 0
+
+    def killers_at(self, ply):
+        while len(self.killers) <= ply:
+            self.killers.append([None, None])
+        return self.killers[ply]
+
+    def record_cutoff(self, game, action, depth, ply, quiet, first):
+        """베타 컷오프를 기록합니다. 조용한 수/드롭이면 킬러와 history 를 갱신합니다."""
+        self.cutoffs += 1
+        if first:
+            self.first_cutoffs += 1
+        if quiet and self.history is not None:
+            slots = self.killers_at(ply)
+            if slots[0] != action:
+                slots[1] = slots[0]
+                slots[0] = action
+            self.history[history_index(game, action)] += depth * depth
+
+    def stats(self):
+        return {
+            'nodes': self.nodes,
+            'cutoffs': self.cutoffs,
+            'first_cutoff_rate': self.first_cutoffs / self.cutoffs if self.cutoffs else 0.0,
+        }
+
+    def tick(self):
+        self.nodes += 1
+        if not self.armed:
+            return
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise SearchTimeout()
+        if (self.deadline is not None and self.nodes % self.CHECK_EVERY == 0
+                and time.perf_counter() > self.deadline):
+            raise SearchTimeout()
+
+
+def _by_history(game, actions, history):
+    actions.sort(key=lambda a: -history[history_index(game, a)])   # 안정 정렬: 동점이면 생성 순서
+    return actions
+
+
+def heuristic_actions(game, color, include_drops, ctx, ply, drop_width=None):
+    """잡는 수(MVV-LVA) -> 이 ply 의 킬러 수 -> 조용한 수(history 순) -> 드롭(history 순).
+    단계는 iter_actions 처럼 지연 생성되고, 각 단계 안에서만 목록을 만들어 정렬합니다."""
+    quiet = []
+    yield from iter_captures(game, color, quiet)
+    killers = []
+    for killer in ctx.killers_at(ply):
+        if (killer is not None and killer not in killers and is_generated(game, color, killer, include_drops)
+                and (killer[0] == "drop" or game.board[killer[3][1]][killer[3][0]] is None)):
+            killers.append(killer)
+            yield killer
+    moves = [("move", pid, frm, coords(sq)) for pid, frm, mask in quiet for sq in iter_bits(mask)]
+    for action in _by_history(game, moves, ctx.history):
+        if action not in killers:
+            yield action
+    if include_drops:
+        for action in _by_history(game, list(iter_drops(game, color, width=drop_width)), ctx.history):
+            if action not in killers:
+                yield action
+
+
+def exclusion_set(excluded_actions):
+    """excluded_actions 를 조회가 O(1) 인 frozenset 으로 바꿉니다 (None/빈 값이면 None).
+    JSON 에서 온 좌표 리스트도 튜플로 맞춥니다."""
+    if not excluded_actions:
+        return None
+    return frozenset(tuple(tuple(x) if isinstance(x, list) else x for x in a) for a in excluded_actions)
+
+
+def ordered_actions(game, color, include_drops, first_actions=(), drop_width=None, ctx=None, ply=0):
+    """첫 수 후보(치환표/PV 수) -> 단계별 생성기 순서로 action 을 냅니다.
+    후보는 transposition 으로 pid 가 다를 수 있으므로 지금 생성될 수인 경우에만 먼저 냅니다.
+    ctx 가 history 를 쓰면 루트 아래(ply > 0)에서는 heuristic_actions 순서를 따릅니다
+    (루트 순서는 그대로 두어 병렬 루트 분할과 같은 수를 고르게 합니다).
+    드롭을 제외했는데 둘 수가 하나도 없으면 드롭이라도 냅니다."""
+    first = None
+    for candidate in first_actions:
+        if candidate is not None and is_generated(game, color, candidate, include_drops):
+            first = candidate
+            yield first
+            break
+    produced = first is not None
+    if ctx is not None and ctx.history is not None and ply > 0:
+        actions = heuristic_actions(game, color, include_drops, ctx, ply, drop_width)
+    else:
+        actions = iter_actions(game, color, include_drops, drop_width=drop_width)
+    for action in actions:
+        if action != first:
+            produced = True
+            yield action
+    if not produced and not include_drops:
+        yield from iter_drops(game, color, width=drop_width)
+
+
+def quiescence(game, alpha, beta, color, ctx=None, budget=None):
+    """잡는 수만 따라가며 말단 평가를 안정시킵니다 (quiescence search).
+    잡으면 stun/move_stack 이 잡은 기물로 넘어가므로, 교환 도중에 멈추면 평가가 크게 흔들립니다.
+      - stand-pat: 잡지 않고 멈췄을 때의 정적 평가가 beta 이상이면 바로 컷오프
+      - delta pruning: 잡는 기물 가치 + QS_DELTA 를 더해도 alpha 에 못 미치면 그 잡기(와 더 싼 잡기)는 건너뜀
+      - budget: 이 말단에서 쓸 수 있는 남은 노드 수 (1칸 리스트). 다 쓰면 정적 평가로 멈춥니다."""
+    if ctx is not None:
+        ctx.tick()
+    if budget is None:
+        budget = [ctx.qs_nodes if ctx is not None else QS_MAX_NODES]
+    budget[0] -= 1
+    if is_game_over(game):
+        return -float('inf')
+
+    evaluate = ctx.evaluate if ctx is not None else evaluate_board
+    stand_pat = evaluate(game) * (1 if color == 'w' else -1)
+    if stand_pat >= beta or budget[0] <= 0:
+        return stand_pat
+    alpha = max(alpha, stand_pat)
+
+    best_value = stand_pat
+    pieces = game.pieces
+    board = game.board
+    for action in iter_captures(game, color):
+        to = action[3]
+        victim = pieces[board[to[1]][to[0]]]
+        if victim.type != 'king' and stand_pat + PIECE_VALUES[victim.type] + QS_DELTA < alpha:
+            break   # MVV 순서이므로 뒤의 잡기는 더 싼 기물
+        undo = game.make_action(action)
+        if undo is None:
+            continue
+        try:
+            value = -quiescence(game, -beta, -alpha, game.turn, ctx, budget)
+        finally:
+            game.unmake_action(undo)
+        if value > best_value:
+            best_value = value
+        alpha = max(alpha, value)
+        if alpha >= beta or budget[0] <= 0:
+            break
+    return best_value
+
+
+def negamax(game, depth, alpha, beta, color, excluded_actions=None, tt=None, ply=0, ctx=None, pv_action=None):
+    """네가맥스 알고리즘으로 최적의 수를 찾습니다.
+    tt 가 주어지면 치환표로 같은 포지션의 재탐색을 줄입니다 (루트(ply 0)에서는 컷오프 없이 수 정렬에만 사용).
+    ctx 의 예산을 넘기면 SearchTimeout 이 발생하며, 게임 상태는 항상 원래대로 되돌려집니다."""
+    if ctx is not None:
+        ctx.tick()
+
     # 게임오버 체크
     if is_game_over(game):
         return -float('inf'), None
 
     if depth == 0:
-        perspective = 1 if color == 'w' else -1
-        return evaluate_board(game) * perspective, None
+        if ctx is None or ctx.qs_nodes:
+            return quiescence(game, alpha, beta, color, ctx), None
+        return ctx.evaluate(game) * (1 if color == 'w' else -1), None
+
+    alpha_orig = alpha
+    tt_action = None
+    endgame = ctx.endgame if ctx is not None and ctx.endgame is not None and ctx.endgame.covers(game) else None
+    if tt is not None or endgame is not None:
+        entry = tt.probe(game.hash) if tt is not None else None
+        if entry is None and endgame is not None:
+            entry = endgame.probe(game)
+        if entry is not None:
+            tt_depth, flag, tt_value, tt_action = entry
+            if ply > 0 and tt_depth >= depth:
+                if flag == EXACT:
+                    return tt_value, tt_action
+                if flag == LOWER:
+                    alpha = max(alpha, tt_value)
+                elif flag == UPPER:
+                    beta = min(beta, tt_value)
+                if alpha >= beta:
+                    return tt_value, tt_action
 
     # Optimization: 
     # 일반적인 상황에서는 드롭을 나중에 고려하지만,
@@ -194,32 +328,29 @@ def negamax(game, depth, alpha, beta, color, excluded_actions=None):
     # 만약 move가 하나도 없다면 drop을 보도록 fallback 로직 추가.
     
     include_drops = (depth > 1)
-    actions = get_all_actions(game, color, include_drops=include_drops)
-    
-    # 만약 액션이 없는데, 드롭을 제외해서 없는 것일 수도 있으니 다시 확인
-    if not actions and not include_drops:
-        actions = get_all_actions(game, color, include_drops=True)
-        
-    # 그래도 없으면 패배/스테일메이트
-    if not actions: 
-        return -float('inf'), None # 더 이상 둘 수가 없으면 패배 처리 (또는 0 스테일메이트)
+    # 수는 단계별로 지연 생성됩니다. 컷오프가 나면 남은 단계(특히 드롭)는 만들지 않습니다.
+    drop_width = ctx.drop_width if ctx is not None and ply > 0 else None
+    actions = ordered_actions(game, color, include_drops, (tt_action, pv_action), drop_width, ctx, ply)
 
     best_value = -float('inf')
     best_action = None
+    searched = 0
 
     for action in actions:
+        searched += 1
         if excluded_actions and action in excluded_actions:
              continue
 
-        # 액션을 적용하여 자식 노드 게임 상태를 만듭니다.
-        child_game = clone_game(game)
-        success, _ = apply_action(child_game, action)
-        if not success:
+        quiet = action[0] == "drop" or game.board[action[3][1]][action[3][0]] is None
+        # 복제 대신 제자리에서 액션(+턴 종료)을 적용하고 탐색 후 되돌립니다.
+        undo = game.make_action(action)
+        if undo is None:
             continue
-        child_game.end_turn() 
-
-        # 상대방에 대한 재귀 호출
-        value, _ = negamax(child_game, depth - 1, -beta, -alpha, child_game.turn)
+        try:
+            # 상대방에 대한 재귀 호출
+            value, _ = negamax(game, depth - 1, -beta, -alpha, game.turn, tt=tt, ply=ply + 1, ctx=ctx)
+        finally:
+            game.unmake_action(undo)
         value = -value 
 
         if value > best_value:
@@ -228,20 +359,107 @@ def negamax(game, depth, alpha, beta, color, excluded_actions=None):
         
         alpha = max(alpha, value)
         if alpha >= beta:
+            if ctx is not None:
+                ctx.record_cutoff(game, action, depth, ply, quiet, searched == 1)
             break
 
+    # 둘 수가 없으면 패배/스테일메이트
+    if not searched:
+        return -float('inf'), None # 더 이상 둘 수가 없으면 패배 처리 (또는 0 스테일메이트)
+
+    if (tt is not None or endgame is not None) and best_action is not None and not excluded_actions:
+        if best_value <= alpha_orig:
+            flag = UPPER
+        elif best_value >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        if tt is not None:
+            tt.store(game.hash, depth, flag, best_value, best_action)
+        if endgame is not None:
+            endgame.store(game, depth, flag, best_value, best_action)
+
     return best_value, best_action
 
-def negamax_best_action(game, depth, excluded_actions=None):
-    """AI의 메인 함수. 네가맥스 탐색을 시작하고 최적의 수를 반환합니다."""
+ID_TT_MB = 8   # 반복 심화에서 치환표를 따로 받지 못했을 때 쓰는 임시 표 크기
+
+def iterative_deepening(game, max_depth, time_ms=None, max_nodes=None, excluded_actions=None, tt=None,
+                        drop_width=None, extended_eval=False, quiescence=True, history=True, endgame=None):
+    """깊이 1부터 max_depth 까지 늘려가며 탐색합니다.
+    예산(time_ms, max_nodes)을 다 쓰면 마지막으로 끝까지 완료된 깊이의 (action, value, ctx)를 반환합니다.
+    깊이 1 은 항상 끝까지 탐색하며, 둘 수 있는 수가 있으면 모든 수가 지더라도 반드시 하나를 돌려줍니다."""
+    if tt is None:
+        tt = TranspositionTable(ID_TT_MB)
+    tt.new_search()
+    excluded_actions = exclusion_set(excluded_actions)
+    ctx = SearchContext(time_ms, max_nodes, drop_width=drop_width, extended_eval=extended_eval, quiescence=quiescence,
+                        history=history, endgame=endgame)
+    best_action, best_value = None, None
+    for depth in range(1, max_depth + 1):
+        ctx.armed = depth > 1
+        try:
+            value, action = negamax(game, depth, -float('inf'), float('inf'), game.turn,
+                                    excluded_actions=excluded_actions, tt=tt, ctx=ctx, pv_action=best_action)
+        except SearchTimeout:
+            break
+        if action is None:
+            if best_action is None:
+                # 깊이 1 에서부터 모든 수가 진다면(quiescence 가 상대의 킹 잡기를 봄) 그래도 하나는 둔다
+                best_action = next((a for a in get_all_actions(game, game.turn)
+                                    if not excluded_actions or a not in excluded_actions), None)
+                best_value = value
+            break
+        best_action, best_value = action, value
+        ctx.depth = depth
+        if math.isinf(value):
+            break   # 승패가 확정되면 더 깊이 볼 필요가 없음
+    return best_action, best_value, ctx
+
+def negamax_best_action(game, depth, excluded_actions=None, tt=None, time_ms=None, max_nodes=None, workers=None,
+                        drop_width=None, extended_eval=False, quiescence=True, history=True, book=None,
+                        endgame=None):
+    """AI의 메인 함수. 네가맥스 탐색을 시작하고 최적의 수를 반환합니다.
+    tt(TranspositionTable)를 넘기면 같은 게임의 이전 턴에서 쌓인 항목을 재사용합니다.
+    time_ms 또는 max_nodes 가 주어지면 depth 를 최대 깊이로 하는 반복 심화로 탐색합니다.
+    그렇지 않고 workers > 1 이면 루트를 여러 프로세스로 나눠 같은 깊이를 탐색합니다 (server.ai.parallel).
+    drop_width 는 루트 아래 노드의 드롭 후보 칸 수를 제한합니다 (None 이면 제한 없음).
+    extended_eval 이면 손패/stun/move_stack 을 반영한 확장 평가로 탐색합니다 (병렬 루트 분할은 기본 평가만).
+    quiescence 가 False 이면 말단에서 잡는 수를 더 보지 않고 바로 정적 평가합니다.
+    history 가 False 이면 킬러/history 수 정렬을 쓰지 않습니다.
+    book(server.ai.book.OpeningBook)이 주어지면 탐색 전에 먼저 찾아보고, 둘 수 있는 수가 있으면 바로 둡니다.
+    endgame(server.ai.endgame.EndgameCache)은 엔드게임 포지션의 탐색 결과를 파일에 남겨 재시작 후에도 씁니다."""
     # King drop check logic logic is implicit now via get_all_actions
     
     # if game over, return None
     if is_game_over(game):
         return None
+
+    excluded_actions = exclusion_set(excluded_actions)
+    if book is not None:
+        hit = book.choose(game, excluded_actions)
+        if hit is not None:
+            return hit[0]
+
+    if time_ms is not None or max_nodes is not None:
+        action, _, _ = iterative_deepening(game, depth, time_ms=time_ms, max_nodes=max_nodes,
+                                           excluded_actions=excluded_actions, tt=tt, drop_width=drop_width,
+                                           extended_eval=extended_eval, quiescence=quiescence, history=history,
+                                           endgame=endgame)
+        return action
+
+    if workers is not None and workers > 1:
+        from server.ai.parallel import parallel_root_search
+        action, _ = parallel_root_search(game, depth, workers, excluded_actions=excluded_actions)
+        return action
+
+    if tt is not None:
+        tt.new_search()
     
     # Run negamax
-    val, action = negamax(game, depth, -float('inf'), float('inf'), game.turn, excluded_actions=excluded_actions)
+    ctx = SearchContext(drop_width=drop_width, extended_eval=extended_eval, quiescence=quiescence, history=history,
+                        endgame=endgame)
+    val, action = negamax(game, depth, -float('inf'), float('inf'), game.turn,
+                          excluded_actions=excluded_actions, tt=tt, ctx=ctx)
     
     # 만약 action이 None이고 val이 -inf라면 어쩔 수 없이 지는 상황.
     # 그래도 아무거나 둬야 한다면... actions 중 첫번째라도 반환?
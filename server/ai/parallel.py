@@ -0,0 +1,105 @@
+"""루트 분할 병렬 탐색.
+
+루트 action 목록을 워커 프로세스에 번갈아(라운드 로빈) 나눠 주고, 각 워커는 맡은 수를
+순서대로 negamax 로 평가한다. 워커끼리는 지금까지 찾은 최선 값(alpha)을 Manager 의
+공유 값으로 주고받는다. 결과는 (값이 가장 큰 것, 같으면 인덱스가 가장 작은 것)으로
+합치므로 같은 깊이의 단일 스레드 negamax_best_action(game, depth) 와 같은 수를 고른다.
+
+다른 워커에서 받은 alpha 는 1 만큼 낮춰서 쓴다. 평가값이 정수이므로, 그 값과 같은 점수의
+수는 정확한 값으로 계산되고 동점 처리가 단일 스레드와 같아진다.
+"""
+import math
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Manager
+
+from server.ai.model import negamax, is_game_over, SearchContext, exclusion_set
+from server.game.ai_adapter import get_all_actions, encode_action, decode_action
+from server.game.codec import encode_game, decode_game
+
+_pools = {}
+_manager = None
+
+
+def _get_pool(workers):
+    pool = _pools.get(workers)
+    if pool is None:
+        pool = _pools[workers] = ProcessPoolExecutor(max_workers=workers)
+    return pool
+
+
+def _get_manager():
+    global _manager
+    if _manager is None:
+        _manager = Manager()
+    return _manager
+
+
+def root_actions(game, depth, excluded_actions=None):
+    """negamax 의 루트와 같은 순서의 action 목록."""
+    color = game.turn
+    actions = get_all_actions(game, color, include_drops=depth > 1)
+    if not actions and depth <= 1:
+        actions = get_all_actions(game, color, include_drops=True)
+    excluded_actions = exclusion_set(excluded_actions)
+    if excluded_actions:
+        actions = [a for a in actions if a not in excluded_actions]
+    return actions
+
+
+def search_root_slice(position, game_id, depth, indexed_actions, shared_alpha=None):
+    """워커에서 실행: 맡은 (인덱스, action 코드) 들의 값을 [(인덱스, 값)] 으로 돌려준다.
+    position 은 codec.encode_game 바이트열, action 코드는 ai_adapter.encode_action 이다."""
+    game = decode_game(position, game_id=game_id)
+    ctx = SearchContext()   # 킬러/history 는 워커 안에서 맡은 수들끼리 공유
+    inf = float('inf')
+    local_alpha = -inf
+    results = []
+    for index, code in indexed_actions:
+        action = decode_action(game, game.turn, code)
+        if action is None:
+            continue
+        alpha = local_alpha
+        if shared_alpha is not None:
+            shared = shared_alpha.value
+            if not math.isinf(shared):
+                alpha = max(alpha, shared - 1)
+        undo = game.make_action(action)
+        if undo is None:
+            continue
+        try:
+            value, _ = negamax(game, depth - 1, -inf, -alpha, game.turn, ply=1, ctx=ctx)
+        finally:
+            game.unmake_action(undo)
+        value = -value
+        results.append((index, value))
+        if value > local_alpha:
+            local_alpha = value
+            if shared_alpha is not None and not math.isinf(value) and value > shared_alpha.value:
+                shared_alpha.value = value   # 경쟁 조건으로 덮어써져도 더 낮은(안전한) 값이 될 뿐
+    return results
+
+
+def parallel_root_search(game, depth, workers, excluded_actions=None):
+    """루트를 workers 개 프로세스로 나눠 탐색하고 (action, value) 를 반환한다."""
+    if is_game_over(game):
+        return None, -float('inf')
+    actions = root_actions(game, depth, excluded_actions)
+    if not actions:
+        return None, -float('inf')
+
+    workers = max(1, min(workers, len(actions)))
+    codes = [encode_action(game, a) for a in actions]
+    slices = [[(i, c) for i, c in enumerate(codes) if i % workers == w] for w in range(workers)]
+    shared_alpha = _get_manager().Value('d', -float('inf'))
+    position = encode_game(game)
+    pool = _get_pool(workers)
+    futures = [pool.submit(search_root_slice, position, game.id, depth, part, shared_alpha) for part in slices]
+
+    best_index, best_value = None, -float('inf')
+    for future in futures:
+        for index, value in future.result():
+            if value > best_value or (value == best_value and best_index is not None and index < best_index):
+                best_index, best_value = index, value
+    if best_index is None:
+        return None, best_value
+    return actions[best_index], best_value
@@ -0,0 +1,75 @@
+"""탐색용 치환표 (transposition table).
+
+Game.hash 를 키로 (깊이, 경계 종류, 값, 최선 수)를 저장한다. 테이블 크기는 MB 단위로
+고정되고, 버킷마다 슬롯이 두 개 있다.
+  - 슬롯 0: 깊이 우선. 더 깊거나 같은 깊이, 또는 이전 탐색(세대)의 항목일 때만 교체
+  - 슬롯 1: 항상 교체
+같은 게임의 연속된 AI 턴에서 재사용할 수 있도록 new_search() 로 세대만 올린다.
+"""
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# 슬롯 하나가 차지하는 대략적인 바이트 수 (키 int + 항목 튜플 + 리스트 포인터 두 개)
+SLOT_BYTES = 160
+
+
+class TranspositionTable:
+    def __init__(self, size_mb=16):
+        slots = max(2, int(size_mb * 1024 * 1024) // SLOT_BYTES)
+        buckets = 1
+        while buckets * 4 <= slots:
+            buckets *= 2
+        self.size_mb = size_mb
+        self.mask = buckets - 1
+        self.keys = [0] * (buckets * 2)
+        self.entries = [None] * (buckets * 2)    # (depth, flag, value, action, generation)
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def __len__(self):
+        return len(self.keys)
+
+    def new_search(self):
+        self.generation += 1
+        self.probes = self.hits = self.stores = 0
+
+    def clear(self):
+        self.keys = [0] * len(self.keys)
+        self.entries = [None] * len(self.entries)
+        self.generation = 0
+
+    def probe(self, key):
+        """(depth, flag, value, action) 또는 None."""
+        self.probes += 1
+        i = (key & self.mask) << 1
+        keys = self.keys
+        if keys[i] == key and self.entries[i] is not None:
+            self.hits += 1
+            return self.entries[i][:4]
+        if keys[i + 1] == key and self.entries[i + 1] is not None:
+            self.hits += 1
+            return self.entries[i + 1][:4]
+        return None
+
+    def store(self, key, depth, flag, value, action):
+        self.stores += 1
+        i = (key & self.mask) << 1
+        entry = (depth, flag, value, action, self.generation)
+        old = self.entries[i]
+        if old is None or self.keys[i] == key or depth >= old[0] or old[4] != self.generation:
+            if old is not None and self.keys[i] != key:
+                # 밀려난 항목은 항상 교체 슬롯으로 옮긴다
+                self.keys[i + 1] = self.keys[i]
+                self.entries[i + 1] = old
+            self.keys[i] = key
+            self.entries[i] = entry
+        else:
+            self.keys[i + 1] = key
+            self.entries[i + 1] = entry
+
+    def usage(self):
+        """현재 세대 항목이 차지하는 슬롯 비율."""
+        used = sum(1 for e in self.entries if e is not None and e[4] == self.generation)
+        return used / len(self.entries)
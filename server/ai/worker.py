@@ -0,0 +1,56 @@
+"""프로세스 풀에서 실행되는 AI 탐색 작업.
+
+Socket.IO 이벤트 스레드를 막지 않도록 server.app 은 포지션만 이진 인코딩(server.game.codec)해서
+보내고, 워커는 Game 을 복원해 탐색한 뒤 선택한 action 튜플만 돌려준다.
+"""
+from collections import OrderedDict
+
+from server.ai.book import load_book
+from server.ai.endgame import load_endgame_cache
+from server.ai.model import negamax_best_action
+from server.ai.tt import TranspositionTable
+from server.game.codec import decode_game, is_encoded
+
+# 워커 프로세스마다 최근 게임의 치환표를 보관한다 (같은 게임의 다음 턴이 같은 워커로 오면 재사용)
+MAX_TABLES = 8
+_tables = OrderedDict()
+
+
+def _table_for(game_id, tt_mb):
+    tt = _tables.get(game_id)
+    if tt is None:
+        tt = _tables[game_id] = TranspositionTable(tt_mb)
+        if len(_tables) > MAX_TABLES:
+            _tables.popitem(last=False)
+    else:
+        _tables.move_to_end(game_id)
+    return tt
+
+
+_books = {}
+_endgames = {}
+
+
+def _book_for(path):
+    # 경로마다 한 번만 연다 (파일이 없으면 None 을 기억)
+    if path not in _books:
+        _books[path] = load_book(path)
+    return _books[path]
+
+
+def _endgame_for(path, size_mb, extended_eval, drop_width):
+    # 같은 파일을 모든 워커가 mmap 으로 공유한다. 파일의 평가 설정이 다르면 None.
+    key = (path, extended_eval, drop_width)
+    if key not in _endgames:
+        _endgames[key] = load_endgame_cache(path, size_mb, extended_eval=extended_eval, drop_width=drop_width)
+    return _endgames[key]
+
+
+def search_position(position, game_id, depth, time_ms=None, max_nodes=None, tt_mb=16, excluded_actions=None,
+                    drop_width=None, extended_eval=False, book_path=None, endgame_path=None, endgame_mb=64):
+    """직렬화된 포지션(codec 바이트열 또는 Position)에서 최선의 action 을 찾는다. 둘 수가 없으면 None."""
+    game = decode_game(position, game_id=game_id) if is_encoded(position) else position.to_game(game_id=game_id)
+    return negamax_best_action(game, depth, excluded_actions=excluded_actions, tt=_table_for(game_id, tt_mb),
+                               time_ms=time_ms, max_nodes=max_nodes, drop_width=drop_width,
+                               extended_eval=extended_eval, book=_book_for(book_path),
+                               endgame=_endgame_for(endgame_path, endgame_mb, extended_eval, drop_width))
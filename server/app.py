@@ -1,105 +1,239 @@
 # server/app.py
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from flask import Flask, request
-from flask_socketio import SocketIO, emit, join_room
+from flask_socketio import SocketIO, join_room
 from server.ai.model import negamax_best_action, is_game_over
+from server.ai.tt import TranspositionTable, SLOT_BYTES
+from server.ai.book import load_book
+from server.ai.endgame import load_endgame_cache
+from server.ai.worker import search_position
 from server.game.core import *
 import random
 from server.game.ai_adapter import apply_action, get_all_actions
+from server.game.sync import StateSync
+from server.game.codec import encode_game
+from server.game.store import GameStore
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'dev'
 socketio = SocketIO(app, cors_allowed_origins="*")
 
+# 스레드 모드에서는 핸들러가 요청 스레드마다, AI 결과는 프로세스 풀의 콜백 스레드에서 돈다.
+# 게임 상태와 store/ai_jobs/ai_tables 를 건드리는 일은 모두 이 락을 잡고 한다.
+# (AI 결과 콜백이 핸들러 안에서 바로 불릴 수도 있어 RLock)
+game_lock = threading.RLock()
+
+class Transport:
+    """핸들러가 쓰는 전송 계층. 기본은 Flask-SocketIO(스레드 모드)이고, server.asgi 가 비동기 서버용으로
+    바꿔 끼운다. 핸들러는 sid 를 인자로 받고 모든 전송을 여기로 보내므로 어느 서버에서도 같은 코드가 돈다."""
+    def emit(self, event, data, to):
+        socketio.emit(event, data, to=to)
+
+    def enter_room(self, sid, room):
+        join_room(room, sid=sid)
+
+    def dispatch(self, fn, *args):
+        # AI 결과처럼 다른 스레드에서 도착한 게임 작업을 실행한다
+        with game_lock:
+            fn(*args)
+
+transport = Transport()
+
 # --- Game Management ---
-games = {}
-player_game_map = {}
+GAME_TTL_S = int(os.environ.get('GAME_TTL', '1800'))          # 접속자가 있어도 이만큼 조용하면 지운다
+GAME_ABANDONED_TTL_S = int(os.environ.get('GAME_ABANDONED_TTL', '60'))   # 접속자가 모두 나간 게임
+MAX_GAMES = int(os.environ.get('MAX_GAMES', '1000'))          # 넘으면 오래 쓰지 않은 게임부터 지운다
+
+def on_game_evicted(game_id):
+    # 게임에 딸린 AI 탐색/치환표/방송 상태도 함께 정리한다
+    cancel_ai_move(game_id)
+    ai_tables.pop(game_id, None)
+    game_syncs.pop(game_id, None)
+
+store = GameStore(ttl=GAME_TTL_S, abandoned_ttl=GAME_ABANDONED_TTL_S, max_games=MAX_GAMES,
+                  on_evict=on_game_evicted)
+
+# game_id -> StateSync. game_state 는 접속/resync 때만 전체를 보내고 나머지는 game_delta 로 보낸다.
+game_syncs = {}
 
 def get_game_for_player(sid):
-    game_id = player_game_map.get(sid)
-    if game_id:
-        return games.get(game_id)
-    return None
+    return store.game_for(sid)
+
+def get_sync(game):
+    sync = game_syncs.get(game.id)
+    if sync is None or sync.game is not game:
+        sync = game_syncs[game.id] = StateSync(game)
+    return sync
+
+def broadcast_state(game):
+    # 마지막 방송 이후 바뀐 기물/손패/history 만 방 전체에 보낸다
+    transport.emit('game_delta', get_sync(game).delta(), to=game.id)
 
 # ----------- AI ------------
 AI_COLOR = 'b'   # 흑을 AI로
+AI_TT_MB = 16    # 게임당 치환표 크기 (MB)
+AI_MAX_DEPTH = 4       # 반복 심화 최대 깊이
+AI_TIME_MS = 1000      # AI 한 턴의 탐색 시간 예산
+AI_MAX_NODES = 200000  # AI 한 턴의 노드 예산
+AI_DROP_WIDTH = 16     # 루트 아래 노드에서 살펴볼 드롭 칸 수 (None 이면 전체)
+AI_EXTENDED_EVAL = False  # True 면 손패/stun/move_stack 을 반영한 확장 평가 사용
+# 오프닝 북 (python -m server.ai.book build 로 생성). 파일이 없으면 북 없이 탐색한다.
+AI_BOOK_PATH = os.environ.get('AI_BOOK', os.path.join(os.path.dirname(__file__), 'data', 'opening_book.bin'))
+# 엔드게임 결과 캐시 (mmap 파일, 워커끼리/재시작 후에도 공유). 기본은 끔: AI_ENDGAME=<파일 경로> 로 켠다.
+# 파일이 없으면 AI_ENDGAME_MB 크기로 새로 만들므로 소스 트리 밖을 가리키게 한다.
+AI_ENDGAME_PATH = os.environ.get('AI_ENDGAME', '')
+AI_ENDGAME_MB = 64
 
-def maybe_ai_move(game):
-    if game.turn != AI_COLOR:
-        return
+# AI 탐색을 돌릴 프로세스 수. 0 이면 이벤트 핸들러 안에서 바로 탐색한다.
+AI_WORKERS = int(os.environ.get('AI_WORKERS', '0'))
+# 한 번의 AI 결정을 루트 분할로 나눠 탐색할 프로세스 수 (인라인 모드에서만 사용).
+# 1 보다 크면 시간 예산 대신 AI_PARALLEL_DEPTH 고정 깊이로 탐색한다.
+AI_ROOT_WORKERS = int(os.environ.get('AI_ROOT_WORKERS', '1'))
+AI_PARALLEL_DEPTH = 3
 
-    # Use Negamax with a reasonable depth
-    # First turn (King drop) is now handled by generalized negamax
-    excluded_actions = []
-    max_retries = 10000000
+# game_id -> TranspositionTable. 같은 게임의 다음 AI 턴에서 재사용한다.
+ai_tables = {}
+# game_id -> 진행 중인 AI 탐색 Future
+ai_jobs = {}
+_ai_pool = None
+_opening_book = False   # 아직 열지 않음
+_endgame_cache = False
 
-    for _ in range(max_retries):
-        action = negamax_best_action(game, depth=2, excluded_actions=excluded_actions)
-        
-        if action is None:
+def get_opening_book():
+    global _opening_book
+    if _opening_book is False:
+        _opening_book = load_book(AI_BOOK_PATH)
+    return _opening_book
+
+def get_endgame_cache():
+    global _endgame_cache
+    if _endgame_cache is False:
+        _endgame_cache = load_endgame_cache(AI_ENDGAME_PATH, AI_ENDGAME_MB, extended_eval=AI_EXTENDED_EVAL,
+                                            drop_width=AI_DROP_WIDTH)
+    return _endgame_cache
+
+def get_ai_pool():
+    global _ai_pool
+    if _ai_pool is None:
+        _ai_pool = ProcessPoolExecutor(max_workers=AI_WORKERS)
+    return _ai_pool
+
+def schedule_ai_move(game):
+    """AI 턴을 워커 프로세스로 보낸다. 결과가 오면 maybe_ai_move 로 적용/전송한다."""
+    if AI_WORKERS <= 0:
+        maybe_ai_move(game)
+        return
+    if game.turn != AI_COLOR or game.id in ai_jobs:
+        return
+    position_version = game.version
+    future = get_ai_pool().submit(search_position, encode_game(game), game.id, AI_MAX_DEPTH,
+                                  time_ms=AI_TIME_MS, max_nodes=AI_MAX_NODES, tt_mb=AI_TT_MB,
+                                  drop_width=AI_DROP_WIDTH, extended_eval=AI_EXTENDED_EVAL, book_path=AI_BOOK_PATH,
+                                  endgame_path=AI_ENDGAME_PATH, endgame_mb=AI_ENDGAME_MB)
+    ai_jobs[game.id] = future
+
+    def on_done(f):
+        # 취소되었거나(플레이어 이탈) 그 사이 포지션이 바뀌었으면 결과를 버린다.
+        # 포지션이 바뀌었어도 여전히 AI 차례면 새 포지션으로 다시 탐색한다 (아니면 AI 턴이 멈춘다).
+        if ai_jobs.get(game.id) is not f:
+            return
+        del ai_jobs[game.id]
+        if f.cancelled():
+            return
+        if f.exception() is not None:
+            print(f"AI worker failed: {f.exception()!r}")
+            return
+        if game.id not in store:
+            return      # 그 사이 게임이 지워짐
+        if game.version != position_version or game.turn != AI_COLOR:
+            # hash 는 action_done/dropped 를 담지 않으므로 version 으로 비교한다
+            print("AI result discarded: position changed while searching")
+            if game.turn == AI_COLOR:
+                schedule_ai_move(game)
+            return
+        if f.result() is None:
             print("AI has no moves or game is over.")
             return
-    
-        print(f"AI chose negamax action: {action}")
-    
-        # Apply the action
-        success, msg = apply_action(game, action)
-        if success:
-            game.action_done[AI_COLOR] = True
-            socketio.emit('game_state', game.to_json(), to=game.id)
-            
-            if is_game_over(game):
-                socketio.emit('game_end', {'winner': AI_COLOR, 'loser': 'w', 'reason': 'king_capture'}, to=game.id)
-                return
-            break # Success, exit loop
-        else:
-            print(f"AI move failed: {msg}. Retrying...")
-            excluded_actions.append(action)
-    else:
-        print("AI failed to find valid move after max retries")
+        maybe_ai_move(game, action=f.result())
+
+    future.add_done_callback(lambda f: transport.dispatch(on_done, f))
+
+def cancel_ai_move(game_id):
+    future = ai_jobs.pop(game_id, None)
+    if future is not None:
+        future.cancel()  # 이미 실행 중이면 끝난 뒤 on_done 에서 결과가 버려진다
+
+def maybe_ai_move(game, action=None):
+    """AI 의 수를 적용하고 턴을 넘긴다. action 이 없으면 여기서 탐색한다.
+    생성기는 apply_action 이 받아들이는 수만 만들므로 거절은 버그다 (다시 탐색하지 않고 RuntimeError)."""
+    if game.turn != AI_COLOR:
+        return
+
+    if action is None and AI_ROOT_WORKERS > 1:
+        action = negamax_best_action(game, depth=AI_PARALLEL_DEPTH, workers=AI_ROOT_WORKERS,
+                                     book=get_opening_book())
+    elif action is None:
+        tt = ai_tables.get(game.id)
+        if tt is None:
+            tt = ai_tables[game.id] = TranspositionTable(AI_TT_MB)
+        action = negamax_best_action(game, depth=AI_MAX_DEPTH, tt=tt,
+                                     time_ms=AI_TIME_MS, max_nodes=AI_MAX_NODES, drop_width=AI_DROP_WIDTH,
+                                     extended_eval=AI_EXTENDED_EVAL, book=get_opening_book(),
+                                     endgame=get_endgame_cache())
+
+    if action is None:
+        print("AI has no moves or game is over.")
+        return
+
+    print(f"AI chose negamax action: {action}")
+    success, msg = apply_action(game, action)
+    if not success:
+        raise RuntimeError(f"AI generated an action the game rejected: {action} ({msg})")
+    game.mark_action_done(AI_COLOR)
+    broadcast_state(game)
+
+    if is_game_over(game):
+        transport.emit('game_end', {'winner': AI_COLOR, 'loser': 'w', 'reason': 'king_capture'}, to=game.id)
         return
 
     # AI의 턴을 종료한다.
     game.end_turn()
-    socketio.emit('turn_ended', {'turn': game.turn}, to=game.id)
-    socketio.emit('game_state', game.to_json(), to=game.id)
+    transport.emit('turn_ended', {'turn': game.turn}, to=game.id)
+    broadcast_state(game)
 
 # ---------------------------
 # SocketIO events
 # ---------------------------
-@socketio.on('connect')
-def on_connect():
-    sid = request.sid
+def on_connect(sid, data=None):
     print(f"connect {sid}")
     # For this refactoring, we create a new game for each connection.
     # A real implementation would have a lobby, game creation, and joining logic.
-    game = Game()
-    games[game.id] = game
-    player_game_map[sid] = game.id
-    join_room(game.id)
+    store.sweep()
+    game = store.add(Game())
+    store.join(sid, game.id)
+    transport.enter_room(sid, game.id)
     
-    emit('connected', {'sid': sid, 'game_id': game.id})
+    transport.emit('connected', {'sid': sid, 'game_id': game.id}, to=sid)
     # send initial state for the new game
-    emit('game_state', game.to_json())
+    transport.emit('game_state', get_sync(game).snapshot(), to=sid)
 
-@socketio.on('join_game') # A new event to handle rejoining/multiple players
-def on_join(data):
-    sid = request.sid
+def on_join(sid, data=None):
     game_id = data.get('game_id')
-    game = games.get(game_id)
+    game = store.join(sid, game_id)
     if game:
-        player_game_map[sid] = game_id
-        join_room(game.id)
-        emit('joined', {'game_id': game.id}, to=sid)
-        socketio.emit('game_state', game.to_json(), to=game.id)
+        transport.enter_room(sid, game.id)
+        transport.emit('joined', {'game_id': game.id}, to=sid)
+        # 새로 들어온 쪽에만 전체 스냅샷. 방의 다른 클라이언트는 이미 최신 상태다.
+        transport.emit('game_state', get_sync(game).snapshot(), to=sid)
     else:
-        emit('error', {'reason': 'game_not_found'}, to=sid)
+        transport.emit('error', {'reason': 'game_not_found'}, to=sid)
 
-@socketio.on('move_request')
-def on_move_request(data):
-    sid = request.sid
+def on_move_request(sid, data=None):
     game = get_game_for_player(sid)
     if not game:
-        emit('move_rejected', {'reason': 'game_not_found'}, to=sid); return
+        transport.emit('move_rejected', {'reason': 'game_not_found'}, to=sid); return
         
     player_color = data.get('player_color')
     pid = data.get('piece_id')
@@ -108,111 +242,100 @@ def on_move_request(data):
 
     # check turn
     if player_color != game.turn:
-        emit('move_rejected', {'reason': 'not_your_turn'}, to=sid); return
+        transport.emit('move_rejected', {'reason': 'not_your_turn'}, to=sid); return
 
     if game.action_done.get(player_color):
-        emit('move_rejected', {'reason':'already_moved_this_turn'}, to=sid); return
+        transport.emit('move_rejected', {'reason':'already_moved_this_turn'}, to=sid); return
 
     piece = game.get_piece(pid)
     if piece is None:
-        emit('move_rejected', {'reason':'no_such_piece'}, to=sid); return
+        transport.emit('move_rejected', {'reason':'no_such_piece'}, to=sid); return
 
     if piece.stun > 0:
-        emit('move_rejected', {'reason':'stunned','stun': piece.stun}, to=sid); return
+        transport.emit('move_rejected', {'reason':'stunned','stun': piece.stun}, to=sid); return
     
     if piece.move_stack < 1:
-        emit('move_rejected', {'reason':'move_stack_is_0'}); return
+        transport.emit('move_rejected', {'reason':'move_stack_is_0'}, to=sid); return
     
     if not piece.can_move(frm,to,game.board_pieces()):
-        emit('move_rejected', {'reason':'illegal_move'}, to=sid); return
+        transport.emit('move_rejected', {'reason':'illegal_move'}, to=sid); return
     
     if not game.safe_after_move(pid, frm, to,piece.color):
-        emit('move_rejected', {'reason':'suicide_or_king_lost'}, to=sid); return
+        transport.emit('move_rejected', {'reason':'suicide_or_king_lost'}, to=sid); return
 
     ok,msg = game.move_piece(player_color, pid, frm, to)
     if not ok:
-        emit('move_rejected', {'reason':msg}, to=sid); return
+        transport.emit('move_rejected', {'reason':msg}, to=sid); return
     
     print(to[1])
     print(piece.type)
     if to[1] in (0, 7) and piece.type == "pawn":
         # Promote pawn to a Queen instance (preserve id, color, pos)
         x, y = to
-        promoted = Queen(pid, piece.color, pos=(x, y))
-        promoted.stun = 0
-        promoted.move_stack = 5
-        # Replace the piece object in the game with the promoted queen
-        game.pieces[pid] = promoted
-        # Ensure board entry remains consistent
-        game.board[y][x] = pid
+        game.promote_pawn(pid)
         print(f"Pawn {pid} promoted to Queen at {(x,y)}")
         
-    game.action_done[player_color] = True
-    socketio.emit('move_accepted', {'by': player_color, 'move': {'piece':pid,'from':frm,'to':to}}, to=game.id)
-    socketio.emit('game_state', game.to_json(), to=game.id)
+    game.mark_action_done(player_color)
+    transport.emit('move_accepted', {'by': player_color, 'move': {'piece':pid,'from':frm,'to':to}}, to=game.id)
+    broadcast_state(game)
     if msg == "win":
         winner = player_color
         loser = 'b' if player_color == 'w' else 'w'
-        socketio.emit('game_end', {'winner': winner, 'loser': loser, 'reason': 'king_capture'}, to=game.id)
+        transport.emit('game_end', {'winner': winner, 'loser': loser, 'reason': 'king_capture'}, to=game.id)
         return
 
-@socketio.on('drop_request')
-def on_drop_request(data):
-    sid = request.sid
+def on_drop_request(sid, data=None):
     game = get_game_for_player(sid)
     if not game:
-        emit('drop_rejected', {'reason': 'game_not_found'}, to=sid); return
+        transport.emit('drop_rejected', {'reason': 'game_not_found'}, to=sid); return
 
     player_color = data.get('player_color')
     pid = data.get('piece_id')
     to = tuple(data.get('to'))
 
     if player_color != game.turn:
-        emit('drop_rejected', {'reason':'not_your_turn'}, to=sid); return
+        transport.emit('drop_rejected', {'reason':'not_your_turn'}, to=sid); return
     
     ok,msg = game.drop_piece(player_color, pid, to[0], to[1])
     if not ok:
-        emit('drop_rejected', {'reason':msg}, to=sid); return
+        transport.emit('drop_rejected', {'reason':msg}, to=sid); return
 
-    game.action_done[player_color] = True
-    socketio.emit('drop_accepted', {'by': player_color, 'piece': pid, 'to': to}, to=game.id)
-    socketio.emit('game_state', game.to_json(), to=game.id)
+    game.mark_action_done(player_color)
+    transport.emit('drop_accepted', {'by': player_color, 'piece': pid, 'to': to}, to=game.id)
+    broadcast_state(game)
 
-@socketio.on('end_turn')
-def on_end_turn():
-    sid = request.sid
+def on_end_turn(sid, data=None):
     game = get_game_for_player(sid)
     if not game:
         print(f"end_turn requested by {sid} but no game found.")
         return
 
+    # 클라이언트가 색을 보내지 않으면 AI 의 상대 색으로 본다
+    player_color = (data or {}).get('player_color') or ('w' if AI_COLOR == 'b' else 'b')
+    if player_color != game.turn:
+        transport.emit('end_turn_rejected', {'reason': 'not_your_turn'}, to=sid); return
+    if game.id in ai_jobs:
+        transport.emit('end_turn_rejected', {'reason': 'ai_thinking'}, to=sid); return
+
     game.end_turn()
-    socketio.emit('turn_ended', {'turn': game.turn}, to=game.id)
-    socketio.emit('game_state', game.to_json(), to=game.id)
+    transport.emit('turn_ended', {'turn': game.turn}, to=game.id)
+    broadcast_state(game)
 
     # AI
     if game.turn == AI_COLOR:
-        maybe_ai_move(game)
+        schedule_ai_move(game)
 
-@socketio.on('stack_add')
-def on_stack_add(data):
-    sid = request.sid
+def on_stack_add(sid, data=None):
     game = get_game_for_player(sid)
     if not game:
-        emit('stack_rejected', {'reason': 'game_not_found'}, to=sid); return
+        transport.emit('stack_rejected', {'reason': 'game_not_found'}, to=sid); return
     id = data.get('piece_id')
-    p = game.get_piece(id)
-    if game.action_done.get(p.color):
-        emit('stack_rejected', {'reason':'already_moved_this_turn'}, to=sid); return
-    if p.type=='king':
-        emit('stack_rejected', {'reason':'can_not_add_stun_king'}, to=sid); return
-    p.stun += 1
-    game.action_done[p.color] = True
-    socketio.emit('game_state', game.to_json(), to=game.id)
-
-@socketio.on('get_legal_moves')
-def on_get_legal_moves(data):
-    sid = request.sid
+    ok, msg = game.stack_add(id)
+    if not ok:
+        transport.emit('stack_rejected', {'reason':msg}, to=sid); return
+    broadcast_state(game)
+
+def on_get_legal_moves(sid, data=None):
     game = get_game_for_player(sid)
     if not game:
         return
@@ -221,25 +344,83 @@ def on_get_legal_moves(data):
     if not piece_id:
         return
 
-    moves = game.get_legal_moves(piece_id)
-    emit('legal_moves', {'moves': moves}, to=sid)
+    piece = game.get_piece(piece_id)
+    if piece is not None and piece.pos is None:
+        # 손패 기물은 드롭할 수 있는 칸
+        moves = game.legal_map()['drops'].get(piece_id, [])
+    else:
+        moves = game.get_legal_moves(piece_id)
+    transport.emit('legal_moves', {'moves': moves}, to=sid)
 
-@socketio.on('disconnect')
-def on_disconnect():
-    sid = request.sid
+def on_resync(sid, data=None):
+    # 클라이언트가 seq 가 비는 것을 보면 요청한다
+    game = get_game_for_player(sid)
+    if not game:
+        return
+    transport.emit('game_state', get_sync(game).snapshot(), to=sid)
+
+def on_get_position(sid, data=None):
+    # 이진 스냅샷 (server/game/codec.py 레이아웃, 328 바이트). history 는 담지 않는다.
+    game = get_game_for_player(sid)
+    if not game:
+        return
+    transport.emit('position', {'seq': get_sync(game).seq, 'data': encode_game(game)}, to=sid)
+
+def on_get_legal_map(sid, data=None):
+    # 둘 차례의 모든 수/드롭을 한 메시지로. 포지션(version)마다 한 번만 계산된다.
+    game = get_game_for_player(sid)
+    if not game:
+        return
+    transport.emit('legal_map', game.legal_map(), to=sid)
+
+def on_disconnect(sid, data=None):
     print(f"disconnect {sid}")
-    game_id = player_game_map.pop(sid, None)
-    if game_id:
-        game = games.get(game_id)
-        # Optional: Implement logic to handle player disconnection, 
-        # e.g., pause game, notify other player, or clean up game if empty.
-        # For now, we'll just remove the player from the map.
-        pass
+    game_id = store.leave(sid)
+    if game_id and not store.players(game_id):
+        # 게임에 남은 플레이어가 없으면 진행 중인 AI 탐색을 취소한다.
+        # 게임 자체는 GAME_ABANDONED_TTL_S 뒤 sweep 에서 지워진다 (그 전에 join_game 으로 돌아올 수 있음).
+        cancel_ai_move(game_id)
+    store.sweep()
+
+# 이벤트 이름 -> 핸들러(sid, data). server.asgi 도 같은 표로 등록한다.
+EVENT_HANDLERS = {
+    'connect': on_connect,
+    'join_game': on_join,
+    'move_request': on_move_request,
+    'drop_request': on_drop_request,
+    'end_turn': on_end_turn,
+    'stack_add': on_stack_add,
+    'get_legal_moves': on_get_legal_moves,
+    'resync': on_resync,
+    'get_position': on_get_position,
+    'get_legal_map': on_get_legal_map,
+    'disconnect': on_disconnect,
+}
+
+def _flask_handler(handler):
+    def on_event(data=None, *args):
+        with game_lock:
+            return handler(request.sid, data)
+    return on_event
+
+for _event, _handler in EVENT_HANDLERS.items():
+    socketio.on(_event)(_flask_handler(_handler))
 
 # basic http endpoint
 @app.route('/ping')
 def ping():
     return {"ok": True}
 
+@app.route('/metrics')
+def metrics():
+    # 게임 수/추정 메모리/지운 수 + AI 치환표 메모리
+    with game_lock:
+        store.sweep()
+        result = store.metrics()
+        result['ai_tables'] = len(ai_tables)
+        result['ai_table_bytes'] = sum(len(tt) * SLOT_BYTES for tt in ai_tables.values())
+        result['ai_jobs'] = len(ai_jobs)
+    return result
+
 if __name__ == "__main__":
     socketio.run(app, host='0.0.0.0', port=5000,debug=True)
@@ -0,0 +1,107 @@
+"""비동기(ASGI) 서버 모드.
+
+server.app 의 기본 실행(Flask-SocketIO 스레드 모드)은 접속마다 스레드를 쓰므로 놀고 있는 웹소켓을
+수천 개씩 들고 있기 어렵다. 이 모듈은 같은 이벤트 표(server.app.EVENT_HANDLERS)를 python-socketio 의
+AsyncServer 에 등록한다. 이벤트 루프는 소켓 입출력만 하고, 핸들러(게임 로직)는 게임 전용 스레드
+하나에서 차례로 돈다. 그래서 게임 상태는 항상 한 스레드에서만 바뀐다. AI 탐색은 프로세스 풀로 보낸다.
+
+    pip install -e ".[asgi]"      # uvicorn, python-socketio
+    uvicorn server.asgi:app --host 0.0.0.0 --port 5000
+    python -m server.asgi            # 위와 같음
+"""
+import asyncio
+import inspect
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import socketio
+
+import server.app as game_app
+
+sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
+# 핸들러와 AI 결과 적용이 같은 게임을 동시에 바꾸지 않도록 스레드는 하나만 쓴다
+game_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='game')
+_loop = None
+
+# 이벤트 루프 모드에서는 AI 탐색을 게임 스레드에서 돌리지 않는다 (AI_WORKERS=0 이면 프로세스 하나)
+if game_app.AI_WORKERS <= 0:
+    game_app.AI_WORKERS = 1
+
+
+def _call_soon(coro):
+    # 게임 스레드에서 루프로 보낸다. 같은 스레드에서 보낸 것은 보낸 순서대로 실행된다.
+    asyncio.run_coroutine_threadsafe(coro, _loop)
+
+
+async def _enter_room(sid, room):
+    result = sio.enter_room(sid, room)
+    if inspect.isawaitable(result):
+        await result
+
+
+class AsyncTransport(game_app.Transport):
+    def emit(self, event, data, to):
+        _call_soon(sio.emit(event, data, to=to))
+
+    def enter_room(self, sid, room):
+        _call_soon(_enter_room(sid, room))
+
+    def dispatch(self, fn, *args):
+        game_executor.submit(fn, *args)
+
+
+async def run_game_task(fn, *args):
+    """게임 스레드에서 fn(*args) 를 실행하고 결과를 기다린다."""
+    global _loop
+    _loop = asyncio.get_running_loop()
+    return await _loop.run_in_executor(game_executor, fn, *args)
+
+
+def _register(event, handler):
+    if event == 'connect':
+        async def on_event(sid, environ, auth=None):
+            await run_game_task(handler, sid, None)
+    elif event == 'disconnect':
+        async def on_event(sid, *args):
+            await run_game_task(handler, sid, None)
+    else:
+        async def on_event(sid, data=None, *args):
+            await run_game_task(handler, sid, data)
+    sio.on(event, on_event)
+
+
+for _event, _handler in game_app.EVENT_HANDLERS.items():
+    _register(_event, _handler)
+game_app.transport = AsyncTransport()
+
+
+async def http_app(scope, receive, send):
+    """소켓이 아닌 HTTP 요청: /ping, /metrics (server.app 의 라우트와 같은 내용)."""
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                game_executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    routes = {'/ping': game_app.ping, '/metrics': game_app.metrics}
+    route = routes.get(scope['path'])
+    if route is None:
+        status, body = 404, {'error': 'not_found'}
+    else:
+        status, body = 200, await run_game_task(route)
+    payload = json.dumps(body).encode()
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+app = socketio.ASGIApp(sio, other_asgi_app=http_app)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', '5000')))
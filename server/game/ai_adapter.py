@@ -1,63 +1,235 @@
 import copy
 
+from server.game.attacks import piece_attacks, square, coords, iter_bits, KING_ATTACKS
+from server.game.bitboard import PIECE_TYPES, TYPE_INDEX
+
 def clone_game(game):
     return game.fast_clone()
 
-def get_all_actions(game, color, include_drops=True):
-    captures = []
-    quiet_moves = []
-    drops = []
+# MVV-LVA 정렬용 기물 서열 (값이 클수록 귀한 기물)
+ORDER_RANK = {'pawn': 1, 'knight': 2, 'bishop': 3, 'rook': 4, 'queen': 5, 'king': 6}
+
+BOARD_MASK = (1 << 64) - 1
+
+
+def _king_zone(sq):
+    # 킹 주변 2칸 (체비셰프 거리 2 이내)
+    zone = KING_ATTACKS[sq]
+    for s in iter_bits(zone):
+        zone |= KING_ATTACKS[s]
+    return zone & ~(1 << sq)
+
 
-    # 이동
-    for pid, p in game.pieces.items():
-        if p.color != color:
+KING_ZONE = [_king_zone(sq) for sq in range(64)]
+
+RANK_0 = 0xFF                 # y == 0
+RANK_7 = 0xFF << 56           # y == 7
+
+
+def iter_captures(game, color, quiet_out=None):
+    """잡는 수를 MVV-LVA (가장 귀한 기물을 가장 싼 기물로) 순서로 만든다.
+    quiet_out 리스트가 주어지면 조용한 수 생성을 위해 (pid, pos, 빈 칸 마스크)를 채운다.
+    이번 턴에 이미 행동했으면(action_done) 이동은 하나도 만들지 않는다."""
+    if game.action_done.get(color):
+        return
+    own = game.occupied[color]
+    enemy = game.occupied['b' if color == 'w' else 'w']
+    board = game.board
+    pieces = game.pieces
+    scored = []
+    for pid, p in pieces.items():
+        if p.color != color or p.pos is None:
             continue
+        if p.stun > 0 or p.move_stack < 1:
+            continue
+        sq = square(*p.pos)
+        mask = piece_attacks(p.type, sq, color, own, enemy) & ~own
+        if quiet_out is not None:
+            quiet_out.append((pid, p.pos, mask & ~enemy))
+        for to_sq in iter_bits(mask & enemy):
+            to = coords(to_sq)
+            victim = pieces[board[to[1]][to[0]]]
+            scored.append((-ORDER_RANK[victim.type], ORDER_RANK[p.type], len(scored), ("move", pid, p.pos, to)))
+    scored.sort()
+    for item in scored:
+        yield item[3]
+
+
+def drop_square_order(game, color, squares):
+    """드롭 후보 칸을 유망한 순서로 정렬한다.
+    상대 킹 근처(2칸 이내) +2, 자기 킹 근처 +1, 상대 기물이 공격하는 칸 +1."""
+    enemy_color = 'b' if color == 'w' else 'w'
+    own = game.occupied[color]
+    enemy = game.occupied[enemy_color]
+    near_enemy_king = near_own_king = attacked = 0
+    for p in game.pieces.values():
         if p.pos is None:
             continue
-        # Use pseudo-legal moves for AI efficiency. Negamax will punish suicide.
-        for to in game.get_pseudo_legal_moves(pid):
-            action = ("move", pid, p.pos, to)
-            # Check for capture using board directly for speed
-            # game.board[y][x] contains piece ID if occupied
-            if game.board[to[1]][to[0]] is not None:
-                captures.append(action)
+        sq = square(*p.pos)
+        if p.type == 'king':
+            zone = KING_ZONE[sq]
+            if p.color == enemy_color:
+                near_enemy_king |= zone
             else:
-                quiet_moves.append(action)
-
-    # 드롭
-    if not include_drops:
-        pass
-    else:
-        empty_squares = []
-        for y in range(8):
-            for x in range(8):
-                if game.pos_empty(x, y):
-                    empty_squares.append((x, y))
-
-        for pid in game.hands[color]:
-            piece = game.get_piece(pid)
-            if not piece:
-                continue
+                near_own_king |= zone
+        if p.color == enemy_color:
+            attacked |= piece_attacks(p.type, sq, enemy_color, enemy, own)
+    scored = []
+    for sq in iter_bits(squares):
+        b = 1 << sq
+        score = (2 if near_enemy_king & b else 0) + (1 if near_own_king & b else 0) + (1 if attacked & b else 0)
+        scored.append((-score, sq))
+    scored.sort()
+    return [sq for _, sq in scored]
+
+
+def drop_key(piece):
+    # 폰의 stun 은 착수 랭크로만 정해지고, 나머지는 max(1, stun)
+    return (piece.type, None if piece.type == 'pawn' else max(1, piece.stun))
+
 
-            # 첫 턴에는 킹만 드롭 가능
-            if not game.first_turn_done[color] and piece.type != 'king':
+def iter_drops(game, color, dedupe=True, width=None):
+    """드롭 수를 만든다.
+    dedupe: 같은 종류이고 드롭 후 stun 이 같은 기물(예: w_P0..w_P7)은 한 개만 낸다. 결과 포지션이 같기 때문.
+    width: 주어지면 drop_square_order 기준 상위 width 개 칸에만 드롭한다 (휴리스틱 가지치기).
+    이번 턴에 이미 드롭했으면(Game.dropped) 만들지 않는다."""
+    if game.dropped:
+        return
+    empty = ~(game.occupied['w'] | game.occupied['b']) & BOARD_MASK
+    first_turn_done = game.first_turn_done[color]
+    order = None
+    if width is not None:
+        order = drop_square_order(game, color, empty)[:width]
+        empty = 0
+        for sq in order:
+            empty |= 1 << sq
+    seen = set()
+    for pid in game.hands[color][:]:
+        piece = game.get_piece(pid)
+        if not piece:
+            continue
+
+        # 첫 턴에는 킹만 드롭 가능
+        if not first_turn_done and piece.type != 'king':
+            continue
+
+        if dedupe:
+            key = drop_key(piece)
+            if key in seen:
                 continue
+            seen.add(key)
 
-            for x, y in empty_squares:
-                # 폰 드롭 규칙
-                if piece.type == 'pawn':
-                    if color == 'w' and y == 7: # 백은 마지막 랭크에 드롭 불가
-                        continue
-                    if color == 'b' and y == 0: # 흑은 첫 랭크에 드롭 불가
-                        continue
-                
-                # 모든 조건을 통과하면 합법적인 드롭
-                drops.append(("drop", pid, (x, y)))
-            
-    # Move ordering: Captures -> Quiet -> Drops
+        squares = empty
+        if piece.type == 'pawn':
+            # 폰 드롭 규칙: 백은 마지막 랭크(y=7), 흑은 첫 랭크(y=0)에 드롭 불가
+            squares &= ~(RANK_7 if color == 'w' else RANK_0)
+        if order is None:
+            for sq in iter_bits(squares):
+                yield ("drop", pid, coords(sq))
+        else:
+            for sq in order:
+                if squares >> sq & 1:
+                    yield ("drop", pid, coords(sq))
+
+
+def iter_actions(game, color, include_drops=True, dedupe_drops=True, drop_width=None):
+    """단계별 지연 생성기: 잡는 수(MVV-LVA) -> 조용한 수 -> 드롭.
+    탐색이 다음 수를 요구할 때만 다음 단계를 계산하므로, 컷오프가 일찍 나면 드롭 목록은 만들지 않는다.
+    생성 도중 게임을 바꾸더라도(make/unmake) 다음 수를 요청하기 전에 원래대로 되돌려야 한다.
+    만드는 수는 모두 apply_action 이 받아들이는 수다 (stun, move_stack, action_done, dropped 반영)."""
+    quiet = []
+    # Use pseudo-legal moves for AI efficiency. Negamax will punish suicide.
+    yield from iter_captures(game, color, quiet)
+    for pid, frm, mask in quiet:
+        for sq in iter_bits(mask):
+            yield ("move", pid, frm, coords(sq))
     # Drops are usually less forcing than captures, and have huge branching factor.
     # Searching them last allows Alpha-Beta to prune them if a good move/capture is found first.
-    return captures + quiet_moves + drops
+    if include_drops:
+        yield from iter_drops(game, color, dedupe_drops, drop_width)
+
+
+def get_all_actions(game, color, include_drops=True, dedupe_drops=True, drop_width=None):
+    # Move ordering: Captures -> Quiet -> Drops
+    return list(iter_actions(game, color, include_drops, dedupe_drops, drop_width))
+
+
+def is_generated(game, color, action, include_drops=True):
+    """action 이 지금 iter_actions 가 만들어 낼 수인지 확인한다 (치환표/PV 수 검증용)."""
+    kind = action[0]
+    if kind == "move":
+        _, pid, frm, to = action
+        p = game.pieces.get(pid)
+        if p is None or p.color != color or p.pos != tuple(frm) or p.stun > 0 or p.move_stack < 1:
+            return False
+        if game.action_done.get(color):
+            return False
+        own = game.occupied[color]
+        enemy = game.occupied['b' if color == 'w' else 'w']
+        return bool((piece_attacks(p.type, square(*frm), color, own, enemy) & ~own) >> square(*to) & 1)
+    if kind == "drop":
+        if not include_drops or game.dropped:
+            return False
+        _, pid, to = action
+        p = game.pieces.get(pid)
+        if p is None or pid not in game.hands[color] or game.board[to[1]][to[0]] is not None:
+            return False
+        if not game.first_turn_done[color] and p.type != 'king':
+            return False
+        if p.type == 'pawn' and to[1] == (7 if color == 'w' else 0):
+            return False
+        # 중복 제거된 드롭이면 같은 종류 중 대표 기물만 생성된다
+        key = drop_key(p)
+        for other in game.hands[color]:
+            if drop_key(game.pieces[other]) == key:
+                return other == pid
+        return True
+    return False
+
+ACTION_DROP = 1 << 15
+DROP_STUN_MAX = 63      # 드롭 코드의 stun 필드 (6비트) 최댓값
+
+
+def _drop_stun_field(piece):
+    # drop_key 의 stun 부분. 폰은 착수 랭크로 정해지므로 0.
+    stun = drop_key(piece)[1]
+    return 0 if stun is None else min(stun, DROP_STUN_MAX)
+
+
+def encode_action(game, action):
+    """action 을 pid 와 무관한 16비트 코드로 바꾼다 (오프닝 북 등 포지션 키로 저장하는 곳에서 사용).
+    이동: 출발 칸 << 6 | 도착 칸.
+    드롭: ACTION_DROP | 드롭 후 stun (drop_key, 최대 DROP_STUN_MAX) << 9 | 종류 << 6 | 드롭 칸.
+    같은 종류라도 손패 stun 이 다르면 드롭 결과가 다르므로 stun 도 담는다."""
+    if action[0] == "move":
+        _, pid, frm, to = action
+        return square(*frm) << 6 | square(*to)
+    _, pid, to = action
+    piece = game.pieces[pid]
+    return ACTION_DROP | _drop_stun_field(piece) << 9 | TYPE_INDEX[piece.type] << 6 | square(*to)
+
+
+def decode_action(game, color, code):
+    """encode_action 의 역. 지금 포지션에서 iter_actions 가 만들 수가 아니면 None.
+    stun 필드가 상한이라 손패의 어느 기물인지 하나로 정해지지 않으면 None."""
+    to = coords(code & 63)
+    if code & ACTION_DROP:
+        ptype = PIECE_TYPES[code >> 6 & 7]
+        stun = code >> 9 & DROP_STUN_MAX
+        matches = [pid for pid in game.hands[color]
+                   if game.pieces[pid].type == ptype and _drop_stun_field(game.pieces[pid]) == stun]
+        if len({drop_key(game.pieces[pid]) for pid in matches}) != 1:
+            return None
+        for pid in matches:
+            if is_generated(game, color, ("drop", pid, to)):
+                return ("drop", pid, to)
+        return None
+    frm = coords(code >> 6 & 63)
+    pid = game.board[frm[1]][frm[0]]
+    if pid is None:
+        return None
+    action = ("move", pid, frm, to)
+    return action if is_generated(game, color, action) else None
 
 def apply_action(game, action):
     kind = action[0]
@@ -70,4 +242,4 @@ def apply_action(game, action):
         _, pid, to = action
         return game.drop_piece(game.turn, pid, to[0], to[1])
 
-    return False, "unknown action"
\ No newline at end of file
+    return False, "unknown action"
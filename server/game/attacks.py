@@ -0,0 +1,140 @@
+"""칸별로 미리 계산해 둔 공격 테이블.
+
+리퍼(나이트/킹/폰)는 칸 -> 공격 마스크 테이블을, 슬라이더(룩/비숍/퀸)는 각 라인(랭크,
+파일, 대각선, 반대각선)의 점유 비트를 키로 하는 룩업 테이블을 사용한다. 라인마다
+관련 비트가 최대 6개이므로 테이블 전체가 수만 개 정도로 작고 import 시 한 번만 만든다.
+"""
+
+
+def square(x, y):
+    return y * 8 + x
+
+
+def coords(sq):
+    return sq & 7, sq >> 3
+
+
+def iter_bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _leaper_table(deltas):
+    table = []
+    for sq in range(64):
+        x, y = coords(sq)
+        mask = 0
+        for dx, dy in deltas:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < 8 and 0 <= ny < 8:
+                mask |= 1 << square(nx, ny)
+        table.append(mask)
+    return table
+
+
+KNIGHT_ATTACKS = _leaper_table([(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+                                (1, -2), (1, 2), (2, -1), (2, 1)])
+KING_ATTACKS = _leaper_table([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy])
+
+# 흑은 y 가 증가하는 방향, 백은 y 가 감소하는 방향으로 전진한다.
+PAWN_PUSH = {'w': _leaper_table([(0, -1)]), 'b': _leaper_table([(0, 1)])}
+PAWN_CAPTURES = {'w': _leaper_table([(-1, -1), (1, -1)]), 'b': _leaper_table([(-1, 1), (1, 1)])}
+
+
+def _ray(sq, dx, dy):
+    x, y = coords(sq)
+    squares = []
+    x += dx; y += dy
+    while 0 <= x < 8 and 0 <= y < 8:
+        squares.append(square(x, y))
+        x += dx; y += dy
+    return squares
+
+
+def _line_tables(directions):
+    """각 칸에 대해 (관련 점유 마스크, {점유 부분집합: 공격 마스크}) 를 만든다."""
+    masks = []
+    lookups = []
+    for sq in range(64):
+        rays = [_ray(sq, dx, dy) for dx, dy in directions]
+        # 라인 끝 칸은 막혀 있든 아니든 공격 결과가 같으므로 관련 비트에서 뺀다.
+        relevant = 0
+        for r in rays:
+            for s in r[:-1]:
+                relevant |= 1 << s
+        bits = list(iter_bits(relevant))
+        lookup = {}
+        for index in range(1 << len(bits)):
+            occ = 0
+            for i, s in enumerate(bits):
+                if index >> i & 1:
+                    occ |= 1 << s
+            attack = 0
+            for r in rays:
+                for s in r:
+                    attack |= 1 << s
+                    if occ >> s & 1:
+                        break
+            lookup[occ] = attack
+        masks.append(relevant)
+        lookups.append(lookup)
+    return masks, lookups
+
+
+RANK_MASK, RANK_ATTACKS = _line_tables([(1, 0), (-1, 0)])
+FILE_MASK, FILE_ATTACKS = _line_tables([(0, 1), (0, -1)])
+DIAG_MASK, DIAG_ATTACKS = _line_tables([(1, 1), (-1, -1)])
+ANTI_MASK, ANTI_ATTACKS = _line_tables([(1, -1), (-1, 1)])
+
+
+def rook_attacks(sq, occ):
+    return RANK_ATTACKS[sq][occ & RANK_MASK[sq]] | FILE_ATTACKS[sq][occ & FILE_MASK[sq]]
+
+
+def bishop_attacks(sq, occ):
+    return DIAG_ATTACKS[sq][occ & DIAG_MASK[sq]] | ANTI_ATTACKS[sq][occ & ANTI_MASK[sq]]
+
+
+def queen_attacks(sq, occ):
+    return rook_attacks(sq, occ) | bishop_attacks(sq, occ)
+
+
+def pawn_targets(sq, color, own, enemy):
+    """폰이 갈 수 있는 칸: 빈 칸으로 한 칸 전진, 적 기물이 있는 대각선 앞."""
+    return (PAWN_PUSH[color][sq] & ~(own | enemy)) | (PAWN_CAPTURES[color][sq] & enemy)
+
+
+def piece_attacks(ptype, sq, color, own, enemy):
+    """기물이 기하학적으로 닿는 칸 마스크. 자기 기물 칸도 포함된다 (폰 제외)."""
+    if ptype == 'knight':
+        return KNIGHT_ATTACKS[sq]
+    if ptype == 'king':
+        return KING_ATTACKS[sq]
+    if ptype == 'pawn':
+        return pawn_targets(sq, color, own, enemy)
+    occ = own | enemy
+    if ptype == 'rook':
+        return rook_attacks(sq, occ)
+    if ptype == 'bishop':
+        return bishop_attacks(sq, occ)
+    return queen_attacks(sq, occ)
+
+
+def occupancy(board):
+    """board(BoardView 또는 8x8 Piece 그리드)에서 (백 점유, 흑 점유) 마스크를 얻는다."""
+    occupied = getattr(board, 'occupied', None)
+    if occupied is not None:
+        return occupied['w'], occupied['b']
+    w = b = 0
+    for y in range(8):
+        row = board[y]
+        for x in range(8):
+            p = row[x]
+            if p is not None:
+                if p.color == 'w':
+                    w |= 1 << (y * 8 + x)
+                else:
+                    b |= 1 << (y * 8 + x)
+    return w, b
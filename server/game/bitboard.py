@@ -0,0 +1,208 @@
+"""비트보드 기반의 압축 포지션 표현.
+
+`Game` 은 8x8 리스트와 Piece 객체를 그대로 유지하고, 탐색/직렬화처럼 많이 복사되는
+경로에서는 이 모듈의 `Position` 을 사용한다. 칸 번호는 sq = y * 8 + x 이다.
+"""
+from server.game.attacks import square, iter_bits, piece_attacks
+
+COLORS = ('w', 'b')
+COLOR_INDEX = {'w': 0, 'b': 1}
+PIECE_TYPES = ('pawn', 'knight', 'bishop', 'rook', 'queen', 'king')
+TYPE_INDEX = {t: i for i, t in enumerate(PIECE_TYPES)}
+
+FULL = (1 << 64) - 1
+
+
+def mask_index(color, ptype):
+    return COLOR_INDEX[color] * 6 + TYPE_INDEX[ptype]
+
+
+class Position:
+    """색/기물 종류별 64비트 점유 마스크와 칸별 stun/move_stack 배열."""
+
+    def __init__(self):
+        self.masks = [0] * 12            # color_index * 6 + type_index
+        self.occ = [0, 0]                # 'w', 'b'
+        self.ids = [None] * 64
+        self.stun = [0] * 64
+        self.move_stack = [0] * 64
+        self.types = {}                  # pid -> type, Game.pieces 순서 유지
+        self.hands = {'w': [], 'b': []}
+        self.hand_stun = {}              # 손에 든 기물의 stun (stack_add 로 쌓일 수 있음)
+        self.turn = 'w'
+        self.first_turn_done = {'w': False, 'b': False}
+        self.action_done = {}
+        self.dropped = False
+
+    # ----- adapter -----
+    @classmethod
+    def from_game(cls, game):
+        pos = cls()
+        for pid, p in game.pieces.items():
+            pos.types[pid] = p.type
+            if p.pos is not None:
+                pos._put(square(*p.pos), pid, p.color, p.type)
+                sq = square(*p.pos)
+                pos.stun[sq] = p.stun
+                pos.move_stack[sq] = p.move_stack
+            elif p.stun:
+                pos.hand_stun[pid] = p.stun
+        pos.hands = {'w': game.hands['w'][:], 'b': game.hands['b'][:]}
+        pos.turn = game.turn
+        pos.first_turn_done = dict(game.first_turn_done)
+        pos.action_done = dict(game.action_done)
+        pos.dropped = game.dropped
+        return pos
+
+    def to_game(self, game_id=None, history=None):
+        from server.game.core import Game
+        return Game.from_position(self, game_id=game_id, history=history)
+
+    def copy(self):
+        new = Position.__new__(Position)
+        new.masks = self.masks[:]
+        new.occ = self.occ[:]
+        new.ids = self.ids[:]
+        new.stun = self.stun[:]
+        new.move_stack = self.move_stack[:]
+        new.types = self.types      # promote() 에서만 바뀌며, 그때 복사한다
+        new.hands = {'w': self.hands['w'][:], 'b': self.hands['b'][:]}
+        new.hand_stun = self.hand_stun.copy()
+        new.turn = self.turn
+        new.first_turn_done = self.first_turn_done.copy()
+        new.action_done = self.action_done.copy()
+        new.dropped = self.dropped
+        return new
+
+    # ----- queries -----
+    def color_at(self, sq):
+        b = 1 << sq
+        if self.occ[0] & b:
+            return 'w'
+        if self.occ[1] & b:
+            return 'b'
+        return None
+
+    def type_at(self, sq):
+        pid = self.ids[sq]
+        return self.types[pid] if pid is not None else None
+
+    def piece_color(self, pid):
+        for color in COLORS:
+            if pid in self.hands[color]:
+                return color
+        for sq in range(64):
+            if self.ids[sq] == pid:
+                return self.color_at(sq)
+        return None
+
+    def occupied(self):
+        return self.occ[0] | self.occ[1]
+
+    def targets(self, sq):
+        """해당 칸 기물이 기하학적으로 갈 수 있는 칸 마스크 (자기 기물 칸 제외)."""
+        color = self.color_at(sq)
+        if color is None:
+            return 0
+        i = COLOR_INDEX[color]
+        own = self.occ[i]
+        return piece_attacks(self.types[self.ids[sq]], sq, color, own, self.occ[1 - i]) & ~own
+
+    def pseudo_legal_moves(self, sq):
+        # Game.get_pseudo_legal_moves 와 동일한 조건
+        if self.ids[sq] is None or self.stun[sq] > 0 or self.move_stack[sq] < 1:
+            return []
+        return list(iter_bits(self.targets(sq)))
+
+    # ----- mutation -----
+    def _put(self, sq, pid, color, ptype):
+        b = 1 << sq
+        self.masks[mask_index(color, ptype)] |= b
+        self.occ[COLOR_INDEX[color]] |= b
+        self.ids[sq] = pid
+
+    def _remove(self, sq):
+        pid = self.ids[sq]
+        color = self.color_at(sq)
+        b = 1 << sq
+        self.masks[mask_index(color, self.types[pid])] &= ~b
+        self.occ[COLOR_INDEX[color]] &= ~b
+        self.ids[sq] = None
+        self.stun[sq] = 0
+        self.move_stack[sq] = 0
+        return pid, color
+
+    def drop(self, color, pid, sq):
+        if self.dropped:
+            return False, "already dropped"
+        if pid not in self.hands[color]:
+            return False, "you don't own that piece"
+        ptype = self.types[pid]
+        if not self.first_turn_done[color] and ptype != 'king':
+            return False, "drop king first"
+        if not 0 <= sq < 64:
+            return False, "invalid coords"
+        if self.ids[sq] is not None:
+            return False, "target occupied"
+        y = sq >> 3
+        if ptype == 'pawn':
+            if color == 'w' and y == 7: return False, "white cannot drop pawn on last rank"
+            if color == 'b' and y == 0: return False, "black cannot drop pawn on first rank"
+            stun = (y if y <= 6 else 1) if color == 'w' else ((7 - y) if y >= 1 else 1)
+        else:
+            stun = max(1, self.hand_stun.pop(pid, 0))
+        self.hand_stun.pop(pid, None)
+        self._put(sq, pid, color, ptype)
+        self.stun[sq] = stun
+        self.move_stack[sq] = 0
+        self.hands[color].remove(pid)
+        self.first_turn_done[color] = True
+        self.dropped = True
+        return True, "dropped"
+
+    def move(self, color, frm, to):
+        if not (0 <= frm < 64 and 0 <= to < 64): return False, "invalid coords"
+        if self.ids[frm] is None: return False, "source mismatch"
+        if self.color_at(frm) != color: return False, "not your piece"
+        if self.stun[frm] > 0:
+            return False, f"piece stunned. remain stun stack : {self.stun[frm]}"
+        if self.color_at(to) == color:
+            return False, "cannot capture own piece"
+        if not self.targets(frm) >> to & 1:
+            return False, "illegal move for piece"
+        stun = self.stun[frm]
+        stack = self.move_stack[frm]
+        is_win = False
+        if self.ids[to] is not None:
+            is_win = self.types[self.ids[to]] == 'king'
+            stun += self.stun[to]
+            stack += self.move_stack[to]
+            target_id, _ = self._remove(to)
+            self.hands[color].append(target_id)
+        pid, _ = self._remove(frm)
+        self._put(to, pid, color, self.types[pid])
+        self.stun[to] = stun
+        self.move_stack[to] = stack - 1
+        return True, ("win" if is_win else "moved")
+
+    def promote(self, sq):
+        # 폰 승급: 같은 id 의 퀸으로 교체 (server.app 의 승급 규칙과 동일)
+        pid = self.ids[sq]
+        color = self.color_at(sq)
+        self._remove(sq)
+        self.types = dict(self.types)
+        self.types[pid] = 'queen'
+        self._put(sq, pid, color, 'queen')
+        self.stun[sq] = 0
+        self.move_stack[sq] = 5
+
+    def end_turn(self):
+        stun = self.stun
+        for sq in iter_bits(self.occ[0] | self.occ[1]):
+            if stun[sq] > 0:
+                stun[sq] -= 1
+                self.move_stack[sq] += 1
+        self.turn = 'b' if self.turn == 'w' else 'w'
+        self.action_done = {}
+        self.dropped = False
+
@@ -0,0 +1,200 @@
+"""고정 레이아웃 이진 포지션/수 인코딩.
+
+Game.to_json 은 기물마다 문자열 dict 를 만들어 크고 느리다. 같은 정보를 고정 크기 바이트열로 담아
+Socket.IO 이진 페이로드, AI 워커 프로세스 사이 전달, 디스크 레코드에 같이 쓴다.
+
+포지션 (리틀 엔디언, POSITION_SIZE = 328 바이트)
+  헤더 8바이트: b'SP' | 버전 u8 | 차례 u8 (0 백, 1 흑) | 플래그 u8 | 예약 3바이트
+      플래그: 1 백 첫 턴 완료, 2 흑 첫 턴 완료, 4 백 행동함, 8 흑 행동함, 16 이번 턴 드롭함
+  보드 64바이트: 칸(sq = y * 8 + x)마다 기물 번호, 빈 칸은 0xFF
+  기물 32 x 8바이트 (기물 번호 = PIECE_IDS 순서):
+      종류 u8 (PIECE_TYPES) | 색 u8 | 칸 u8 (손패면 0xFF) | 손패 순서 u8 (보드 위면 0xFF) | move_stack i16 | stun u16
+수 (u16): ai_adapter.encode_action 의 포지션 기준 코드.
+
+decode 는 bytes/bytearray/mmap/memoryview 를 그대로 받아 struct.unpack_from 으로 필요한 부분만 읽는다.
+"""
+import struct
+
+from server.game.bitboard import Position, PIECE_TYPES, TYPE_INDEX, COLORS, COLOR_INDEX
+from server.game.attacks import square
+
+MAGIC = b'SP'
+VERSION = 1
+HEADER = struct.Struct('<2sBBB3x')
+BOARD = struct.Struct('<64B')
+PIECE = struct.Struct('<BBBBhH')
+ACTION = struct.Struct('<H')
+NONE = 0xFF
+
+FIRST_TURN_FLAGS = {'w': 1, 'b': 2}
+ACTION_DONE_FLAGS = {'w': 4, 'b': 8}
+DROPPED_FLAG = 16
+
+
+def _piece_ids():
+    from server.game.core import Game
+    return tuple(Game().pieces)
+
+
+PIECE_IDS = _piece_ids()            # Game.init_piece 순서
+PIECE_INDEX = {pid: i for i, pid in enumerate(PIECE_IDS)}
+BOARD_OFFSET = HEADER.size
+PIECES_OFFSET = BOARD_OFFSET + BOARD.size
+POSITION_SIZE = PIECES_OFFSET + len(PIECE_IDS) * PIECE.size
+
+
+def _flags(first_turn_done, action_done, dropped):
+    flags = DROPPED_FLAG if dropped else 0
+    for color in COLORS:
+        if first_turn_done.get(color):
+            flags |= FIRST_TURN_FLAGS[color]
+        if action_done.get(color):
+            flags |= ACTION_DONE_FLAGS[color]
+    return flags
+
+
+def encode_game(game):
+    """Game -> POSITION_SIZE 바이트. history 와 게임 id 는 담지 않는다."""
+    buf = bytearray(POSITION_SIZE)
+    HEADER.pack_into(buf, 0, MAGIC, VERSION, COLOR_INDEX[game.turn],
+                     _flags(game.first_turn_done, game.action_done, game.dropped))
+    board = [NONE] * 64
+    slots = {pid: i for color in COLORS for i, pid in enumerate(game.hands[color])}
+    for pid, p in game.pieces.items():
+        index = PIECE_INDEX[pid]
+        if p.pos is not None:
+            sq = square(*p.pos)
+            board[sq] = index
+            PIECE.pack_into(buf, PIECES_OFFSET + index * PIECE.size, TYPE_INDEX[p.type], COLOR_INDEX[p.color],
+                            sq, NONE, p.move_stack, p.stun)
+        else:
+            PIECE.pack_into(buf, PIECES_OFFSET + index * PIECE.size, TYPE_INDEX[p.type], COLOR_INDEX[p.color],
+                            NONE, slots[pid], p.move_stack, p.stun)
+    BOARD.pack_into(buf, BOARD_OFFSET, *board)
+    return bytes(buf)
+
+
+def encode_position(pos):
+    """Position -> POSITION_SIZE 바이트 (encode_game 과 같은 결과)."""
+    buf = bytearray(POSITION_SIZE)
+    HEADER.pack_into(buf, 0, MAGIC, VERSION, COLOR_INDEX[pos.turn],
+                     _flags(pos.first_turn_done, pos.action_done, pos.dropped))
+    board = [NONE] * 64
+    for sq, pid in enumerate(pos.ids):
+        if pid is None:
+            continue
+        index = PIECE_INDEX[pid]
+        board[sq] = index
+        PIECE.pack_into(buf, PIECES_OFFSET + index * PIECE.size, TYPE_INDEX[pos.types[pid]],
+                        COLOR_INDEX[pos.color_at(sq)], sq, NONE, pos.move_stack[sq], pos.stun[sq])
+    for color in COLORS:
+        for slot, pid in enumerate(pos.hands[color]):
+            PIECE.pack_into(buf, PIECES_OFFSET + PIECE_INDEX[pid] * PIECE.size, TYPE_INDEX[pos.types[pid]],
+                            COLOR_INDEX[color], NONE, slot, 0, pos.hand_stun.get(pid, 0))
+    BOARD.pack_into(buf, BOARD_OFFSET, *board)
+    return bytes(buf)
+
+
+class PositionView:
+    """버퍼 위의 읽기 전용 뷰. 복사하지 않고, 요청한 칸/기물만 그때 푼다."""
+    __slots__ = ('buf', 'offset', 'turn', 'flags')
+
+    def __init__(self, buf, offset=0):
+        self.buf = memoryview(buf)
+        self.offset = offset
+        if len(self.buf) < offset + POSITION_SIZE:
+            raise ValueError("truncated position record")
+        magic, version, turn, flags = HEADER.unpack_from(self.buf, offset)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a position record")
+        self.turn = COLORS[turn]
+        self.flags = flags
+
+    def first_turn_done(self, color):
+        return bool(self.flags & FIRST_TURN_FLAGS[color])
+
+    def action_done(self, color):
+        return bool(self.flags & ACTION_DONE_FLAGS[color])
+
+    @property
+    def dropped(self):
+        return bool(self.flags & DROPPED_FLAG)
+
+    def piece(self, index):
+        """(pid, 종류, 색, 칸 또는 None, 손패 순서 또는 None, stun, move_stack)"""
+        ptype, color, sq, slot, move_stack, stun = PIECE.unpack_from(self.buf, self.offset + PIECES_OFFSET
+                                                                     + index * PIECE.size)
+        return (PIECE_IDS[index], PIECE_TYPES[ptype], COLORS[color], None if sq == NONE else sq,
+                None if slot == NONE else slot, stun, move_stack)
+
+    def piece_at(self, sq):
+        index = self.buf[self.offset + BOARD_OFFSET + sq]
+        return None if index == NONE else self.piece(index)
+
+    def to_position(self):
+        pos = Position()
+        hands = {'w': [], 'b': []}
+        for index in range(len(PIECE_IDS)):
+            pid, ptype, color, sq, slot, stun, move_stack = self.piece(index)
+            pos.types[pid] = ptype
+            if sq is not None:
+                pos._put(sq, pid, color, ptype)
+                pos.stun[sq] = stun
+                pos.move_stack[sq] = move_stack
+            else:
+                hands[color].append((slot, pid))
+                if stun:
+                    pos.hand_stun[pid] = stun
+        pos.hands = {color: [pid for _, pid in sorted(hands[color])] for color in COLORS}
+        pos.turn = self.turn
+        pos.first_turn_done = {color: self.first_turn_done(color) for color in COLORS}
+        pos.action_done = {color: True for color in COLORS if self.action_done(color)}
+        pos.dropped = self.dropped
+        return pos
+
+
+def decode_position(buf, offset=0):
+    return PositionView(buf, offset).to_position()
+
+
+def decode_game(buf, game_id=None, offset=0):
+    return decode_position(buf, offset).to_game(game_id=game_id)
+
+
+def is_encoded(obj):
+    return isinstance(obj, (bytes, bytearray, memoryview))
+
+
+# ---- 수 ----
+
+def encode_actions(game, actions):
+    """action 목록 -> u16 코드 배열 (2바이트씩)."""
+    from server.game.ai_adapter import encode_action
+    return b''.join(ACTION.pack(encode_action(game, a)) for a in actions)
+
+
+def decode_actions(game, color, buf):
+    """u16 코드 배열 -> action 목록. 지금 포지션에서 만들어지지 않는 코드는 None."""
+    from server.game.ai_adapter import decode_action
+    return [decode_action(game, color, code) for (code,) in ACTION.iter_unpack(memoryview(buf))]
+
+
+# ---- 디스크 레코드 ----
+
+def write_records(path, games):
+    """포지션들을 고정 크기 레코드로 이어 쓴다. 쓴 개수를 돌려준다."""
+    count = 0
+    with open(path, 'wb') as f:
+        for game in games:
+            f.write(encode_game(game))
+            count += 1
+    return count
+
+
+def iter_records(buf):
+    """이어 쓴 레코드 버퍼(bytes 나 mmap)에서 PositionView 를 차례로 낸다 (복사 없음)."""
+    view = memoryview(buf)
+    if len(view) % POSITION_SIZE:
+        raise ValueError("truncated position record")
+    for offset in range(0, len(view), POSITION_SIZE):
+        yield PositionView(view, offset)
@@ -1,6 +1,18 @@
-import copy
 import uuid
+from server.game.bitboard import Position, COLOR_INDEX, square, iter_bits
+from server.game import zobrist
+from server.game.pst import (SQUARE_SCORES, compute_score, count_kings, stasis_score, hand_score,
+                             compute_stasis)
+from server.game.attacks import (coords, KNIGHT_ATTACKS, KING_ATTACKS, rook_attacks, bishop_attacks,
+                                 queen_attacks, pawn_targets, occupancy)
+
+BOARD_MASK = (1 << 64) - 1
+RANK_MASKS = [0xFF << (8 * y) for y in range(8)]
+
 class Piece:
+    # __dict__ 없는 고정 레코드. 게임/탐색 복제본마다 기물 32개가 생기므로 크기와 복사 비용이 중요하다.
+    __slots__ = ('id', 'type', 'color', 'pos', 'stun', 'move_stack')
+
     def __init__(self, id, type, color, pos=None):
         self.id = id
         self.type = type            # 'pawn','rook','knight','bishop','queen','king'
@@ -47,158 +59,107 @@ class Piece:
             self.move_stack += 1
 
     def clone(self):
-        # Create a new instance of the same class
-        new_piece = self.__class__(self.id, self.color, self.pos)
+        # __init__ 을 거치지 않고 슬롯만 옮긴다 (fast_clone 의 복사 경로)
+        new_piece = object.__new__(self.__class__)
+        new_piece.id = self.id
         new_piece.type = self.type
+        new_piece.color = self.color
+        new_piece.pos = self.pos
         new_piece.stun = self.stun
         new_piece.move_stack = self.move_stack
         return new_piece
 
 class Knight(Piece):
+    __slots__ = ()
+
     def __init__(self, id, color, pos=None):
         super().__init__(id, 'knight', color, pos)
 
     def can_move(self, frm, to, board):
-        dx = abs(frm[0]-to[0]); dy = abs(frm[1]-to[1])
-        return (dx==1 and dy==2) or (dx==2 and dy==1)
+        return bool(KNIGHT_ATTACKS[square(*frm)] >> square(*to) & 1)
 
     def get_possible_moves(self, frm, board):
-        moves = []
-        x, y = frm
-        deltas = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
-                  (1, -2), (1, 2), (2, -1), (2, 1)]
-        for dx, dy in deltas:
-            nx, ny = x + dx, y + dy
-            if 0 <= nx < 8 and 0 <= ny < 8:
-                moves.append((nx, ny))
-        return moves
+        own = occupancy(board)[COLOR_INDEX[self.color]]
+        return [coords(sq) for sq in iter_bits(KNIGHT_ATTACKS[square(*frm)] & ~own)]
 
 class Rook(Piece):
+    __slots__ = ()
+
     def __init__(self, pid, color, pos=None):
         super().__init__(pid, 'rook', color, pos)
 
     def can_move(self, frm, to, board):
-        if frm[0]!=to[0] and frm[1]!=to[1]: return False
-        dx = 0 if frm[0]==to[0] else (1 if to[0]>frm[0] else -1)
-        dy = 0 if frm[1]==to[1] else (1 if to[1]>frm[1] else -1)
-        x,y = frm[0]+dx, frm[1]+dy
-        while (x,y)!=to:
-            if board[y][x] is not None: return False
-            x+=dx; y+=dy
-        return True
+        w, b = occupancy(board)
+        return bool(rook_attacks(square(*frm), w | b) >> square(*to) & 1)
 
     def get_possible_moves(self, frm, board):
-        moves = []
-        x, y = frm
-        directions = [(0, 1), (0, -1), (1, 0), (-1, 0)]
-        for dx, dy in directions:
-            nx, ny = x + dx, y + dy
-            while 0 <= nx < 8 and 0 <= ny < 8:
-                if board[ny][nx] is not None:
-                    if board[ny][nx].color != self.color:
-                        moves.append((nx, ny))
-                    break
-                moves.append((nx, ny))
-                nx += dx
-                ny += dy
-        return moves
+        occ = occupancy(board)
+        own = occ[COLOR_INDEX[self.color]]
+        return [coords(sq) for sq in iter_bits(rook_attacks(square(*frm), occ[0] | occ[1]) & ~own)]
 
 class Bishop(Piece):
+    __slots__ = ()
+
     def __init__(self, pid, color, pos=None):
         super().__init__(pid, 'bishop', color, pos)
 
     def can_move(self, frm, to, board):
-        dx = to[0]-frm[0]; dy = to[1]-frm[1]
-        if abs(dx) != abs(dy): return False
-        sx = 1 if dx>0 else -1
-        sy = 1 if dy>0 else -1
-        x,y = frm[0]+sx, frm[1]+sy
-        while (x,y)!=to:
-            if board[y][x] is not None: return False
-            x+=sx; y+=sy
-        return True
+        w, b = occupancy(board)
+        return bool(bishop_attacks(square(*frm), w | b) >> square(*to) & 1)
 
     def get_possible_moves(self, frm, board):
-        moves = []
-        x, y = frm
-        directions = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
-        for dx, dy in directions:
-            nx, ny = x + dx, y + dy
-            while 0 <= nx < 8 and 0 <= ny < 8:
-                if board[ny][nx] is not None:
-                    if board[ny][nx].color != self.color:
-                        moves.append((nx, ny))
-                    break
-                moves.append((nx, ny))
-                nx += dx
-                ny += dy
-        return moves
+        occ = occupancy(board)
+        own = occ[COLOR_INDEX[self.color]]
+        return [coords(sq) for sq in iter_bits(bishop_attacks(square(*frm), occ[0] | occ[1]) & ~own)]
 
 class Queen(Piece):
+    __slots__ = ()
+
     def __init__(self, pid, color, pos=None):
         super().__init__(pid, 'queen', color, pos)
 
     def can_move(self, frm, to, board):
-        r = Rook('temp',self.color); b = Bishop('temp',self.color)
-        return r.can_move(frm,to,board) or b.can_move(frm,to,board)
+        w, b = occupancy(board)
+        return bool(queen_attacks(square(*frm), w | b) >> square(*to) & 1)
 
     def get_possible_moves(self, frm, board):
-        r = Rook('temp', self.color)
-        b = Bishop('temp', self.color)
-        return r.get_possible_moves(frm, board) + b.get_possible_moves(frm, board)
+        occ = occupancy(board)
+        own = occ[COLOR_INDEX[self.color]]
+        return [coords(sq) for sq in iter_bits(queen_attacks(square(*frm), occ[0] | occ[1]) & ~own)]
 
 class King(Piece):
+    __slots__ = ()
+
     def __init__(self, pid, color, pos=None):
         super().__init__(pid, 'king', color, pos)
 
     def can_move(self, frm, to, board):
-        dx = abs(frm[0]-to[0]); dy = abs(frm[1]-to[1])
-        return max(dx,dy) == 1
+        return bool(KING_ATTACKS[square(*frm)] >> square(*to) & 1)
 
     def get_possible_moves(self, frm, board):
-        moves = []
-        x, y = frm
-        for dx in [-1, 0, 1]:
-            for dy in [-1, 0, 1]:
-                if dx == 0 and dy == 0:
-                    continue
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < 8 and 0 <= ny < 8:
-                    moves.append((nx, ny))
-        return moves
+        own = occupancy(board)[COLOR_INDEX[self.color]]
+        return [coords(sq) for sq in iter_bits(KING_ATTACKS[square(*frm)] & ~own)]
 
 class Pawn(Piece):
+    __slots__ = ()
+
     def __init__(self, pid, color, pos=None):
         super().__init__(pid, 'pawn', color, pos)
 
     def can_move(self, frm, to, board):
-        dir = 1 if self.color=='b' else -1
-        if to[0]==frm[0] and to[1]==frm[1]+dir:
-            return board[to[1]][to[0]] is None
-        
-        if abs(to[0]-frm[0])==1 and to[1]==frm[1]+dir:
-            target = board[to[1]][to[0]]
-            return (target is not None) and (target.color != self.color)
-        return False
+        occ = occupancy(board)
+        i = COLOR_INDEX[self.color]
+        return bool(pawn_targets(square(*frm), self.color, occ[i], occ[1 - i]) >> square(*to) & 1)
 
     def get_possible_moves(self, frm, board):
-        moves = []
-        x, y = frm
-        dir = 1 if self.color == 'b' else -1
-
-        # Forward move
-        if 0 <= y + dir < 8 and board[y + dir][x] is None:
-            moves.append((x, y + dir))
-
-        # Capture moves
-        for dx in [-1, 1]:
-            if 0 <= x + dx < 8 and 0 <= y + dir < 8:
-                target = board[y + dir][x + dx]
-                if target is not None and target.color != self.color:
-                    moves.append((x + dx, y + dir))
-        return moves
+        occ = occupancy(board)
+        i = COLOR_INDEX[self.color]
+        return [coords(sq) for sq in iter_bits(pawn_targets(square(*frm), self.color, occ[i], occ[1 - i]))]
 
 class Game:
+    __slots__ = ('id', 'turn', 'board', 'pieces', 'hands', 'history', 'first_turn_done', 'action_done', 'dropped',
+                 'occupied', 'hash', 'score', 'king_count', 'stasis', 'version', 'legal_cache')
+
     def __init__(self):
         self.id = str(uuid.uuid4())[:8]
         self.turn = 'w'
@@ -209,24 +170,35 @@ class Game:
         self.first_turn_done = {'w':False,'b':False}
         self.action_done = {}
         self.dropped = False
+        self.occupied = {'w': 0, 'b': 0}   # 색별 점유 비트마스크 (board 와 함께 갱신)
 
         self.init_piece()
+        # 이후로는 모두 증분 갱신
+        self.hash = zobrist.compute_hash(self)
+        self.score = compute_score(self)          # 보드 위 기물 가치+PST 합 (백 기준)
+        self.king_count = count_kings(self)       # 색별 생존 킹 수 (보드 위 또는 주인의 손)
+        self.stasis = compute_stasis(self)        # 확장 평가 항 합: 손패, stun, move_stack (백 기준)
+        self.version = 0                          # 상태를 바꾸는 메서드마다 1 씩 증가
+        self.legal_cache = (None, {})             # (version, {pid: 합법 수, None: legal_map}) 캐시
 
     def fast_clone(self):
         new_game = Game.__new__(Game) # Skip init
         new_game.id = self.id
         new_game.turn = self.turn
         
-        # Optimize: reuse immutable pieces if possible, or use fast shallow copy?
         # Since pieces are mutable (pos, stun), we must copy them.
-        # But copy.copy is faster than class instantiation
-        new_game.pieces = {}
-        for pid, p in self.pieces.items():
-            new_game.pieces[pid] = copy.copy(p)
-            
+        new_game.pieces = {pid: p.clone() for pid, p in self.pieces.items()}
+
         # Optimize: Copy board directly instead of rebuilding
         # self.board is list of lists of strings (immutable)
         new_game.board = [row[:] for row in self.board]
+        new_game.occupied = self.occupied.copy()
+        new_game.hash = self.hash
+        new_game.score = self.score
+        new_game.king_count = self.king_count.copy()
+        new_game.stasis = self.stasis
+        new_game.version = self.version
+        new_game.legal_cache = (None, {})
                 
         # Copy hands (list of strings)
         new_game.hands = {'w': self.hands['w'][:], 'b': self.hands['b'][:]}
@@ -236,9 +208,51 @@ class Game:
         
         new_game.first_turn_done = self.first_turn_done.copy()
         new_game.action_done = self.action_done.copy()
+        new_game.dropped = self.dropped
         
         return new_game
 
+    def to_position(self):
+        return Position.from_game(self)
+
+    @classmethod
+    def from_position(cls, position, game_id=None, history=None):
+        # Position -> Game 어댑터. history 는 Position 에 담기지 않으므로 따로 받는다.
+        game = cls.__new__(cls)
+        game.id = game_id or str(uuid.uuid4())[:8]
+        game.turn = position.turn
+        game.board = [[None for _ in range(8)] for _ in range(8)]
+        game.pieces = {}
+        for pid, ptype in position.types.items():
+            game.pieces[pid] = PIECE_CLASSES[ptype](pid, None)
+            game.pieces[pid].stun = position.hand_stun.get(pid, 0)
+        for color in ('w', 'b'):
+            for pid in position.hands[color]:
+                game.pieces[pid].color = color
+        for sq, pid in enumerate(position.ids):
+            if pid is None:
+                continue
+            p = game.pieces[pid]
+            x, y = coords(sq)
+            p.color = position.color_at(sq)
+            p.pos = (x, y)
+            p.stun = position.stun[sq]
+            p.move_stack = position.move_stack[sq]
+            game.board[y][x] = pid
+        game.hands = {'w': position.hands['w'][:], 'b': position.hands['b'][:]}
+        game.history = history if history is not None else []
+        game.first_turn_done = dict(position.first_turn_done)
+        game.action_done = dict(position.action_done)
+        game.dropped = position.dropped
+        game.occupied = {'w': position.occ[0], 'b': position.occ[1]}
+        game.hash = zobrist.compute_hash(game)
+        game.score = compute_score(game)
+        game.king_count = count_kings(game)
+        game.stasis = compute_stasis(game)
+        game.version = 0
+        game.legal_cache = (None, {})
+        return game
+
     def init_piece(self):
         def add_piece(ptype, cnt, color):
             for i in range(cnt):
@@ -287,11 +301,8 @@ class Game:
         return self.pieces.get(id)
 
     def drop_piece(self, player_color, id, x,y):
-        try:
-            if self.dropped:
-                return False, "already dropped"
-        except AttributeError:
-            self.dropped = True
+        if self.dropped:
+            return False, "already dropped"
         if id not in self.hands[player_color]:
             return False, "you don't own that piece"
         p = self.pieces[id]
@@ -299,6 +310,12 @@ class Game:
             return False, "drop king first"
         if not (0<=x<8 and 0<=y<8): return False, "invalid coords"
         if self.board[y][x]: return False, "target occupied"
+        bucket = zobrist.hand_stun_bucket(p.type, p.stun)
+        if bucket:
+            # 손을 떠나므로 stun 버킷 개수에서도 뺀다 (stun 을 바꾸기 전에)
+            m = zobrist.hand_stun_count(self, player_color, p.type, bucket)
+            self.hash ^= (zobrist.hand_stun_key(player_color, p.type, bucket, m)
+                          ^ zobrist.hand_stun_key(player_color, p.type, bucket, m - 1))
         if p.type=='pawn':
             # 폰은 각 플레이어 기준 맨 끝 랭크에 착수할 수 없다.
             if player_color=='w' and y==7: return False, "white cannot drop pawn on last rank"
@@ -312,10 +329,20 @@ class Game:
             p.stun = max(1, p.stun)
         p.drop((x,y))
         self.board[y][x] = id
+        self.occupied[player_color] |= 1 << square(x, y)
+        self.score += SQUARE_SCORES[player_color][p.type][square(x, y)]
+        n = zobrist.hand_count(self, player_color, p.type)
+        self.hash ^= (zobrist.hand_key(player_color, p.type, n) ^ zobrist.hand_key(player_color, p.type, n - 1)
+                      ^ zobrist.piece_key(player_color, p.type, square(x, y), p.stun, p.move_stack))
+        self.stasis += (hand_score(player_color, p.type, n - 1) - hand_score(player_color, p.type, n)
+                        + stasis_score(player_color, p.type, p.stun, p.move_stack))
         self.hands[player_color].remove(id)
         self.history.append({"action":"drop","player":player_color,"piece":id,"pos":[x,y]})
+        if not self.first_turn_done[player_color]:
+            self.hash ^= zobrist.FIRST_TURN_KEYS[player_color]
         self.first_turn_done[player_color] = True
         self.dropped = True
+        self.version += 1
         return True, "dropped"
 
     def move_piece(self, player_color, id, frm, to):
@@ -331,27 +358,47 @@ class Game:
         
         target_id = self.board[y2][x2]
         is_win = False
+        if target_id is not None and self.pieces[target_id].color == piece.color:
+            return False, "cannot capture own piece"
+        from_key = zobrist.piece_key(piece.color, piece.type, square(x1, y1), piece.stun, piece.move_stack)
+        self.stasis -= stasis_score(piece.color, piece.type, piece.stun, piece.move_stack)
         if target_id is not None:
             target = self.pieces[target_id]
-            if target.color == piece.color:
-                return False, "cannot capture own piece"
             
             # Check for win condition (king capture)
             if target.type == 'king':
                 is_win = True
-
+                # 잡힌 킹은 잡은 쪽 색으로 바뀌어 그쪽 손으로 간다
+                self.king_count[target.color] -= 1
+                self.king_count[player_color] += 1
+
+            self.score -= SQUARE_SCORES[target.color][target.type][square(x2, y2)]
+            self.occupied[target.color] &= ~(1 << square(x2, y2))
+            n = zobrist.hand_count(self, player_color, target.type)
+            self.hash ^= (zobrist.piece_key(target.color, target.type, square(x2, y2), target.stun, target.move_stack)
+                          ^ zobrist.hand_key(player_color, target.type, n)
+                          ^ zobrist.hand_key(player_color, target.type, n + 1))
+            self.stasis += (hand_score(player_color, target.type, n + 1) - hand_score(player_color, target.type, n)
+                            - stasis_score(target.color, target.type, target.stun, target.move_stack))
             piece.capture(target)
             target.pos = None; target.stun=0; target.move_stack=0
             self.hands[player_color].append(target_id)
             self.board[y2][x2] = None
         
-        # move
+        # move (capture 로 바뀐 stun/move_stack 도 반영하기 위해 이동 전 키는 미리 빼 둔다)
+        self.hash ^= from_key
         self.board[y1][x1] = None
         self.board[y2][x2] = id
+        self.occupied[piece.color] ^= (1 << square(x1, y1)) | (1 << square(x2, y2))
+        table = SQUARE_SCORES[piece.color][piece.type]
+        self.score += table[square(x2, y2)] - table[square(x1, y1)]
         piece.pos = (x2,y2)
         piece.move_stack -= 1
+        self.hash ^= zobrist.piece_key(piece.color, piece.type, square(x2, y2), piece.stun, piece.move_stack)
+        self.stasis += stasis_score(piece.color, piece.type, piece.stun, piece.move_stack)
         
         self.history.append({"action":"move","player":player_color,"piece":id,"from":[x1,y1],"to":[x2,y2]})
+        self.version += 1
 
         if is_win:
             return True, "win"
@@ -359,57 +406,92 @@ class Game:
         return True, "moved"
 
     def board_pieces(self):
-        b = [[None for _ in range(8)] for _ in range(8)]
-        for y in range(8):
-            for x in range(8):
-                id = self.board[y][x]
-                if id:
-                    b[y][x] = self.pieces[id]
-        return b
+        # 8x8 Piece 그리드를 매번 만들지 않고, 필요한 행만 변환하는 뷰를 돌려준다.
+        return BoardView(self)
+
+    def king_on_board(self, color):
+        """color 의 킹이 보드 위에 있는지. king_count 는 손에 든 킹도 세므로 손패의 킹을 뺀다."""
+        pieces = self.pieces
+        in_hand = sum(1 for pid in self.hands[color] if pieces[pid].type == 'king')
+        return self.king_count[color] > in_hand
 
     def safe_after_move(self, id, frm, to,color):
-        gcopy = self.fast_clone()
-        ok, msg = gcopy.move_piece(gcopy.pieces[id].color, id, frm, to)
-        if not ok:
+        # 게임을 바꾸지 않고 수 자체로 판단한다. 자기 기물은 잡을 수 없으므로 이동한 쪽의 킹은
+        # 보드를 떠나지 않는다. 보드를 떠날 수 있는 킹은 to 에서 잡히는 킹뿐이다.
+        piece = self.pieces.get(id)
+        if piece is None or piece.pos != tuple(frm) or piece.stun > 0:
             return False
-        king_exists = False
-        for p in gcopy.pieces.values():
-            if p.type=='king' and p.color==color and p.pos is not None:
-                king_exists = True
-        return king_exists
-
-    def get_legal_moves(self, piece_id):
-        piece = self.get_piece(piece_id)
-        if not piece:
-            return []
+        if not (0 <= to[0] < 8 and 0 <= to[1] < 8) or not piece.can_move(frm, to, self.board_pieces()):
+            return False
+        target_id = self.board[to[1]][to[0]]
+        target = self.pieces[target_id] if target_id else None
+        if target is not None and target.color == piece.color:
+            return False
+        if not self.king_on_board(color):
+            return False
+        if target is not None and target.type == 'king' and target.color == color:
+            in_hand = sum(1 for pid in self.hands[color] if self.pieces[pid].type == 'king')
+            return self.king_count[color] - in_hand > 1
+        return True
 
-        if piece.pos is None:
-            return []
+    def _legal_entries(self):
+        # 지금 version 의 캐시 dict. version 이 바뀌었으면 새로 시작한다.
+        version, cache = self.legal_cache
+        if version != self.version:
+            cache = {}
+            self.legal_cache = (self.version, cache)
+        return cache
 
     def get_legal_moves(self, piece_id):
-        piece = self.get_piece(piece_id)
-        if not piece:
-            return []
-
-        if piece.pos is None:
-            return []
-
-        if piece.stun > 0 or piece.move_stack < 1:
-            return []
-
-        legal_moves = []
-        frm = piece.pos
-        possible_moves = piece.get_possible_moves(frm, self.board_pieces())
-        
-        for to in possible_moves:
-            target_piece = self.get_piece_at(to[0], to[1])
-            if target_piece and target_piece.color == piece.color:
-                continue
-
-            if self.safe_after_move(piece_id, frm, to, piece.color):
-                legal_moves.append(to)
-        
-        return legal_moves
+        """piece_id 의 합법 수 [(x, y)]. 같은 version 안에서는 캐시에서 바로 돌려준다.
+        version 은 drop_piece/move_piece/stack_add/mark_action_done/end_turn/promote_pawn/unmake_action 이 올린다.
+        필드를 직접 고쳤다면 version 을 올려야 한다."""
+        cache = self._legal_entries()
+        moves = cache.get(piece_id)
+        if moves is None:
+            piece = self.get_piece(piece_id)
+            if piece is None or piece.pos is None or not self.king_on_board(piece.color):
+                moves = ()
+            else:
+                # 이동한 쪽의 킹은 보드에 남으므로 pseudo-legal 수가 곧 합법 수다 (safe_after_move 참고)
+                moves = tuple(self.get_pseudo_legal_moves(piece_id))
+            cache[piece_id] = moves
+        return list(moves)
+
+    def legal_map(self):
+        """둘 차례의 모든 합법 수와 드롭: {'turn', 'version', 'moves': {pid: [(x, y)]}, 'drops': {pid: [(x, y)]}}.
+        둘 수 있는 칸이 없는 기물은 빠진다. version 마다 처음 요청될 때 한 번 만들고, 돌려준 dict 는 공유되므로
+        고치지 않는다."""
+        cache = self._legal_entries()
+        result = cache.get(None)
+        if result is not None:
+            return result
+        color = self.turn
+        moves = {}
+        if not self.action_done.get(color):
+            for sq in iter_bits(self.occupied[color]):
+                pid = self.board[sq >> 3][sq & 7]
+                legal = self.get_legal_moves(pid)
+                if legal:
+                    moves[pid] = legal
+        drops = {}
+        if not self.dropped:
+            empty = ~(self.occupied['w'] | self.occupied['b']) & BOARD_MASK
+            by_type = {}    # 같은 종류는 같은 칸 목록
+            for pid in self.hands[color]:
+                ptype = self.pieces[pid].type
+                if not self.first_turn_done[color] and ptype != 'king':
+                    continue
+                squares = by_type.get(ptype)
+                if squares is None:
+                    mask = empty
+                    if ptype == 'pawn':
+                        mask &= ~(RANK_MASKS[7] if color == 'w' else RANK_MASKS[0])
+                    squares = by_type[ptype] = [coords(sq) for sq in iter_bits(mask)]
+                if squares:
+                    drops[pid] = squares
+        result = cache[None] = {'turn': color, 'version': self.version, 'moves': moves, 'drops': drops}
+        return result
 
     def get_pseudo_legal_moves(self, piece_id):
         # Similar to get_legal_moves but SKIPS safe_after_move check
@@ -432,12 +514,168 @@ class Game:
             moves.append(to)
         return moves
 
+    def make_action(self, action, color=None, end_turn=True):
+        """action 을 적용하고 unmake_action 에 넘길 undo 기록을 돌려준다.
+        규칙에 어긋난 action 이면 상태를 바꾸지 않고 None 을 돌려준다."""
+        color = color or self.turn
+        state = (self.turn, self.dropped, self.first_turn_done.copy(), self.action_done,
+                 self.occupied.copy(), self.hash, self.score, self.king_count.copy(), self.stasis, len(self.history))
+        kind = action[0]
+        hand_index = None
+        if kind == "move":
+            _, pid, frm, to = action
+            piece = self.pieces.get(pid)
+            if piece is None or not (0 <= to[0] < 8 and 0 <= to[1] < 8):
+                return None
+            target_id = self.board[to[1]][to[0]]
+            touched = (piece, self.pieces[target_id]) if target_id else (piece,)
+            saved = [(p, p.pos, p.stun, p.move_stack, p.color) for p in touched]
+            ok, _ = self.move_piece(color, pid, frm, to)
+        elif kind == "drop":
+            _, pid, to = action
+            piece = self.pieces.get(pid)
+            if piece is None or pid not in self.hands[color]:
+                return None
+            target_id = None
+            hand_index = self.hands[color].index(pid)
+            saved = [(piece, piece.pos, piece.stun, piece.move_stack, piece.color)]
+            ok, _ = self.drop_piece(color, pid, to[0], to[1])
+        else:
+            return None
+        if not ok:
+            return None
+
+        decayed = None
+        if end_turn:
+            # end_turn 에서 stun 이 1 줄고 move_stack 이 1 늘어나는 기물들
+            decayed = [p for p in self.pieces.values() if p.pos is not None and p.stun > 0]
+            self.end_turn()
+        return (action, color, target_id, hand_index, saved, decayed, state)
+
+    def unmake_action(self, undo):
+        action, color, target_id, hand_index, saved, decayed, state = undo
+        if decayed:
+            for p in decayed:
+                p.stun += 1
+                p.move_stack -= 1
+        for p, pos, stun, move_stack, pcolor in saved:
+            p.pos = pos; p.stun = stun; p.move_stack = move_stack; p.color = pcolor
+        if action[0] == "move":
+            _, pid, frm, to = action
+            self.board[frm[1]][frm[0]] = pid
+            self.board[to[1]][to[0]] = target_id
+            if target_id is not None:
+                self.hands[color].pop()
+        else:
+            _, pid, to = action
+            self.board[to[1]][to[0]] = None
+            self.hands[color].insert(hand_index, pid)
+        (self.turn, self.dropped, self.first_turn_done, self.action_done,
+         self.occupied, self.hash, self.score, self.king_count, self.stasis, history_len) = state
+        del self.history[history_len:]
+        self.version += 1
+
+    def promote_pawn(self, id):
+        # 폰을 같은 id 의 퀸으로 교체한다 (pos 유지, stun 0, move_stack 5)
+        piece = self.pieces[id]
+        x, y = piece.pos
+        sq = square(x, y)
+        promoted = Queen(id, piece.color, pos=(x, y))
+        promoted.stun = 0
+        promoted.move_stack = 5
+        self.hash ^= (zobrist.piece_key(piece.color, piece.type, sq, piece.stun, piece.move_stack)
+                      ^ zobrist.piece_key(promoted.color, promoted.type, sq, promoted.stun, promoted.move_stack))
+        self.score += SQUARE_SCORES[piece.color]['queen'][sq] - SQUARE_SCORES[piece.color][piece.type][sq]
+        self.stasis += (stasis_score(promoted.color, promoted.type, promoted.stun, promoted.move_stack)
+                        - stasis_score(piece.color, piece.type, piece.stun, piece.move_stack))
+        self.pieces[id] = promoted
+        self.board[y][x] = id
+        self.version += 1
+        return promoted
+
+    def stack_add(self, id):
+        p = self.get_piece(id)
+        if p is None:
+            return False, "no_such_piece"
+        if self.action_done.get(p.color):
+            return False, "already_moved_this_turn"
+        if p.type=='king':
+            return False, "can_not_add_stun_king"
+        if p.pos is not None:
+            sq = square(*p.pos)
+            self.hash ^= (zobrist.piece_key(p.color, p.type, sq, p.stun, p.move_stack)
+                          ^ zobrist.piece_key(p.color, p.type, sq, p.stun + 1, p.move_stack))
+            self.stasis += (stasis_score(p.color, p.type, p.stun + 1, p.move_stack)
+                            - stasis_score(p.color, p.type, p.stun, p.move_stack))
+        else:
+            # 손패 기물은 드롭 후 stun (버킷) 이 바뀔 때만 키가 바뀐다
+            old = zobrist.hand_stun_bucket(p.type, p.stun)
+            new = zobrist.hand_stun_bucket(p.type, p.stun + 1)
+            if old != new:
+                if old:
+                    m = zobrist.hand_stun_count(self, p.color, p.type, old)
+                    self.hash ^= (zobrist.hand_stun_key(p.color, p.type, old, m)
+                                  ^ zobrist.hand_stun_key(p.color, p.type, old, m - 1))
+                m = zobrist.hand_stun_count(self, p.color, p.type, new)
+                self.hash ^= (zobrist.hand_stun_key(p.color, p.type, new, m)
+                              ^ zobrist.hand_stun_key(p.color, p.type, new, m + 1))
+        p.stun += 1
+        self.action_done[p.color] = True
+        self.version += 1
+        return True, "stacked"
+
+    def mark_action_done(self, color):
+        """color 가 이번 턴의 행동(이동/드롭)을 마쳤다고 기록한다. 이후 이동/stack_add 가 막히므로 version 을 올린다."""
+        if not self.action_done.get(color):
+            self.action_done[color] = True
+            self.version += 1
+
     def end_turn(self):
+        h = self.hash
+        stasis = self.stasis
         for id,p in self.pieces.items():
-            p.end_turn()
+            if p.pos is not None and p.stun > 0:
+                sq = square(*p.pos)
+                h ^= zobrist.piece_key(p.color, p.type, sq, p.stun, p.move_stack)
+                stasis -= stasis_score(p.color, p.type, p.stun, p.move_stack)
+                p.end_turn()
+                h ^= zobrist.piece_key(p.color, p.type, sq, p.stun, p.move_stack)
+                stasis += stasis_score(p.color, p.type, p.stun, p.move_stack)
+            else:
+                p.end_turn()
+        self.hash = h ^ zobrist.SIDE_KEY
+        self.stasis = stasis
         self.turn = 'b' if self.turn=='w' else 'w'
         self.action_done = {}
         self.dropped = False
+        self.version += 1
+
+class BoardView:
+    """board_pieces() 결과. board[y][x] 로 Piece(또는 None)에 접근한다."""
+    def __init__(self, game):
+        self.board = game.board
+        self.pieces = game.pieces
+        self.occupied = game.occupied
+
+    def __getitem__(self, y):
+        pieces = self.pieces
+        return [pieces[id] if id else None for id in self.board[y]]
+
+    def __len__(self):
+        return 8
+
+    def __iter__(self):
+        for y in range(8):
+            yield self[y]
+
+PIECE_CLASSES = {
+    'pawn': Pawn,
+    'rook': Rook,
+    'knight': Knight,
+    'bishop': Bishop,
+    'queen': Queen,
+    'king': King,
+}
 
 def can_p(game):
     b = game.board
@@ -0,0 +1,203 @@
+"""기물 가치와 Piece-Square Table.
+
+평가 함수(server.ai.model)와 Game 의 증분 평가 점수가 함께 사용한다.
+"""
+from server.game.attacks import coords
+from server.game.zobrist import STUN_MAX, STACK_MIN, STACK_MAX, HAND_MAX
+
+# 기물 가치 정의
+# 기물 가치 정의
+PIECE_VALUES = {
+    'pawn': 100,
+    'knight': 320,
+    'bishop': 330,
+    'rook': 500,
+    'queen': 900,
+    'king': 30000 
+}
+
+# Piece-Square Tables (PST)
+# 백색 기준 (흑색은 보드를 뒤집어서 사용)
+# 중앙 제어, 기물 발전, 킹 안전 등을 고려한 테이블입니다.
+pst_pawn = [
+     0,  0,  0,  0,  0,  0,  0,  0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+     5,  5, 10, 25, 25, 10,  5,  5,
+     0,  0,  0, 20, 20,  0,  0,  0,
+     5, -5,-10,  0,  0,-10, -5,  5,
+     5, 10, 10,-20,-20, 10, 10,  5,
+     0,  0,  0,  0,  0,  0,  0,  0
+]
+
+pst_knight = [
+    -50,-40,-30,-30,-30,-30,-40,-50,
+    -40,-20,  0,  0,  0,  0,-20,-40,
+    -30,  0, 10, 15, 15, 10,  0,-30,
+    -30,  5, 15, 20, 20, 15,  5,-30,
+    -30,  0, 15, 20, 20, 15,  0,-30,
+    -30,  5, 10, 15, 15, 10,  5,-30,
+    -40,-20,  0,  5,  5,  0,-20,-40,
+    -50,-40,-30,-30,-30,-30,-40,-50
+]
+
+pst_bishop = [
+    -20,-10,-10,-10,-10,-10,-10,-20,
+    -10,  0,  0,  0,  0,  0,  0,-10,
+    -10,  0,  5, 10, 10,  5,  0,-10,
+    -10,  5,  5, 10, 10,  5,  5,-10,
+    -10,  0, 10, 10, 10, 10,  0,-10,
+    -10, 10, 10, 10, 10, 10, 10,-10,
+    -10,  5,  0,  0,  0,  0,  5,-10,
+    -20,-10,-10,-10,-10,-10,-10,-20
+]
+
+pst_rook = [
+     0,  0,  0,  0,  0,  0,  0,  0,
+     5, 10, 10, 10, 10, 10, 10,  5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+     0,  0,  0,  5,  5,  0,  0,  0
+]
+
+pst_queen = [
+    -20,-10,-10, -5, -5,-10,-10,-20,
+    -10,  0,  0,  0,  0,  0,  0,-10,
+    -10,  0,  5,  5,  5,  5,  0,-10,
+     -5,  0,  5,  5,  5,  5,  0, -5,
+      0,  0,  5,  5,  5,  5,  0, -5,
+    -10,  5,  5,  5,  5,  5,  0,-10,
+    -10,  0,  5,  0,  0,  0,  0,-10,
+    -20,-10,-10, -5, -5,-10,-10,-20
+]
+
+pst_king = [
+    -30,-40,-40,-50,-50,-40,-40,-30,
+    -30,-40,-40,-50,-50,-40,-40,-30,
+    -30,-40,-40,-50,-50,-40,-40,-30,
+    -30,-40,-40,-50,-50,-40,-40,-30,
+    -20,-30,-30,-40,-40,-30,-30,-20,
+    -10,-20,-20,-20,-20,-20,-20,-10,
+     20, 20,  0,  0,  0,  0, 20, 20,
+     20, 30, 10,  0,  0, 10, 30, 20
+]
+
+PIECE_SQUARE_TABLES = {
+    'pawn': pst_pawn,
+    'knight': pst_knight,
+    'bishop': pst_bishop,
+    'rook': pst_rook,
+    'queen': pst_queen,
+    'king': pst_king
+}
+
+
+def _square_scores():
+    """SQUARE_SCORES[color][type][sq] = 그 칸에 있는 기물이 평가 점수에 더하는 값 (백 +, 흑 -)."""
+    scores = {'w': {}, 'b': {}}
+    for ptype, pst in PIECE_SQUARE_TABLES.items():
+        value = PIECE_VALUES[ptype]
+        white = []
+        black = []
+        for sq in range(64):
+            x, y = coords(sq)
+            # 흑색은 보드를 뒤집어서(y -> 7-y) 같은 테이블 사용
+            white.append(value + pst[y * 8 + x])
+            black.append(-(value + pst[(7 - y) * 8 + x]))
+        scores['w'][ptype] = white
+        scores['b'][ptype] = black
+    return scores
+
+
+SQUARE_SCORES = _square_scores()
+
+
+def compute_score(game):
+    """보드 위 기물 전체의 가치+PST 합 (백 기준). 증분 점수의 초기화/검증용."""
+    score = 0
+    for p in game.pieces.values():
+        if p.pos is not None:
+            score += SQUARE_SCORES[p.color][p.type][p.pos[1] * 8 + p.pos[0]]
+    return score
+
+
+def count_kings(game):
+    """색별로 살아 있는 킹 수. 보드 위에 있거나 아직 주인의 손에 있으면(드롭 전) 생존."""
+    kings = {'w': 0, 'b': 0}
+    for p in game.pieces.values():
+        if p.type == 'king' and (p.pos is not None or p.id in game.hands[p.color]):
+            kings[p.color] += 1
+    return kings
+
+
+# ---- 확장 평가 항 (손패, stun, move_stack) ----
+# 기본 평가(가치+PST)는 보드 위 기물만 본다. 확장 평가는 이 변형 규칙의 상태를 더한다.
+#   - 손패: 손에 든 기물은 나중에 드롭할 수 있으므로 가치의 일부로 친다 (킹은 king_count 가 따로 본다)
+#   - stun: 남은 stun 한 턴마다 감점 (그동안 움직일 수 없음)
+#   - move_stack: 앞으로 둘 수 있는 이동 수(move_stack + stun, stun 이 풀리면서 쌓임)만큼 가산,
+#     STACK_CREDIT_CAP 까지만. 더 움직일 수 없는 기물은 FROZEN_PENALTY 만큼 감점
+# 기물 하나의 값은 (색, 종류, stun, move_stack) 만으로 정해지므로 import 시점에 표로 만들어 두고
+# Game.stasis 에 증분으로 유지한다. 구간 밖의 stun/move_stack 은 zobrist 와 같은 구간으로 잘라 쓴다.
+HAND_VALUES = {'pawn': 80, 'knight': 260, 'bishop': 270, 'rook': 400, 'queen': 720, 'king': 0}
+STUN_PENALTY = {'pawn': 4, 'knight': 12, 'bishop': 12, 'rook': 18, 'queen': 30, 'king': 40}
+STACK_CREDIT = {'pawn': 2, 'knight': 6, 'bishop': 6, 'rook': 8, 'queen': 10, 'king': 3}
+FROZEN_PENALTY = {'pawn': 20, 'knight': 64, 'bishop': 66, 'rook': 100, 'queen': 180, 'king': 60}
+STACK_CREDIT_CAP = 6
+
+
+def _stasis_scores():
+    """STASIS_SCORES[color][type][stun][move_stack - STACK_MIN] (백 +, 흑 -)."""
+    scores = {'w': {}, 'b': {}}
+    for ptype in PIECE_VALUES:
+        rows = []
+        for stun in range(STUN_MAX + 1):
+            row = []
+            for ms in range(STACK_MIN, STACK_MAX + 1):
+                moves = ms + stun
+                value = STACK_CREDIT[ptype] * min(max(moves, 0), STACK_CREDIT_CAP) - STUN_PENALTY[ptype] * stun
+                if moves <= 0:
+                    value -= FROZEN_PENALTY[ptype]
+                row.append(value)
+            rows.append(row)
+        scores['w'][ptype] = rows
+        scores['b'][ptype] = [[-v for v in row] for row in rows]
+    return scores
+
+
+def _hand_scores():
+    """HAND_SCORES[color][type][count] = 그 종류를 count 개 들고 있을 때의 점수 (백 +, 흑 -)."""
+    return {color: {ptype: [sign * value * n for n in range(HAND_MAX + 1)] for ptype, value in HAND_VALUES.items()}
+            for color, sign in (('w', 1), ('b', -1))}
+
+
+STASIS_SCORES = _stasis_scores()
+HAND_SCORES = _hand_scores()
+
+
+def stasis_score(color, ptype, stun, move_stack):
+    stun = STUN_MAX if stun > STUN_MAX else (0 if stun < 0 else stun)
+    move_stack = STACK_MAX if move_stack > STACK_MAX else (STACK_MIN if move_stack < STACK_MIN else move_stack)
+    return STASIS_SCORES[color][ptype][stun][move_stack - STACK_MIN]
+
+
+def hand_score(color, ptype, count):
+    return HAND_SCORES[color][ptype][min(count, HAND_MAX)]
+
+
+def compute_stasis(game):
+    """확장 평가 항 전체 합 (백 기준). 증분 값 Game.stasis 의 초기화/검증용."""
+    total = 0
+    counts = {'w': {}, 'b': {}}
+    for p in game.pieces.values():
+        if p.pos is not None:
+            total += stasis_score(p.color, p.type, p.stun, p.move_stack)
+    for color in ('w', 'b'):
+        for pid in game.hands[color]:
+            ptype = game.pieces[pid].type
+            counts[color][ptype] = counts[color].get(ptype, 0) + 1
+        for ptype, n in counts[color].items():
+            total += hand_score(color, ptype, n)
+    return total
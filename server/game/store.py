@@ -0,0 +1,159 @@
+"""진행 중인 게임과 접속(sid) 등록부.
+
+게임마다 마지막 사용 시각을 기록해 두고
+  - 아무도 접속해 있지 않은(버려진) 게임은 abandoned_ttl 초 뒤에,
+  - 접속자가 있어도 ttl 초 동안 아무 요청이 없으면 지운다.
+max_games 를 넘으면 가장 오래 쓰지 않은 게임부터 지운다 (LRU). 지울 때 on_evict(game_id) 를 불러
+게임에 딸린 것(치환표, AI 작업, 방송 상태 등)도 함께 정리하게 한다.
+"""
+import sys
+import time
+from collections import OrderedDict
+
+
+_SLOTS = {}
+
+
+def _slot_names(cls):
+    # 상속받은 슬롯까지 (Piece 하위 클래스는 __slots__ = () 이고 필드는 Piece 에 있다)
+    names = _SLOTS.get(cls)
+    if names is None:
+        names = []
+        for klass in cls.__mro__:
+            slots = klass.__dict__.get('__slots__', ())
+            names.extend((slots,) if isinstance(slots, str) else slots)
+        names = _SLOTS[cls] = tuple(names)
+    return names
+
+
+def estimate_bytes(game):
+    """Game 이 차지하는 대략적인 메모리 (Game 에서 닿는 객체들의 sys.getsizeof 합: 기물, 보드, 손패, history).
+    여러 게임이 함께 쓰는 작은 int/str 도 게임마다 세므로 실제보다 조금 크게 나온다."""
+    seen = set()
+    total = 0
+    stack = [game]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, type):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif hasattr(obj, '__dict__'):
+            stack.append(obj.__dict__)
+        else:
+            stack.extend(getattr(obj, name) for name in _slot_names(type(obj)) if hasattr(obj, name))
+    return total
+
+
+class GameStore:
+    def __init__(self, ttl=1800, abandoned_ttl=60, max_games=1000, sweep_interval=5, on_evict=None,
+                 clock=time.monotonic):
+        self.ttl = ttl
+        self.abandoned_ttl = abandoned_ttl
+        self.max_games = max_games
+        self.sweep_interval = sweep_interval
+        self.on_evict = on_evict
+        self.clock = clock
+        self._games = OrderedDict()     # game_id -> Game, 오래 쓰지 않은 순서
+        self._seen = {}                 # game_id -> 마지막 사용 시각
+        self._players = {}              # sid -> game_id
+        self._members = {}              # game_id -> {sid}
+        self._last_sweep = clock()
+        self.evicted = {'ttl': 0, 'abandoned': 0, 'lru': 0}
+
+    def __len__(self):
+        return len(self._games)
+
+    def __contains__(self, game_id):
+        return game_id in self._games
+
+    def _touch(self, game_id):
+        self._games.move_to_end(game_id)
+        self._seen[game_id] = self.clock()
+
+    def add(self, game):
+        self._games[game.id] = game
+        self._members.setdefault(game.id, set())
+        self._touch(game.id)
+        while len(self._games) > self.max_games:
+            self.evict(next(iter(self._games)), 'lru')
+        return game
+
+    def get(self, game_id):
+        game = self._games.get(game_id)
+        if game is not None:
+            self._touch(game_id)
+        return game
+
+    def join(self, sid, game_id):
+        """sid 를 game_id 에 등록한다 (이전 게임에서는 빠진다). 게임이 없으면 None."""
+        game = self.get(game_id)
+        if game is None:
+            return None
+        self.leave(sid)
+        self._players[sid] = game_id
+        self._members[game_id].add(sid)
+        return game
+
+    def leave(self, sid):
+        """sid 의 게임 id (없으면 None). 남은 접속자가 없으면 그 게임은 abandoned_ttl 뒤에 지워진다."""
+        game_id = self._players.pop(sid, None)
+        if game_id is not None:
+            self._members.get(game_id, set()).discard(sid)
+            if game_id in self._games:
+                self._touch(game_id)
+        return game_id
+
+    def game_for(self, sid):
+        game_id = self._players.get(sid)
+        return self.get(game_id) if game_id is not None else None
+
+    def players(self, game_id):
+        return self._members.get(game_id, set())
+
+    def evict(self, game_id, reason):
+        if self._games.pop(game_id, None) is None:
+            return
+        self._seen.pop(game_id, None)
+        for sid in self._members.pop(game_id, set()):
+            self._players.pop(sid, None)
+        self.evicted[reason] += 1
+        if self.on_evict is not None:
+            self.on_evict(game_id)
+
+    def sweep(self, force=False):
+        """만료된 게임을 지우고 그 id 목록을 돌려준다. force 가 아니면 sweep_interval 초에 한 번만 돈다."""
+        now = self.clock()
+        if not force and now - self._last_sweep < self.sweep_interval:
+            return []
+        self._last_sweep = now
+        expired = []
+        # 버려진 게임은 ttl 이 더 짧으므로 LRU 순서라도 중간에 멈추지 않고 끝까지 본다
+        for game_id in self._games:
+            idle = now - self._seen[game_id]
+            if not self._members.get(game_id):
+                if idle >= self.abandoned_ttl:
+                    expired.append((game_id, 'abandoned'))
+            elif idle >= self.ttl:
+                expired.append((game_id, 'ttl'))
+        for game_id, reason in expired:
+            self.evict(game_id, reason)
+        return [game_id for game_id, _ in expired]
+
+    def metrics(self, detail=False):
+        sizes = {game_id: estimate_bytes(game) for game_id, game in self._games.items()}
+        result = {
+            'games': len(self._games),
+            'players': len(self._players),
+            'abandoned': sum(1 for game_id in self._games if not self._members.get(game_id)),
+            'game_bytes': sum(sizes.values()),
+            'max_game_bytes': max(sizes.values(), default=0),
+            'evicted': dict(self.evicted),
+        }
+        if detail:
+            result['per_game'] = sizes
+        return result
@@ -0,0 +1,66 @@
+"""game_state 방송용 델타 프로토콜.
+
+매 이벤트마다 Game.to_json() 전체(32개 기물 + 계속 늘어나는 history)를 보내는 대신, 방(게임)마다
+마지막으로 보낸 상태를 기억해 두고 바뀐 부분만 보낸다.
+
+  game_state (전체 스냅샷, 접속/resync 때만): to_json() + {'seq': 마지막으로 방송한 seq}
+  game_delta: {'seq', 'id', 'turn',
+               'pieces': {pid: 기물 to_json},       바뀐 기물만 (기물 전체를 덮어씀)
+               'hands': {color: [pid]},             바뀐 색만 (목록 전체를 덮어씀)
+               'history_from': n, 'history': [...]} history[n:] 을 이것으로 바꿈
+
+델타의 모든 항목은 덮어쓰기라서, 스냅샷이 기준 상태보다 새것이어도 그 위에 다음 델타를 그대로 적용할 수
+있다. 클라이언트는 seq 가 (받은 seq + 1) 이 아니면 'resync' 를 보내 스냅샷을 다시 받는다.
+"""
+
+
+def piece_key(p):
+    return (p.type, p.color, p.pos, p.stun, p.move_stack)
+
+
+class StateSync:
+    """한 게임의 방송 상태 (seq, 마지막으로 보낸 기물/손패/history 길이)."""
+    def __init__(self, game):
+        self.game = game
+        self.seq = 0
+        self._pieces = {pid: piece_key(p) for pid, p in game.pieces.items()}
+        self._hands = {color: list(hand) for color, hand in game.hands.items()}
+        self._history_len = len(game.history)
+
+    def snapshot(self):
+        """전체 상태. 기준 상태나 seq 는 바꾸지 않는다."""
+        state = self.game.to_json()
+        state['seq'] = self.seq
+        return state
+
+    def delta(self):
+        """마지막 방송 이후 바뀐 부분. seq 를 하나 올리고 기준 상태를 지금으로 맞춘다."""
+        game = self.game
+        pieces = {}
+        for pid, p in game.pieces.items():
+            key = piece_key(p)
+            if self._pieces.get(pid) != key:
+                self._pieces[pid] = key
+                pieces[pid] = p.to_json()
+        hands = {}
+        for color, hand in game.hands.items():
+            if self._hands.get(color) != hand:
+                self._hands[color] = list(hand)
+                hands[color] = list(hand)
+        # 탐색이 history 를 되돌린 경우에도 덮어쓰기로 맞춰지도록 시작 위치를 함께 보낸다
+        start = min(self._history_len, len(game.history))
+        self._history_len = len(game.history)
+        self.seq += 1
+        return {'seq': self.seq, 'id': game.id, 'turn': game.turn, 'pieces': pieces, 'hands': hands,
+                'history_from': start, 'history': game.history[start:]}
+
+
+def apply_delta(state, delta):
+    """스냅샷(state)에 델타를 적용한 새 상태. 클라이언트(useGame)가 하는 일과 같다."""
+    state = dict(state)
+    state['seq'] = delta['seq']
+    state['turn'] = delta['turn']
+    state['pieces'] = {**state['pieces'], **delta['pieces']}
+    state['hands'] = {**state['hands'], **delta['hands']}
+    state['history'] = state['history'][:delta['history_from']] + delta['history']
+    return state
@@ -0,0 +1,93 @@
+"""Zobrist 해시 키.
+
+포지션 키는 다음 항목들의 XOR 이다.
+  - 보드 위 기물: (색, 종류, 칸) + 칸별 stun 버킷 + 칸별 move_stack 버킷
+  - 손패: (색, 종류) 별 개수 + (색, 종류, 드롭 후 stun 버킷) 별 개수 (stack_add 로 stun 이 쌓인 손패 기물)
+  - 둘 차례, first_turn_done
+
+키는 고정 시드로 만들기 때문에 프로세스/재시작이 달라도 같은 포지션은 같은 값을 가진다
+(오프닝 북이나 디스크 캐시의 키로 쓸 수 있다).
+"""
+import random
+
+from server.game.bitboard import COLOR_INDEX, TYPE_INDEX, PIECE_TYPES, square
+
+SEED = 0x5EED_C4E55
+
+STUN_MAX = 15                 # 이보다 큰 stun 은 같은 버킷
+STACK_MIN, STACK_MAX = -8, 31
+HAND_MAX = 32
+
+_rng = random.Random(SEED)
+
+
+def _keys(n):
+    return [_rng.getrandbits(64) for _ in range(n)]
+
+
+PIECE_KEYS = [_keys(64) for _ in range(12)]
+STUN_KEYS = [_keys(STUN_MAX + 1) for _ in range(64)]
+STACK_KEYS = [_keys(STACK_MAX - STACK_MIN + 1) for _ in range(64)]
+HAND_KEYS = [[_keys(HAND_MAX + 1) for _ in PIECE_TYPES] for _ in range(2)]
+SIDE_KEY = _rng.getrandbits(64)          # 흑 차례일 때 XOR
+FIRST_TURN_KEYS = {'w': _rng.getrandbits(64), 'b': _rng.getrandbits(64)}
+# 개수 0 의 키는 0 이라 손패 stun 이 없는 포지션의 키는 그대로다 (위 키들 뒤에 만들어 기존 키도 그대로)
+HAND_STUN_KEYS = [[[[0] + _keys(HAND_MAX) for _ in range(STUN_MAX + 1)] for _ in PIECE_TYPES] for _ in range(2)]
+
+
+def piece_key(color, ptype, sq, stun, move_stack):
+    stun = STUN_MAX if stun > STUN_MAX else (0 if stun < 0 else stun)
+    move_stack = STACK_MAX if move_stack > STACK_MAX else (STACK_MIN if move_stack < STACK_MIN else move_stack)
+    return (PIECE_KEYS[COLOR_INDEX[color] * 6 + TYPE_INDEX[ptype]][sq]
+            ^ STUN_KEYS[sq][stun] ^ STACK_KEYS[sq][move_stack - STACK_MIN])
+
+
+def hand_key(color, ptype, count):
+    return HAND_KEYS[COLOR_INDEX[color]][TYPE_INDEX[ptype]][min(count, HAND_MAX)]
+
+
+def hand_count(game, color, ptype):
+    pieces = game.pieces
+    return sum(1 for pid in game.hands[color] if pieces[pid].type == ptype)
+
+
+def hand_stun_bucket(ptype, stun):
+    """손패 기물의 드롭 후 stun (drop_key) 이 기본값 1 과 다르면 그 버킷, 아니면 0.
+    폰은 착수 랭크로 stun 이 정해지므로 항상 0."""
+    if ptype == 'pawn' or stun < 2:
+        return 0
+    return STUN_MAX if stun > STUN_MAX else stun
+
+
+def hand_stun_key(color, ptype, bucket, count):
+    return HAND_STUN_KEYS[COLOR_INDEX[color]][TYPE_INDEX[ptype]][bucket][min(count, HAND_MAX)]
+
+
+def hand_stun_count(game, color, ptype, bucket):
+    pieces = game.pieces
+    return sum(1 for pid in game.hands[color]
+               if pieces[pid].type == ptype and hand_stun_bucket(ptype, pieces[pid].stun) == bucket)
+
+
+def compute_hash(game):
+    """Game 전체를 훑어서 키를 새로 계산한다. 증분 갱신 결과 검증과 초기화에 쓴다."""
+    h = 0
+    for p in game.pieces.values():
+        if p.pos is not None:
+            h ^= piece_key(p.color, p.type, square(*p.pos), p.stun, p.move_stack)
+    for color in ('w', 'b'):
+        for ptype in PIECE_TYPES:
+            h ^= hand_key(color, ptype, hand_count(game, color, ptype))
+        buckets = {}
+        for pid in game.hands[color]:
+            p = game.pieces[pid]
+            bucket = hand_stun_bucket(p.type, p.stun)
+            if bucket:
+                buckets[p.type, bucket] = buckets.get((p.type, bucket), 0) + 1
+        for (ptype, bucket), count in buckets.items():
+            h ^= hand_stun_key(color, ptype, bucket, count)
+        if game.first_turn_done[color]:
+            h ^= FIRST_TURN_KEYS[color]
+    if game.turn == 'b':
+        h ^= SIDE_KEY
+    return h
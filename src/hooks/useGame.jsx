@@ -1,18 +1,31 @@
 // src/hooks/useGame.jsx
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { io } from 'socket.io-client';
 
 const socket = io("http://127.0.0.1:5000");
 
+// game_delta 를 스냅샷에 적용한다 (server/game/sync.py 의 apply_delta 와 같음). 모든 항목이 덮어쓰기다.
+const applyDelta = (state, d) => ({
+  ...state,
+  seq: d.seq,
+  turn: d.turn,
+  pieces: { ...state.pieces, ...d.pieces },
+  hands: { ...state.hands, ...d.hands },
+  history: state.history.slice(0, d.history_from).concat(d.history),
+});
+
 export const useGame = () => {
   const [gameState, setGameState] = useState(null);
   const [log, setLog] = useState([]);
   const [selectedPiece, setSelectedPiece] = useState(null);
   const [legalMoves, setLegalMoves] = useState([]);
+  // 둘 차례의 모든 수/드롭 (get_legal_map). 포지션이 바뀔 때마다 한 번 받아 와서 선택 시 로컬에서 찾는다.
+  const [legalMap, setLegalMap] = useState(null);
   // const [confirmedPiece, setConfirmedPiece] = useState(null);
   const [gameId, setGameId] = useState(null);
   const [gameOver, setGameOver] = useState(false);
   const [winner, setWinner] = useState(null);
+  const seqRef = useRef(null);   // 마지막으로 적용한 game_state/game_delta 의 seq
 
   useEffect(() => {
     socket.on("connected", (data) => {
@@ -20,7 +33,25 @@ export const useGame = () => {
       setGameId(data.game_id);
     });
 
-    socket.on("game_state", (g) => setGameState(g));
+    // 전체 스냅샷은 접속/resync 때만 온다
+    socket.on("game_state", (g) => {
+      seqRef.current = g.seq;
+      setGameState(g);
+      setLegalMap(null);
+      socket.emit("get_legal_map");
+    });
+    socket.on("game_delta", (d) => {
+      if (seqRef.current === null || d.seq <= seqRef.current) return;   // 스냅샷 전이거나 이미 반영됨
+      if (d.seq !== seqRef.current + 1) {
+        seqRef.current = null;   // 빠진 델타가 있음: 스냅샷을 다시 받을 때까지 델타를 무시
+        socket.emit("resync");
+        return;
+      }
+      seqRef.current = d.seq;
+      setGameState((g) => applyDelta(g, d));
+      setLegalMap(null);
+      socket.emit("get_legal_map");
+    });
     socket.on("move_accepted", (d) => {
       setLog(l => [`Move accepted: ${JSON.stringify(d)}`, ...l]);
       setSelectedPiece(null);
@@ -38,6 +69,7 @@ export const useGame = () => {
     socket.on("selection_confirmed", (d) => setLog(l => [`Selection confirmed: ${JSON.stringify(d)}`, ...l]));
     socket.on("selection_cancelled", (d) => setLog(l => [`Selection cancelled: ${JSON.stringify(d)}`, ...l]));
     socket.on("turn_ended", (d) => setLog(l => [`New turn: ${d.turn}'s move`, ...l]));
+    socket.on("end_turn_rejected", (d) => setLog(l => [`End turn rejected: ${d.reason}`, ...l]));
     socket.on("game_end", (data) => {
       setLog(l => [`Game Over: ${data.winner} wins!`, ...l]);
       setGameOver(true);
@@ -47,10 +79,12 @@ export const useGame = () => {
     socket.on("legal_moves", (data) => {
       setLegalMoves(data.moves);
     });
+    socket.on("legal_map", (data) => setLegalMap(data));
 
     return () => {
       socket.off("connected");
       socket.off("game_state");
+      socket.off("game_delta");
       socket.off("move_accepted");
       socket.off("move_rejected");
       socket.off("drop_accepted");
@@ -58,11 +92,22 @@ export const useGame = () => {
       socket.off("selection_confirmed");
       socket.off("selection_cancelled");
       socket.off("turn_ended");
+      socket.off("end_turn_rejected");
       socket.off("game_end");
       socket.off("legal_moves");
+      socket.off("legal_map");
     };
   }, []);
 
+  const requestLegalMoves = (piece) => {
+    if (legalMap && legalMap.turn === piece.color) {
+      const table = piece.captured ? legalMap.drops : legalMap.moves;
+      setLegalMoves(table[piece.id] || []);
+    } else {
+      socket.emit("get_legal_moves", { piece_id: piece.id });
+    }
+  };
+
   const handleSelect = (x, y, piece) => {
     if (!gameState || gameOver) return;
     // If a piece is already selected
@@ -102,7 +147,7 @@ export const useGame = () => {
       if (piece && piece.color === gameState.turn) {
         console.log("Selected piece on board:", piece);
         setSelectedPiece(piece);
-        socket.emit("get_legal_moves", { piece_id: piece.id });
+        requestLegalMoves(piece);
       }
     }
   };
@@ -119,7 +164,7 @@ export const useGame = () => {
     } else {
       console.log("Selected piece from hand:", piece);
       setSelectedPiece(piece);
-      socket.emit("get_legal_moves", { piece_id: piece.id });
+      requestLegalMoves(piece);
     }
   };
 
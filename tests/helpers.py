@@ -0,0 +1,59 @@
+"""테스트 공용 포지션 생성기 (모두 시드 고정). 모두 random_playout 위에 만든다."""
+import random
+
+from server.game.core import Game
+from server.game.ai_adapter import get_all_actions, apply_action
+
+
+def random_playout(game, rng, plies, end_turn_rate=1.0, promote=False):
+    """game 에서 무작위 수를 최대 plies 번 둔다.
+    수를 둘 때마다 턴을 넘기기 전에 game 을 낸다 (같은 객체이므로 남겨 둘 것은 복사해야 한다).
+    둘 수가 없거나 king 을 잡으면 멈춘다. promote 면 끝줄에 닿은 폰을 승급시키고 그때마다 한 번 더 낸다.
+    end_turn_rate < 1 이면 그 확률로만 턴을 넘겨 같은 턴에 드롭과 이동이 함께 있는 포지션도 만든다."""
+    for _ in range(plies):
+        actions = get_all_actions(game, game.turn)
+        if not actions:
+            return
+        ok, msg = apply_action(game, rng.choice(actions))
+        yield game
+        if msg == "win":
+            return
+        if promote:
+            for p in [p for p in game.pieces.values() if p.type == 'pawn' and p.pos and p.pos[1] in (0, 7)]:
+                game.promote_pawn(p.id)
+                yield game
+        if end_turn_rate >= 1 or rng.random() < end_turn_rate:
+            game.end_turn()
+
+
+def play_random(game, rng, plies, end_turn_rate=1.0):
+    """game 에서 무작위 수를 최대 plies 번 두고 game 을 돌려준다."""
+    for _ in random_playout(game, rng, plies, end_turn_rate):
+        pass
+    return game
+
+
+def random_game(seed, plies=30):
+    return play_random(Game(), random.Random(seed), plies)
+
+
+def random_games(seed, count=12, max_plies=40, end_turn_rate=0.9):
+    """길이가 0 ~ max_plies 로 다른 대국 count 개. 턴을 넘기지 않은 중간 상태도 섞인다."""
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield play_random(Game(), rng, rng.randrange(0, max_plies), end_turn_rate)
+
+
+def midgame(seed, plies=24):
+    """plies 수를 모두 둔 (king 이 잡히지 않은) 대국."""
+    game = random_game(seed, plies)
+    if any(not n for n in game.king_count.values()):
+        return midgame(seed + 1000, plies)
+    return game
+
+
+def positions(seed, games=6, plies=60):
+    """무작위 대국에서 나온 포지션들을 수마다 낸다 (승급, king 잡기 포함). 같은 객체가 계속 바뀐다."""
+    rng = random.Random(seed)
+    for _ in range(games):
+        yield from random_playout(Game(), rng, plies, promote=True)
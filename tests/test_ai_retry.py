@@ -34,50 +34,232 @@ if 'flask_socketio' not in sys.modules:
     fake_socketio.join_room = lambda *a, **k: None
     sys.modules['flask_socketio'] = fake_socketio
 
-from server.app import maybe_ai_move, AI_COLOR
+from concurrent.futures import Future
+import importlib.util
+import threading
+
+import server.app
+from server.app import maybe_ai_move, schedule_ai_move, cancel_ai_move, AI_COLOR
+from server.ai.worker import search_position
 from server.game.core import Game
+from server.game.ai_adapter import get_all_actions
+from server.game.codec import encode_game
+
+class TestAIMove(unittest.TestCase):
+    @patch('server.app.socketio')
+    @patch('server.app.AI_ROOT_WORKERS', 1)
+    @patch('server.app.AI_MAX_DEPTH', 1)
+    def test_searches_once_and_applies(self, mock_socketio):
+        game = Game()
+        game.make_action(("drop", "w_K0", (4, 7)))
+        with patch('server.app.negamax_best_action', wraps=server.app.negamax_best_action) as search:
+            maybe_ai_move(game)
+        self.assertEqual(search.call_count, 1)
+        self.assertNotIn('excluded_actions', search.call_args.kwargs)
+        self.assertTrue(game.first_turn_done[AI_COLOR])
+        self.assertEqual(game.turn, 'w')
+        # 상태는 델타로만 방송된다
+        events = [c.args[0] for c in mock_socketio.emit.call_args_list]
+        self.assertIn('game_delta', events)
+        self.assertNotIn('game_state', events)
 
-class TestAIRetry(unittest.TestCase):
     @patch('server.app.negamax_best_action')
     @patch('server.app.apply_action')
     @patch('server.app.socketio')
-    def test_retry_on_failure(self, mock_socketio, mock_apply, mock_negamax):
+    def test_rejected_action_is_a_bug(self, mock_socketio, mock_apply, mock_negamax):
         game = Game()
         game.turn = AI_COLOR
-        game.first_turn_done[AI_COLOR] = True # Skip king drop
-        
-        # Determine strict strict order of return values
-        # 1. Invalid Action -> apply_action returns False
-        # 2. Valid Action -> apply_action returns True
-        
-        action_invalid = ("move", "b_p0", (0,1), (0,2))
-        action_valid = ("move", "b_p1", (1,1), (1,2))
-        
-        mock_negamax.side_effect = [action_invalid, action_valid]
-        mock_apply.side_effect = [(False, "invalid move"), (True, "ok")]
-        
-        try:
+        game.first_turn_done[AI_COLOR] = True
+        mock_negamax.return_value = ("move", "b_p0", (0, 1), (0, 2))
+        mock_apply.return_value = (False, "invalid move")
+        with self.assertRaises(RuntimeError):
             maybe_ai_move(game)
-        except Exception as e:
-            self.fail(f"maybe_ai_move raised exception: {e}")
-            
-        # Verify negamax was called twice
-        self.assertEqual(mock_negamax.call_count, 2)
-        
-        # Verify first call had empty excluded_actions (Cannot verify strict equality due to mutable reference in mock)
-        args1, kwargs1 = mock_negamax.call_args_list[0]
-        # self.assertEqual(kwargs1.get('excluded_actions'), []) 
-        
-        # Verify second call had action_invalid in excluded_actions
-        args2, kwargs2 = mock_negamax.call_args_list[1]
-        self.assertEqual(kwargs2.get('excluded_actions'), [action_invalid])
-        
-        # Verify apply_action called twice
-        self.assertEqual(mock_apply.call_count, 2)
-        
-        # Verify game action done (actually end_turn clears it, so check turn flipped)
-        # self.assertTrue(game.action_done[AI_COLOR])
-        self.assertNotEqual(game.turn, AI_COLOR)
+        self.assertEqual(mock_negamax.call_count, 1)
+        self.assertEqual(game.turn, AI_COLOR)
+
+
+class InlinePool:
+    """submit 을 바로 실행하거나(run=True) 대기 중인 Future 만 돌려주는 가짜 풀."""
+    def __init__(self, run=True):
+        self.run = run
+        self.futures = []
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        self.futures.append((future, fn, args, kwargs))
+        if self.run:
+            self.finish(future, fn, args, kwargs)
+        return future
+
+    @staticmethod
+    def finish(future, fn, args, kwargs):
+        if future.set_running_or_notify_cancel():
+            future.set_result(fn(*args, **kwargs))
+
+
+def ai_turn_game():
+    game = Game()
+    game.make_action(("drop", "w_K0", (4, 7)))
+    return server.app.store.add(game)
+
+
+class TestAIPool(unittest.TestCase):
+    def test_worker_searches_serialized_position(self):
+        game = ai_turn_game()
+        action = search_position(encode_game(game), game.id, 1)
+        self.assertIn(action, get_all_actions(game, AI_COLOR))
+
+    @patch('server.app.socketio')
+    @patch('server.app.AI_WORKERS', 1)
+    @patch('server.app.AI_MAX_DEPTH', 1)
+    def test_result_applied_when_ready(self, mock_socketio):
+        game = ai_turn_game()
+        with patch('server.app.get_ai_pool', return_value=InlinePool()):
+            schedule_ai_move(game)
+        self.assertEqual(game.turn, 'w')
+        self.assertTrue(game.first_turn_done[AI_COLOR])
+        self.assertNotIn(game.id, server.app.ai_jobs)
+
+    @patch('server.app.socketio')
+    @patch('server.app.AI_WORKERS', 1)
+    @patch('server.app.AI_MAX_DEPTH', 1)
+    def test_cancelled_or_stale_results_are_dropped(self, mock_socketio):
+        pool = InlinePool(run=False)
+        with patch('server.app.get_ai_pool', return_value=pool):
+            game = ai_turn_game()
+            schedule_ai_move(game)
+            cancel_ai_move(game.id)
+            self.assertTrue(pool.futures[0][0].cancelled())
+
+            schedule_ai_move(game)
+            game.end_turn()     # 탐색 도중 포지션이 바뀜
+            InlinePool.finish(*pool.futures[1])
+        self.assertEqual(game.turn, 'w')
+        self.assertFalse(game.first_turn_done[AI_COLOR])
+        self.assertNotIn(game.id, server.app.ai_jobs)
+
+    @patch('server.app.socketio')
+    @patch('server.app.AI_WORKERS', 1)
+    @patch('server.app.AI_MAX_DEPTH', 1)
+    def test_stale_result_on_ai_turn_is_searched_again(self, mock_socketio):
+        pool = InlinePool(run=False)
+        with patch('server.app.get_ai_pool', return_value=pool):
+            game = ai_turn_game()
+            schedule_ai_move(game)
+            game.end_turn()
+            game.end_turn()     # 탐색 도중 stun 감소 등으로 포지션이 바뀌었지만 다시 AI 차례
+            self.assertEqual(game.turn, AI_COLOR)
+            InlinePool.finish(*pool.futures[0])
+            self.assertEqual(len(pool.futures), 2)
+            self.assertIn(game.id, server.app.ai_jobs)
+            InlinePool.finish(*pool.futures[1])
+        self.assertEqual(game.turn, 'w')
+        self.assertTrue(game.first_turn_done[AI_COLOR])
+        self.assertNotIn(game.id, server.app.ai_jobs)
+
+    @patch('server.app.socketio')
+    @patch('server.app.AI_WORKERS', 1)
+    @patch('server.app.AI_MAX_DEPTH', 1)
+    def test_end_turn_is_rejected_while_ai_is_on_turn(self, mock_socketio):
+        # AI 탐색 중에 사람이 end_turn 을 여러 번 보내도 AI 턴은 유지되고 결과가 적용된다
+        pool = InlinePool(run=False)
+        with patch('server.app.get_ai_pool', return_value=pool):
+            server.app.on_connect('sid-end')
+            game = server.app.get_game_for_player('sid-end')
+            server.app.on_drop_request('sid-end', {'player_color': 'w', 'piece_id': 'w_K0', 'to': [4, 7]})
+            server.app.on_end_turn('sid-end')
+            self.assertEqual(game.turn, AI_COLOR)
+            version = game.version
+            for _ in range(3):
+                server.app.on_end_turn('sid-end')
+                server.app.on_end_turn('sid-end', {'player_color': 'w'})
+            self.assertEqual((game.turn, game.version, len(pool.futures)), (AI_COLOR, version, 1))
+            game.turn = 'w'     # AI 작업이 남아 있으면 차례와 상관없이 거절
+            server.app.on_end_turn('sid-end')
+            game.turn = AI_COLOR
+            InlinePool.finish(*pool.futures[0])
+        rejected = [c.args[1]['reason'] for c in mock_socketio.emit.call_args_list if c.args[0] == 'end_turn_rejected']
+        self.assertEqual(rejected, ['not_your_turn'] * 6 + ['ai_thinking'])
+        self.assertEqual(game.turn, 'w')
+        self.assertTrue(game.first_turn_done[AI_COLOR])
+        self.assertNotIn(game.id, server.app.ai_jobs)
+        server.app.on_disconnect('sid-end')
+
+    @patch('server.app.socketio')
+    @patch('server.app.AI_WORKERS', 1)
+    @patch('server.app.AI_MAX_DEPTH', 1)
+    def test_result_waits_for_the_game_lock(self, mock_socketio):
+        # 풀 콜백 스레드에서 온 결과는 핸들러가 게임을 쓰는 동안 적용되지 않는다
+        pool = InlinePool(run=False)
+        game = ai_turn_game()
+        with patch('server.app.get_ai_pool', return_value=pool):
+            schedule_ai_move(game)
+        with server.app.game_lock:
+            worker = threading.Thread(target=InlinePool.finish, args=pool.futures[0])
+            worker.start()
+            worker.join(0.2)
+            self.assertTrue(worker.is_alive())
+            self.assertEqual(game.turn, AI_COLOR)
+        worker.join()
+        self.assertEqual(game.turn, 'w')
+        self.assertNotIn(game.id, server.app.ai_jobs)
+
+
+class TestGameEviction(unittest.TestCase):
+    def test_evicted_game_drops_ai_state(self):
+        game = ai_turn_game()
+        server.app.ai_tables[game.id] = object()
+        server.app.get_sync(game)
+        server.app.store.evict(game.id, 'lru')
+        self.assertNotIn(game.id, server.app.ai_tables)
+        self.assertNotIn(game.id, server.app.game_syncs)
+        self.assertEqual(server.app.metrics()['ai_jobs'], len(server.app.ai_jobs))
+
+
+class TestHandlers(unittest.TestCase):
+    @patch('server.app.socketio')
+    def test_handlers_take_sid_and_use_transport(self, mock_socketio):
+        server.app.on_connect('sid-1')
+        game = server.app.get_game_for_player('sid-1')
+        server.app.on_drop_request('sid-1', {'player_color': 'w', 'piece_id': 'w_K0', 'to': [4, 7]})
+        server.app.on_get_legal_map('sid-1')
+        events = [(c.args[0], c.kwargs['to']) for c in mock_socketio.emit.call_args_list]
+        self.assertEqual(events, [('connected', 'sid-1'), ('game_state', 'sid-1'), ('drop_accepted', game.id),
+                                  ('game_delta', game.id), ('legal_map', 'sid-1')])
+        server.app.on_disconnect('sid-1')
+        self.assertEqual(server.app.store.players(game.id), set())
+        self.assertLessEqual({'move_request', 'drop_request', 'end_turn', 'stack_add', 'get_legal_moves', 'join_game'},
+                             set(server.app.EVENT_HANDLERS))
+
+
+@unittest.skipUnless(importlib.util.find_spec('socketio'), "python-socketio is not installed")
+class TestAsgiMode(unittest.TestCase):
+    def setUp(self):
+        self.transport = server.app.transport
+
+    def tearDown(self):
+        server.app.transport = self.transport
+
+    def test_handlers_run_on_the_game_thread(self):
+        import asyncio
+        import server.asgi as asgi
+        sent = []
+
+        async def fake_emit(event, data, to=None):
+            sent.append((event, to, threading.current_thread().name))
+
+        async def main():
+            with patch.object(asgi.sio, 'emit', fake_emit), patch.object(asgi.sio, 'enter_room', lambda sid, room: None):
+                await asgi.run_game_task(server.app.on_connect, 'sid-a', None)
+                name = await asgi.run_game_task(lambda: threading.current_thread().name)
+                await asyncio.sleep(0.05)
+            return name
+
+        name = asyncio.run(main())
+        self.assertTrue(name.startswith('game'))
+        self.assertEqual([e for e, _, _ in sent], ['connected', 'game_state'])
+        self.assertTrue(all(not thread.startswith('game') for _, _, thread in sent))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,108 @@
+import random
+import unittest
+
+from server.game.attacks import rook_attacks, bishop_attacks, iter_bits, coords
+from server.game.bitboard import Position, square
+from server.game.core import Game, Rook, Bishop
+from server.game.ai_adapter import get_all_actions, apply_action
+from tests.helpers import random_game
+
+
+class TestPosition(unittest.TestCase):
+    def test_round_trip_keeps_json(self):
+        for seed in range(20):
+            game = random_game(seed)
+            restored = game.to_position().to_game(game_id=game.id, history=game.history)
+            self.assertEqual(restored.to_json(), game.to_json())
+            self.assertEqual(restored.board, game.board)
+
+    def test_moves_match_game(self):
+        for seed in range(20):
+            game = random_game(seed)
+            pos = game.to_position()
+            for pid, p in game.pieces.items():
+                if p.pos is None:
+                    continue
+                expected = sorted(game.get_pseudo_legal_moves(pid))
+                got = sorted(coords(sq) for sq in pos.pseudo_legal_moves(square(*p.pos)))
+                self.assertEqual(got, expected, pid)
+
+    def test_engine_follows_game(self):
+        rng = random.Random(7)
+        game = Game()
+        pos = game.to_position()
+        for _ in range(40):
+            actions = get_all_actions(game, game.turn)
+            action = rng.choice(actions)
+            if action[0] == "move":
+                ok, msg = pos.move(game.turn, square(*action[2]), square(*action[3]))
+            else:
+                ok, msg = pos.drop(game.turn, action[1], square(*action[2]))
+            self.assertEqual((ok, msg), apply_action(game, action))
+            if msg == "win":
+                break
+            pos.end_turn()
+            game.end_turn()
+            self.assertEqual(pos.to_game(game_id=game.id).to_json()["pieces"],
+                             game.to_json()["pieces"])
+
+    def test_promote_matches_game(self):
+        # 스턴 걸린 기물을 잡아 stun 이 남은 폰도 승급하면 stun 0, move_stack 5
+        game = Game()
+        game.make_action(("drop", "w_K0", (4, 7)))
+        game.make_action(("drop", "b_K0", (4, 0)))
+        game.make_action(("drop", "w_P0", (1, 1)))
+        game.make_action(("drop", "b_R0", (0, 0)), end_turn=False)
+        game.stack_add("b_R0")
+        game.end_turn()
+        pos = game.to_position()
+        self.assertEqual(pos.move('w', square(1, 1), square(0, 0)),
+                         apply_action(game, ("move", "w_P0", (1, 1), (0, 0))))
+        self.assertGreater(game.pieces["w_P0"].stun, 0)
+        pos.promote(square(0, 0))
+        game.promote_pawn("w_P0")
+        self.assertEqual(pos.to_game(game_id=game.id).to_json()["pieces"], game.to_json()["pieces"])
+
+    def test_copy_is_independent(self):
+        pos = Position.from_game(Game())
+        clone = pos.copy()
+        clone.drop('w', 'w_K0', square(4, 7))
+        self.assertIsNone(pos.ids[square(4, 7)])
+        self.assertIn('w_K0', pos.hands['w'])
+
+
+def ray_walk(sq, occ, directions):
+    x0, y0 = coords(sq)
+    squares = []
+    for dx, dy in directions:
+        x, y = x0 + dx, y0 + dy
+        while 0 <= x < 8 and 0 <= y < 8:
+            squares.append((x, y))
+            if occ >> square(x, y) & 1:
+                break
+            x += dx; y += dy
+    return sorted(squares)
+
+
+class TestAttackTables(unittest.TestCase):
+    def test_sliders_match_ray_walk(self):
+        rng = random.Random(3)
+        rook_dirs = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+        bishop_dirs = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+        for _ in range(200):
+            occ = rng.getrandbits(64) & rng.getrandbits(64)
+            sq = rng.randrange(64)
+            occ &= ~(1 << sq)
+            grid = [[None] * 8 for _ in range(8)]
+            for s in iter_bits(occ):
+                x, y = coords(s)
+                grid[y][x] = Rook('x', 'b')
+            for cls, table, dirs in ((Rook, rook_attacks, rook_dirs), (Bishop, bishop_attacks, bishop_dirs)):
+                expected = ray_walk(sq, occ, dirs)
+                self.assertEqual(sorted(coords(s) for s in iter_bits(table(sq, occ))), expected)
+                # 점유 칸은 모두 흑 기물이므로 백 기물의 이동 가능 칸은 공격 칸과 같다
+                self.assertEqual(sorted(cls('p', 'w').get_possible_moves(coords(sq), grid)), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
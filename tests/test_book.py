@@ -0,0 +1,96 @@
+import os
+import tempfile
+import unittest
+
+from server.game.core import Game
+from server.game.ai_adapter import get_all_actions, encode_action, decode_action, apply_action
+from server.ai.book import OpeningBook, write_book, load_book, build_book, RECORD, HEADER
+from server.ai.model import negamax_best_action
+
+
+def play(actions):
+    game = Game()
+    for action in actions:
+        ok, _ = apply_action(game, action)
+        assert ok
+        game.end_turn()
+    return game
+
+
+class TestActionCodes(unittest.TestCase):
+    def test_round_trip(self):
+        game = play([("drop", "w_K0", (4, 7)), ("drop", "b_K0", (4, 0)), ("drop", "w_P0", (3, 6))])
+        for color in ('w', 'b'):
+            game.turn = color
+            for action in get_all_actions(game, color):
+                self.assertEqual(decode_action(game, color, encode_action(game, action)), action)
+
+    def test_codes_do_not_depend_on_piece_ids(self):
+        # 같은 포지션에 다른 pid 로 도달해도 같은 키, 같은 코드
+        a = play([("drop", "w_K0", (4, 7)), ("drop", "b_K0", (4, 0)), ("drop", "w_P0", (3, 6))])
+        b = play([("drop", "w_K0", (4, 7)), ("drop", "b_K0", (4, 0)), ("drop", "w_P5", (3, 6))])
+        self.assertEqual(a.hash, b.hash)
+        move = ("move", "b_K0", (4, 0), (4, 1))
+        self.assertEqual(decode_action(b, 'b', encode_action(a, move)), move)
+        code = encode_action(a, ("drop", "b_N0", (2, 2)))
+        self.assertEqual(decode_action(b, 'b', code), ("drop", "b_N0", (2, 2)))
+        self.assertIsNone(decode_action(b, 'b', encode_action(a, ("move", "w_P0", (3, 6), (3, 5)))))
+
+    def test_drop_code_keeps_hand_stun(self):
+        # 같은 종류라도 stack_add 로 stun 이 쌓인 손패 기물은 다른 드롭이다
+        game = play([("drop", "w_K0", (4, 7)), ("drop", "b_K0", (4, 0))])
+        for _ in range(2):          # 드롭 후 stun 은 max(1, stun) 이므로 두 번 쌓는다
+            self.assertTrue(game.stack_add("w_N1")[0])
+            game.action_done = {}
+        plain, stacked = ("drop", "w_N0", (2, 5)), ("drop", "w_N1", (2, 5))
+        self.assertNotEqual(encode_action(game, plain), encode_action(game, stacked))
+        self.assertEqual(decode_action(game, 'w', encode_action(game, plain)), plain)
+        self.assertEqual(decode_action(game, 'w', encode_action(game, stacked)), stacked)
+
+
+class TestOpeningBook(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'book.bin')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_sorted_fixed_size_records(self):
+        count = write_book(self.path, [(5, 1, 10), (3, 2, -4), (5, 7, 30), (5, 1, 20), (9, 3, float('inf'))])
+        self.assertEqual(count, 4)
+        self.assertEqual(os.path.getsize(self.path), HEADER.size + 4 * RECORD.size)
+        book = OpeningBook(self.path)
+        self.assertEqual(book.probe(5), [(7, 30), (1, 20)])
+        self.assertEqual(book.probe(3), [(2, -4)])
+        self.assertEqual(book.probe(9)[0][1], 2 ** 31 - 1)
+        self.assertEqual(book.probe(4), [])
+        book.close()
+
+    def test_missing_or_foreign_file(self):
+        self.assertIsNone(load_book(self.path))
+        with open(self.path, 'wb') as f:
+            f.write(b'not a book at all')
+        with self.assertRaises(ValueError):
+            OpeningBook(self.path)
+
+    def test_search_consults_book_first(self):
+        records = build_book(plies=2, depth=1, keep=2)
+        write_book(self.path, records)
+        book = OpeningBook(self.path)
+        game = Game()
+        first = negamax_best_action(game, 3, book=book)
+        self.assertEqual(encode_action(game, first), book.probe(game.hash)[0][0])
+        # 제외된 수는 건너뛰고 다음 수를 쓴다
+        second = negamax_best_action(game, 3, book=book, excluded_actions={first})
+        self.assertEqual(encode_action(game, second), book.probe(game.hash)[1][0])
+        # 백의 킹 드롭 뒤 흑 차례도 북에 있다
+        apply_action(game, ("drop", "w_K0", (0, 7)))
+        game.end_turn()
+        self.assertEqual(book.probes - book.hits, 0)
+        self.assertIsNotNone(book.choose(game))
+        book.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import mmap
+import os
+import tempfile
+import unittest
+
+from server.game.core import Game
+from server.game.ai_adapter import get_all_actions, apply_action
+from server.game.codec import (encode_game, encode_position, decode_game, PositionView, POSITION_SIZE,
+                               encode_actions, decode_actions, write_records, iter_records)
+from tests.helpers import random_games
+
+
+class TestPositionCodec(unittest.TestCase):
+    def test_round_trip(self):
+        for game in random_games(1):
+            data = encode_game(game)
+            self.assertEqual(len(data), POSITION_SIZE)
+            self.assertEqual(encode_position(game.to_position()), data)
+            restored = decode_game(data, game_id=game.id)
+            self.assertEqual(restored.hash, game.hash)
+            self.assertEqual(restored.to_json()["pieces"], game.to_json()["pieces"])
+            self.assertEqual(restored.hands, game.hands)
+            self.assertEqual((restored.turn, restored.dropped, restored.first_turn_done),
+                             (game.turn, game.dropped, game.first_turn_done))
+            self.assertEqual({c for c, v in restored.action_done.items() if v},
+                             {c for c, v in game.action_done.items() if v})
+
+    def test_view_reads_in_place(self):
+        game = Game()
+        apply_action(game, ("drop", "w_K0", (4, 7)))
+        view = PositionView(bytearray(encode_game(game)))
+        pid, ptype, color, sq, slot, stun, move_stack = view.piece_at(4 + 7 * 8)
+        self.assertEqual((pid, ptype, color, sq, slot), ("w_K0", 'king', 'w', 60, None))
+        self.assertIsNone(view.piece_at(0))
+        self.assertTrue(view.dropped and view.first_turn_done('w') and not view.first_turn_done('b'))
+        with self.assertRaises(ValueError):
+            PositionView(b'XX' + bytes(POSITION_SIZE))
+
+    def test_actions_round_trip(self):
+        for game in random_games(2, 4):
+            actions = get_all_actions(game, game.turn)
+            data = encode_actions(game, actions)
+            self.assertEqual(len(data), 2 * len(actions))
+            self.assertEqual(decode_actions(game, game.turn, data), actions)
+
+    def test_record_file(self):
+        games = list(random_games(3, 5))
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'positions.bin')
+            self.assertEqual(write_records(path, games), 5)
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                views = list(iter_records(mm))
+                hashes = [view.to_position().to_game().hash for view in views]
+                del views
+        self.assertEqual(hashes, [g.hash for g in games])
+
+
+if __name__ == '__main__':
+    unittest.main()
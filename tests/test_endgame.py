@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+
+from server.ai.endgame import (EndgameCache, endgame_positions, is_endgame, load_endgame_cache, read_settings,
+                               HEADER, SLOT)
+from server.ai.model import negamax, negamax_best_action, SearchContext
+from server.ai.tt import EXACT, LOWER
+
+
+class TestEndgameCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'endgame.bin')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_store_probe_and_persistence(self):
+        cache = EndgameCache(self.path, size_mb=1)
+        cache.store_raw(42, 3, EXACT, -125, 0x8123)
+        cache.store_raw(43, 5, LOWER, float('inf'), 7)
+        self.assertEqual(cache.probe_raw(42), (3, EXACT, -125, 0x8123))
+        self.assertIsNone(cache.probe_raw(44))
+        cache.close()
+        # 재시작 후에도 남아 있다
+        cache = EndgameCache(self.path)
+        self.assertEqual(cache.probe_raw(43), (5, LOWER, float('inf'), 7))
+        self.assertEqual(os.path.getsize(self.path), HEADER.size + len(cache) * SLOT.size)
+        cache.close()
+
+    def test_bucket_order_and_depth_preference(self):
+        cache = EndgameCache(self.path, buckets=1)
+        for key in (1, 2, 3, 4):
+            cache.store_raw(key, 2, EXACT, key, 0)
+        before = bytes(cache._mm)
+        self.assertIsNotNone(cache.probe_raw(1))
+        self.assertEqual(bytes(cache._mm), before)     # probe 는 파일에 쓰지 않는다
+        cache.store_raw(1, 2, EXACT, 1, 0)    # 다시 저장하면 맨 앞으로
+        cache.store_raw(5, 2, EXACT, 5, 0)    # 가장 오래전에 저장한 2 가 밀려난다
+        self.assertIsNone(cache.probe_raw(2))
+        for key in (1, 3, 4, 5):
+            self.assertIsNotNone(cache.probe_raw(key))
+        cache.store_raw(5, 1, EXACT, 99, 0)   # 더 얕은 결과로 덮어쓰지 않는다
+        self.assertEqual(cache.probe_raw(5)[2], 5)
+        cache.close()
+
+    def test_torn_slot_is_a_miss(self):
+        cache = EndgameCache(self.path, buckets=1)
+        cache.store_raw(7, 2, EXACT, 10, 0)
+        check, data = SLOT.unpack_from(cache._mm, HEADER.size)
+        SLOT.pack_into(cache._mm, HEADER.size, check, data ^ 1 << 40)   # data 만 바뀐 채로 읽힘
+        self.assertIsNone(cache.probe_raw(7))
+        cache.close()
+
+    def test_shared_between_handles(self):
+        a = EndgameCache(self.path, size_mb=1)
+        b = EndgameCache(self.path)
+        a.store_raw(11, 4, EXACT, 3, 0)
+        self.assertEqual(b.probe_raw(11), (4, EXACT, 3, 0))
+        a.close()
+        b.close()
+
+    def test_eval_settings_are_recorded_and_checked(self):
+        EndgameCache(self.path, size_mb=1, extended_eval=True, drop_width=8).close()
+        self.assertEqual(read_settings(self.path), (True, 8, True))
+        with self.assertRaises(ValueError):
+            EndgameCache(self.path)
+        self.assertIsNone(load_endgame_cache(self.path))      # 서버는 캐시 없이 탐색한다
+        cache = load_endgame_cache(self.path, extended_eval=True, drop_width=8)
+        self.assertIsNotNone(cache)
+        with self.assertRaises(ValueError):                   # 다른 설정의 탐색에는 쓰지 않는다
+            SearchContext(endgame=cache)
+        SearchContext(extended_eval=True, drop_width=8, endgame=cache)
+        cache.close()
+        EndgameCache(self.path, reset=True).close()
+        self.assertEqual(read_settings(self.path), (False, None, True))
+
+    def test_warm_cache_shrinks_later_searches(self):
+        games = list(endgame_positions(3, seed=2))[10:12]
+        self.assertTrue(games and all(is_endgame(g) for g in games))
+        inf = float('inf')
+        nodes = []
+        for _ in range(2):
+            cache = EndgameCache(self.path, size_mb=1)
+            total, results = 0, []
+            for game in games:
+                ctx = SearchContext(endgame=cache)
+                results.append(negamax(game, 3, -inf, inf, game.turn, ctx=ctx)[0])
+                total += ctx.nodes
+            cache.close()
+            nodes.append((total, results))
+        self.assertEqual(nodes[0][1], nodes[1][1])
+        self.assertLess(nodes[1][0], nodes[0][0])
+        # 빈 캐시로 탐색한 결과는 캐시 없이 탐색한 것과 같다 (채워진 캐시는 더 깊은 결과를 줄 수 있음)
+        fresh = EndgameCache(os.path.join(self.dir.name, 'fresh.bin'), size_mb=1)
+        self.assertEqual(negamax_best_action(games[0], 2, endgame=fresh), negamax_best_action(games[0], 2))
+        fresh.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+
+from server.game.core import Game
+from server.game.ai_adapter import get_all_actions
+from server.ai.model import (evaluate_board, evaluate_board_scan, evaluate_board_extended,
+                             evaluate_board_extended_scan, is_game_over)
+from server.game.pst import STASIS_SCORES, stasis_score, hand_score
+from tests.helpers import positions
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class TestIncrementalEvaluation(unittest.TestCase):
+    def test_matches_full_scan(self):
+        finished = 0
+        for game in positions(31):
+            self.assertEqual(evaluate_board(game), evaluate_board_scan(game))
+            self.assertEqual(evaluate_board_extended(game), evaluate_board_extended_scan(game))
+            finished += is_game_over(game)
+        self.assertGreater(finished, 0)
+
+    def test_make_unmake_restores_score(self):
+        for game in positions(32, games=2, plies=25):
+            score, kings, stasis = game.score, dict(game.king_count), game.stasis
+            for action in get_all_actions(game, game.turn)[:40]:
+                undo = game.make_action(action)
+                if undo is None:    # 이번 턴에 이미 드롭함
+                    continue
+                self.assertEqual(evaluate_board(game), evaluate_board_scan(game))
+                self.assertEqual(evaluate_board_extended(game), evaluate_board_extended_scan(game))
+                game.unmake_action(undo)
+                self.assertEqual((game.score, game.king_count, game.stasis), (score, kings, stasis))
+
+    def test_stack_add_and_promotion_update_stasis(self):
+        for game in positions(34, games=2, plies=30):
+            on_board = [p for p in game.pieces.values() if p.pos is not None and p.type != 'king']
+            if on_board and not game.action_done.get(on_board[0].color):
+                saved = game.action_done
+                game.stack_add(on_board[0].id)
+                self.assertEqual(evaluate_board_extended(game), evaluate_board_extended_scan(game))
+                game.action_done = saved
+
+
+class TestExtendedTerms(unittest.TestCase):
+    def test_tables_are_antisymmetric(self):
+        for ptype, rows in STASIS_SCORES['w'].items():
+            self.assertEqual(STASIS_SCORES['b'][ptype], [[-v for v in row] for row in rows])
+
+    def test_terms(self):
+        # 남은 stun 이 많을수록, 움직일 수 없을수록 손해
+        self.assertGreater(stasis_score('w', 'rook', 0, 3), stasis_score('w', 'rook', 2, 1))
+        self.assertLess(stasis_score('w', 'rook', 0, 0), stasis_score('w', 'rook', 0, 1))
+        # 범위 밖 값은 잘라서 쓴다
+        self.assertEqual(stasis_score('w', 'queen', 100, 100), stasis_score('w', 'queen', 15, 31))
+        self.assertEqual(hand_score('b', 'knight', 2), -2 * hand_score('w', 'knight', 1))
+
+    def test_initial_position_is_balanced(self):
+        game = Game()
+        self.assertEqual(game.stasis, 0)
+        self.assertEqual(evaluate_board_extended(game), 0)
+
+
+@unittest.skipUnless(numpy, "numpy not installed")
+class TestBatchEvaluation(unittest.TestCase):
+    def test_agrees_with_evaluate_board(self):
+        from server.ai.batch_eval import (encode_games, encode_positions, encode_records, evaluate_batch,
+                                          evaluate_records)
+        from server.game.codec import encode_game
+        games = [g.fast_clone() for g in positions(33, games=4)]
+        expected = [evaluate_board(g) for g in games]
+        codes, hands, _, _ = encode_games(games)
+        self.assertEqual(list(evaluate_batch(codes, hands)), expected)
+        encoded = encode_positions([g.to_position() for g in games])
+        self.assertTrue((encoded[0] == codes).all() and (encoded[1] == hands).all())
+        self.assertEqual(list(evaluate_batch(*encoded[:2])), expected)
+        records = b''.join(encode_game(g) for g in games)
+        encoded = encode_records(records)
+        self.assertTrue((encoded[0] == codes).all() and (encoded[1] == hands).all())
+        # 레코드에서 바로 (손패 킹만 있는 첫 드롭 전 포지션 포함)
+        self.assertEqual(list(evaluate_records(records)), expected)
+        # (N, 12, 64) 평면 형식
+        planes = codes[:, None, :] == numpy.arange(1, 13)[None, :, None]
+        self.assertEqual(list(evaluate_batch(planes, hands)), expected)
+
+    def test_extended_agrees_with_evaluate_board_extended(self):
+        from server.ai.batch_eval import encode_positions, encode_records, evaluate_batch, evaluate_records
+        from server.game.codec import encode_game
+        games = [g.fast_clone() for g in positions(35, games=4)]
+        expected = [evaluate_board_extended(g) for g in games]
+        codes, hands, stun, move_stack = encode_positions([g.to_position() for g in games], extended=True)
+        self.assertEqual(list(evaluate_batch(codes, hands, stun, move_stack, extended=True)), expected)
+        records = b''.join(encode_game(g) for g in games)
+        codes, hands, stun, move_stack = encode_records(records, extended=True)
+        self.assertEqual(list(evaluate_batch(codes, hands, stun, move_stack, extended=True)), expected)
+        self.assertEqual(list(evaluate_records(records, extended=True)), expected)
+
+if __name__ == '__main__':
+    unittest.main()
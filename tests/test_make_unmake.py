@@ -0,0 +1,144 @@
+import random
+import unittest
+
+from server.game.core import Game
+from server.game.ai_adapter import get_all_actions, apply_action
+from tests.helpers import play_random
+
+
+def snapshot(game):
+    return (game.to_json(), [row[:] for row in game.board], dict(game.occupied),
+            game.turn, game.dropped, dict(game.first_turn_done), dict(game.action_done))
+
+
+class TestMakeUnmake(unittest.TestCase):
+    def test_unmake_restores_every_action(self):
+        rng = random.Random(11)
+        for _ in range(15):
+            game = Game()
+            play_random(game, rng, rng.randrange(1, 40))
+            before = snapshot(game)
+            for action in get_all_actions(game, game.turn):
+                for end_turn in (True, False):
+                    undo = game.make_action(action, end_turn=end_turn)
+                    self.assertIsNotNone(undo, action)
+                    game.unmake_action(undo)
+                    self.assertEqual(snapshot(game), before, action)
+
+    def test_make_matches_apply_and_end_turn(self):
+        rng = random.Random(5)
+        for _ in range(10):
+            game = Game()
+            play_random(game, rng, rng.randrange(1, 30))
+            action = rng.choice(get_all_actions(game, game.turn))
+            expected = game.fast_clone()
+            apply_action(expected, action)
+            expected.end_turn()
+            game.make_action(action)
+            self.assertEqual(game.to_json()["pieces"], expected.to_json()["pieces"])
+            self.assertEqual(game.hands, expected.hands)
+            self.assertEqual(game.turn, expected.turn)
+
+    def test_rejected_action_changes_nothing(self):
+        game = Game()
+        before = snapshot(game)
+        self.assertIsNone(game.make_action(("drop", "w_P0", (0, 0))))  # drop king first
+        self.assertEqual(snapshot(game), before)
+
+
+    def test_fast_clone_is_independent(self):
+        game = Game()
+        play_random(game, random.Random(2), 12)
+        game.drop_piece(game.turn, next(pid for pid in game.hands[game.turn]
+                                        if game.pieces[pid].type != 'pawn'), *next(
+            (x, y) for y in range(8) for x in range(8) if game.pos_empty(x, y)))
+        clone = game.fast_clone()
+        self.assertFalse(hasattr(clone, '__dict__') or hasattr(clone.pieces["w_K0"], '__dict__'))
+        self.assertTrue(clone.dropped)
+        self.assertEqual(clone.to_json()["pieces"], game.to_json()["pieces"])
+        for pid, p in clone.pieces.items():
+            self.assertIsNot(p, game.pieces[pid])
+            self.assertIs(type(p), type(game.pieces[pid]))
+        before = snapshot(game)
+        clone.end_turn()
+        play_random(clone, random.Random(3), 6)
+        self.assertEqual(snapshot(game), before)
+
+
+def cloned_legal_moves(game, pid):
+    # 예전 방식: 후보 칸마다 복제본에서 실제로 두어 보고 자기 킹이 보드에 남는지 확인
+    p = game.pieces[pid]
+    if p.pos is None or p.stun > 0 or p.move_stack < 1:
+        return []
+    moves = []
+    for to in game.get_pseudo_legal_moves(pid):
+        clone = game.fast_clone()
+        ok, _ = clone.move_piece(p.color, pid, p.pos, to)
+        if ok and any(q.type == 'king' and q.color == p.color and q.pos is not None for q in clone.pieces.values()):
+            moves.append(to)
+    return moves
+
+
+class TestLegalMoves(unittest.TestCase):
+    def test_matches_clone_based_check(self):
+        rng = random.Random(3)
+        for _ in range(15):
+            game = Game()
+            play_random(game, rng, rng.randrange(0, 40))
+            for pid, p in game.pieces.items():
+                expected = cloned_legal_moves(game, pid)
+                self.assertEqual(game.get_legal_moves(pid), expected, pid)
+                self.assertEqual(game.get_legal_moves(pid), expected, pid)      # 캐시에서
+                if p.pos is not None:
+                    for to in game.get_pseudo_legal_moves(pid):
+                        self.assertEqual(game.safe_after_move(pid, p.pos, to, p.color), to in expected)
+
+    def test_cache_follows_position(self):
+        game = Game()
+        game.make_action(("drop", "w_K0", (4, 7)))
+        game.make_action(("drop", "b_K0", (4, 0)))
+        before = game.get_legal_moves("w_K0")
+        self.assertEqual(len(before), 5)
+        undo = game.make_action(("drop", "w_R0", (3, 6)))
+        self.assertNotIn((3, 6), game.get_legal_moves("w_K0"))
+        game.unmake_action(undo)
+        self.assertEqual(game.get_legal_moves("w_K0"), before)
+
+    def test_legal_map_matches_generator(self):
+        rng = random.Random(8)
+        for _ in range(10):
+            game = Game()
+            play_random(game, rng, rng.randrange(0, 40))
+            legal = game.legal_map()
+            self.assertIs(game.legal_map(), legal)
+            got = {("move", pid, game.pieces[pid].pos, to) for pid, tos in legal['moves'].items() for to in tos}
+            got |= {("drop", pid, to) for pid, tos in legal['drops'].items() for to in tos}
+            self.assertEqual(got, set(get_all_actions(game, game.turn, dedupe_drops=False)))
+
+    def test_legal_map_invalidated_by_state_changes(self):
+        game = Game()
+        first = game.legal_map()
+        self.assertEqual(set(first['drops']), {"w_K0"})
+        self.assertEqual(first['moves'], {})
+        game.drop_piece('w', "w_K0", 4, 7)
+        self.assertEqual(game.legal_map()['drops'], {})
+        game.end_turn()
+        self.assertEqual(game.legal_map()['turn'], 'b')
+        version = game.version
+        game.stack_add("b_P0")      # 손패 기물: hash 는 그대로지만 version 은 바뀐다
+        self.assertGreater(game.version, version)
+        self.assertIsNot(game.legal_map(), first)
+
+    def test_action_done_invalidates_legal_map(self):
+        game = Game()
+        game.make_action(("drop", "w_K0", (4, 7)))
+        game.make_action(("drop", "b_K0", (4, 0)))
+        self.assertIn("w_K0", game.legal_map()['moves'])
+        version = game.version
+        game.mark_action_done('w')      # 서버가 이동/드롭 뒤에 기록한다
+        self.assertGreater(game.version, version)
+        self.assertEqual(game.legal_map()['moves'], {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,250 @@
+import unittest
+from unittest.mock import patch
+
+from server.game.core import Game
+from server.game.ai_adapter import get_all_actions, apply_action, iter_actions, is_generated, ORDER_RANK
+from server.ai.model import (negamax, negamax_best_action, iterative_deepening, quiescence, evaluate_board,
+                             SearchContext, ordered_actions)
+from server.ai.tt import TranspositionTable, EXACT, LOWER
+from tests.helpers import midgame
+
+
+def reference_actions(game, color):
+    # 단계별 생성기 이전의 방식: 기물별 pseudo-legal 수 + 빈 칸 전체 드롭
+    actions = set()
+    for pid, p in game.pieces.items():
+        if p.color == color and p.pos is not None:
+            actions.update(("move", pid, p.pos, to) for to in game.get_pseudo_legal_moves(pid))
+    for pid in game.hands[color]:
+        p = game.pieces[pid]
+        if not game.first_turn_done[color] and p.type != 'king':
+            continue
+        for y in range(8):
+            for x in range(8):
+                if game.pos_empty(x, y) and not (p.type == 'pawn' and y == (7 if color == 'w' else 0)):
+                    actions.add(("drop", pid, (x, y)))
+    return actions
+
+
+class TestActionGeneration(unittest.TestCase):
+    def test_same_actions_in_stage_order(self):
+        for seed in range(8):
+            game = midgame(seed)
+            actions = get_all_actions(game, game.turn, dedupe_drops=False)
+            self.assertEqual(len(actions), len(set(actions)))
+            self.assertEqual(set(actions), reference_actions(game, game.turn))
+            self.assertTrue(all(is_generated(game, game.turn, a) for a in get_all_actions(game, game.turn)))
+            kinds = ['capture' if a[0] == 'move' and game.board[a[3][1]][a[3][0]] else a[0] for a in actions]
+            self.assertEqual(kinds, sorted(kinds, key=['capture', 'move', 'drop'].index))
+            victims = [ORDER_RANK[game.get_piece_at(*a[3]).type] for a, k in zip(actions, kinds) if k == 'capture']
+            self.assertEqual(victims, sorted(victims, reverse=True))
+
+    def test_generated_actions_are_accepted(self):
+        # 생성기가 내는 수는 apply_action 이 모두 받아들인다 (AI 는 재시도하지 않는다)
+        for seed in range(6):
+            game = midgame(seed)
+            for action in get_all_actions(game, game.turn):
+                clone = game.to_position().to_game(game_id=game.id)
+                self.assertEqual(apply_action(clone, action)[0], True, action)
+
+    def test_turn_flags_limit_generation(self):
+        game = midgame(3)
+        color = game.turn
+        drop = next(a for a in get_all_actions(game, color) if a[0] == "drop")
+        self.assertTrue(apply_action(game, drop)[0])
+        actions = get_all_actions(game, color)
+        self.assertTrue(actions and all(a[0] == "move" for a in actions))
+        self.assertFalse(is_generated(game, color, drop))
+        game.action_done[color] = True
+        self.assertEqual(get_all_actions(game, color), [])
+        self.assertFalse(is_generated(game, color, actions[0]))
+
+    def test_duplicate_drops_removed(self):
+        game = midgame(6, plies=2)      # 양쪽 킹만 놓인 상태, 손에 같은 종류 기물이 여럿
+        full = get_all_actions(game, game.turn, dedupe_drops=False)
+        deduped = get_all_actions(game, game.turn)
+        self.assertLess(len(deduped), len(full) / 2)
+        key = lambda a: (game.pieces[a[1]].type, a[2]) if a[0] == "drop" else a
+        self.assertEqual({key(a) for a in deduped}, {key(a) for a in full})
+        self.assertEqual(len({key(a) for a in deduped}), len(deduped))
+        rejected = [a for a in full if a not in deduped]
+        self.assertFalse(any(is_generated(game, game.turn, a) for a in rejected))
+
+    def test_drop_width_prefers_king_zones(self):
+        game = midgame(6, plies=2)
+        pruned = get_all_actions(game, game.turn, drop_width=5)
+        drops = [a for a in pruned if a[0] == "drop"]
+        squares = {a[2] for a in drops}
+        self.assertEqual(len(squares), 5)
+        kings = [p.pos for p in game.pieces.values() if p.type == 'king' and p.pos]
+        for x, y in squares:
+            self.assertTrue(any(max(abs(x - kx), abs(y - ky)) <= 2 for kx, ky in kings))
+
+    def test_drops_are_generated_lazily(self):
+        game = midgame(4)
+        with patch.object(Game, 'get_piece', side_effect=Game.get_piece, autospec=True) as get_piece:
+            gen = iter_actions(game, game.turn)
+            self.assertEqual(next(gen)[0], "move")
+            self.assertEqual(get_piece.call_count, 0)   # 드롭 단계는 아직 시작하지 않음
+            list(gen)
+            self.assertGreater(get_piece.call_count, 0)
+
+
+class TestTranspositionTable(unittest.TestCase):
+    def test_depth_preferred_and_always_replace(self):
+        tt = TranspositionTable(size_mb=0.001)
+        size = tt.mask + 1
+        a, b, c = 5, 5 + size, 5 + 2 * size      # 같은 버킷
+        tt.store(a, 4, EXACT, 10, "a")
+        tt.store(b, 1, LOWER, 20, "b")
+        self.assertEqual(tt.probe(a), (4, EXACT, 10, "a"))
+        self.assertEqual(tt.probe(b), (1, LOWER, 20, "b"))
+        tt.store(c, 2, EXACT, 30, "c")            # 얕으므로 항상 교체 슬롯으로
+        self.assertIsNotNone(tt.probe(a))
+        self.assertIsNone(tt.probe(b))
+        tt.new_search()
+        tt.store(b, 1, EXACT, 40, "b")            # 이전 세대 항목은 깊이와 무관하게 교체
+        self.assertEqual(tt.probe(b), (1, EXACT, 40, "b"))
+
+    def test_memory_cap(self):
+        self.assertLess(len(TranspositionTable(size_mb=1)), len(TranspositionTable(size_mb=4)))
+
+    def test_same_result_with_table(self):
+        for seed in range(4):
+            game = midgame(seed)
+            inf = float('inf')
+            plain = negamax(game, 3, -inf, inf, game.turn)
+            tt = TranspositionTable(4)
+            self.assertEqual(negamax(game, 3, -inf, inf, game.turn, tt=tt)[0], plain[0])
+            # 다음 턴에 같은 표를 재사용해도 결과는 같다
+            self.assertEqual(negamax_best_action(game, 3, tt=tt), negamax_best_action(game, 3))
+
+
+class TestIterativeDeepening(unittest.TestCase):
+    def test_node_budget_stops_search_and_restores_game(self):
+        game = midgame(3)
+        before = (game.to_json(), game.hash, [row[:] for row in game.board])
+        action, _, ctx = iterative_deepening(game, 6, max_nodes=300)
+        self.assertIsNotNone(action)
+        self.assertLess(ctx.depth, 6)
+        self.assertLessEqual(ctx.nodes, 300 + 1 + len(get_all_actions(game, game.turn)) * 2)
+        self.assertEqual((game.to_json(), game.hash, [row[:] for row in game.board]), before)
+
+    def test_matches_fixed_depth_when_budget_allows(self):
+        for seed in (2, 5, 6):
+            game = midgame(seed)
+            action, _, ctx = iterative_deepening(game, 3, time_ms=60000)
+            self.assertEqual(ctx.depth, 3)
+            self.assertEqual(action, negamax_best_action(game, 3))
+
+    def test_keeps_shallower_move_when_every_deeper_line_loses(self):
+        game = midgame(0)
+        self.assertIsNone(negamax_best_action(game, 2, quiescence=False))
+        action, _, ctx = iterative_deepening(game, 2, quiescence=False)
+        self.assertEqual(ctx.depth, 1)
+        self.assertIsNotNone(action)
+
+    def test_returns_a_move_even_when_every_line_loses(self):
+        game = midgame(0)
+        # quiescence 는 깊이 1 에서도 상대의 킹 잡기를 본다
+        self.assertIsNone(negamax_best_action(game, 1))
+        action, value, ctx = iterative_deepening(game, 2)
+        self.assertEqual((ctx.depth, value), (0, -float('inf')))
+        self.assertTrue(is_generated(game, game.turn, action))
+
+    def test_extended_evaluation_mode(self):
+        for seed in (2, 5):
+            game = midgame(seed)
+            action, _, ctx = iterative_deepening(game, 2, time_ms=60000, extended_eval=True)
+            self.assertEqual(ctx.depth, 2)
+            self.assertEqual(action, negamax_best_action(game, 2, extended_eval=True))
+            self.assertTrue(is_generated(game, game.turn, action))
+
+    def test_zero_time_still_returns_a_move(self):
+        game = midgame(8)
+        self.assertIsNotNone(negamax_best_action(game, 4, time_ms=0))
+
+
+def setup(placements, turn='w'):
+    """[(pid, (x, y), move_stack)] 만 보드에 놓은 포지션 (stun 0, 양쪽 모두 첫 턴 이후)."""
+    game = Game()
+    for pid, pos, move_stack in placements:
+        p = game.pieces[pid]
+        p.pos, p.move_stack, p.stun = pos, move_stack, 0
+        game.board[pos[1]][pos[0]] = pid
+        game.hands[p.color].remove(pid)
+    game.first_turn_done = {'w': True, 'b': True}
+    game.turn = turn
+    return game.to_position().to_game()
+
+
+class TestMoveOrdering(unittest.TestCase):
+    def test_killers_and_history_shrink_tree_without_changing_result(self):
+        inf = float('inf')
+        totals = {}
+        for history in (False, True):
+            results, nodes = [], 0
+            for seed in (2, 9):
+                game = midgame(seed)
+                ctx = SearchContext(history=history)
+                results.append(negamax(game, 3, -inf, inf, game.turn, ctx=ctx))
+                nodes += ctx.nodes
+                self.assertLessEqual(ctx.first_cutoffs, ctx.cutoffs)
+            totals[history] = (results, nodes)
+        self.assertEqual(totals[True][0], totals[False][0])
+        self.assertLess(totals[True][1], totals[False][1])
+
+    def test_killer_slots(self):
+        game = midgame(2)
+        ctx = SearchContext()
+        quiet = [a for a in get_all_actions(game, game.turn)
+                 if a[0] == 'drop' or game.board[a[3][1]][a[3][0]] is None][:3]
+        for action in quiet:
+            ctx.record_cutoff(game, action, 2, 1, True, False)
+        self.assertEqual(ctx.killers_at(1), [quiet[2], quiet[1]])
+        self.assertEqual(ctx.stats()['cutoffs'], 3)
+        # 킬러로 기록된 수는 잡는 수 바로 다음에 나오고, 중복 없이 한 번만 나온다
+        produced = list(ordered_actions(game, game.turn, True, ctx=ctx, ply=1))
+        self.assertEqual(sorted(produced), sorted(get_all_actions(game, game.turn)))
+
+
+class TestQuiescence(unittest.TestCase):
+    def test_sees_recapture_beyond_the_horizon(self):
+        # 퀸이 폰을 잡으면 다른 폰이 되잡는다
+        game = setup([('w_K0', (7, 7), 1), ('b_K0', (7, 0), 1), ('w_Q0', (3, 5), 3),
+                      ('b_P0', (3, 3), 1), ('b_P1', (2, 2), 1)])
+        greedy = ('move', 'w_Q0', (3, 5), (3, 3))
+        self.assertEqual(negamax_best_action(game, 1, quiescence=False), greedy)
+        self.assertNotEqual(negamax_best_action(game, 1), greedy)
+
+    def test_without_captures_is_static_eval(self):
+        game = setup([('w_K0', (7, 7), 1), ('b_K0', (0, 0), 1), ('w_R0', (3, 5), 1)])
+        inf = float('inf')
+        self.assertEqual(quiescence(game, -inf, inf, 'w'), evaluate_board(game))
+        self.assertEqual(quiescence(game, -inf, inf, 'b'), -evaluate_board(game))
+
+    def test_node_cap_and_restores_game(self):
+        inf = float('inf')
+        for seed in range(6):
+            game = midgame(seed, plies=30)
+            before = (game.to_json(), game.hash, game.score, game.stasis)
+            ctx = SearchContext()
+            value = quiescence(game, -inf, inf, game.turn, ctx, budget=[20])
+            self.assertLessEqual(ctx.nodes, 20)
+            self.assertGreaterEqual(value, evaluate_board(game) * (1 if game.turn == 'w' else -1))
+            self.assertEqual((game.to_json(), game.hash, game.score, game.stasis), before)
+
+
+class TestParallelRoot(unittest.TestCase):
+    def test_matches_single_threaded_choice(self):
+        from server.ai.parallel import parallel_root_search
+        for seed in (2, 5, 6, 7):
+            game = midgame(seed)
+            inf = float('inf')
+            value, action = negamax(game, 3, -inf, inf, game.turn)
+            self.assertEqual(parallel_root_search(game, 3, workers=3), (action, value))
+        self.assertEqual(negamax_best_action(game, 2, workers=2), negamax_best_action(game, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
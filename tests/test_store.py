@@ -0,0 +1,80 @@
+import sys
+import unittest
+
+from server.game.core import Game
+from server.game.store import GameStore, estimate_bytes
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestGameStore(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.evicted = []
+        self.store = GameStore(ttl=100, abandoned_ttl=10, max_games=3, sweep_interval=0,
+                               on_evict=self.evicted.append, clock=self.clock)
+
+    def test_abandoned_games_expire_quickly(self):
+        a = self.store.add(Game())
+        b = self.store.add(Game())
+        self.store.join('s1', a.id)
+        self.store.join('s2', b.id)
+        self.store.leave('s2')
+        self.clock.now = 11
+        self.assertEqual(self.store.sweep(), [b.id])
+        self.assertIs(self.store.game_for('s1'), a)
+        self.assertEqual(self.evicted, [b.id])
+        self.assertEqual(self.store.metrics()['evicted']['abandoned'], 1)
+
+    def test_idle_ttl_and_touch(self):
+        a = self.store.add(Game())
+        b = self.store.add(Game())
+        self.store.join('s1', a.id)
+        self.store.join('s2', b.id)
+        self.clock.now = 60
+        self.store.game_for('s1')       # 요청이 오면 다시 살아난다
+        self.clock.now = 101
+        self.assertEqual(self.store.sweep(), [b.id])
+        self.assertIsNone(self.store.game_for('s2'))
+        self.assertIn(a.id, self.store)
+
+    def test_lru_cap(self):
+        games = [self.store.add(Game()) for _ in range(3)]
+        for game in games:
+            self.store.join(game.id + '-sid', game.id)
+        self.store.get(games[0].id)
+        self.store.add(Game())
+        self.assertEqual(self.evicted, [games[1].id])
+        self.assertIsNone(self.store.game_for(games[1].id + '-sid'))
+        self.assertEqual(len(self.store), 3)
+
+    def test_rejoin_and_metrics(self):
+        a = self.store.add(Game())
+        b = self.store.add(Game())
+        self.store.join('s1', a.id)
+        self.store.join('s1', b.id)     # 다른 게임으로 옮기면 이전 게임에서 빠진다
+        self.assertEqual(self.store.players(a.id), set())
+        self.assertEqual(self.store.players(b.id), {'s1'})
+        m = self.store.metrics(detail=True)
+        self.assertEqual((m['games'], m['players'], m['abandoned']), (2, 1, 1))
+        self.assertEqual(m['per_game'][a.id], estimate_bytes(a))
+        self.assertGreater(m['game_bytes'], 2 * len(a.pieces) * 50)
+
+    def test_estimate_walks_inherited_slots(self):
+        # King 의 필드(pos 등)는 Piece.__slots__ 에 있다
+        game = Game()
+        game.drop_piece('w', 'w_K0', 4, 7)
+        before = estimate_bytes(game)
+        bigger = (4, 7, 0, 0, 0, 0, 0, 0)
+        game.pieces['w_K0'].pos = bigger
+        self.assertGreaterEqual(estimate_bytes(game) - before, sys.getsizeof(bigger) - sys.getsizeof((4, 7)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import json
+import random
+import unittest
+
+from server.game.core import Game
+from server.game.ai_adapter import get_all_actions, apply_action
+from server.game.sync import StateSync, apply_delta
+
+
+def wire(obj):
+    # 소켓으로 보낼 때처럼 JSON 으로 왕복 (튜플 -> 리스트)
+    return json.loads(json.dumps(obj))
+
+
+class TestStateSync(unittest.TestCase):
+    def test_deltas_rebuild_full_state(self):
+        rng = random.Random(4)
+        game = Game()
+        sync = StateSync(game)
+        state = wire(sync.snapshot())
+        for _ in range(60):
+            actions = get_all_actions(game, game.turn)
+            ok, msg = apply_action(game, rng.choice(actions))
+            delta = wire(sync.delta())
+            self.assertEqual(delta['seq'], state['seq'] + 1)
+            self.assertLessEqual(len(delta['history']), 1)
+            state = apply_delta(state, delta)
+            if msg == "win":
+                break
+            game.end_turn()
+            state = apply_delta(state, wire(sync.delta()))
+            self.assertEqual({k: state[k] for k in ('turn', 'pieces', 'hands', 'history')},
+                             {k: v for k, v in wire(game.to_json()).items() if k != 'id'})
+
+    def test_delta_carries_only_changes(self):
+        game = Game()
+        sync = StateSync(game)
+        game.drop_piece('w', "w_K0", 4, 7)
+        delta = sync.delta()
+        self.assertEqual(set(delta['pieces']), {"w_K0"})
+        self.assertEqual(set(delta['hands']), {'w'})
+        self.assertEqual(delta['history_from'], 0)
+        empty = sync.delta()
+        self.assertEqual((empty['pieces'], empty['hands'], empty['history']), ({}, {}, []))
+        self.assertEqual(empty['history_from'], 1)
+
+    def test_snapshot_newer_than_baseline(self):
+        # 방송되지 않은 변경이 있는 상태의 스냅샷 위에도 다음 델타를 그대로 적용할 수 있다
+        game = Game()
+        sync = StateSync(game)
+        game.drop_piece('w', "w_K0", 4, 7)
+        state = wire(sync.snapshot())
+        game.end_turn()
+        game.drop_piece('b', "b_K0", 4, 0)
+        state = apply_delta(state, wire(sync.delta()))
+        self.assertEqual(state['pieces'], wire(game.to_json())['pieces'])
+        self.assertEqual(state['history'], game.history)
+
+
+if __name__ == '__main__':
+    unittest.main()
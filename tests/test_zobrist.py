@@ -0,0 +1,91 @@
+import random
+import unittest
+
+from server.game.core import Game
+from server.game.ai_adapter import get_all_actions, apply_action
+from server.game.zobrist import compute_hash
+
+
+class TestZobrist(unittest.TestCase):
+    def test_incremental_matches_full_recompute(self):
+        rng = random.Random(21)
+        for _ in range(10):
+            game = Game()
+            for _ in range(60):
+                actions = get_all_actions(game, game.turn)
+                if not actions:
+                    break
+                ok, msg = apply_action(game, rng.choice(actions))
+                self.assertEqual(game.hash, compute_hash(game))
+                if msg == "win":
+                    break
+                if rng.random() < 0.2:
+                    on_board = [p for p in game.pieces.values()
+                                if p.pos is not None and p.type == 'pawn' and p.color == game.turn]
+                    if on_board:
+                        game.promote_pawn(rng.choice(on_board).id)
+                        self.assertEqual(game.hash, compute_hash(game))
+                game.end_turn()
+                self.assertEqual(game.hash, compute_hash(game))
+                pid = rng.choice([pid for pid, p in game.pieces.items() if p.type != 'king'])
+                if rng.random() < 0.1:
+                    game.stack_add(pid)
+                    self.assertEqual(game.hash, compute_hash(game))
+
+    def test_unmake_restores_hash_and_transpositions_match(self):
+        game = Game()
+        start = game.hash
+        undo = game.make_action(("drop", "w_K0", (4, 7)))
+        self.assertNotEqual(game.hash, start)
+        game.unmake_action(undo)
+        self.assertEqual(game.hash, start)
+
+        a, b = Game(), Game()
+        for g, pid in ((a, "w_K0"), (b, "w_K0")):
+            g.make_action(("drop", pid, (4, 7)))
+            g.make_action(("drop", "b_K0", (4, 0)))
+        a.make_action(("drop", "w_P0", (0, 6)))
+        b.make_action(("drop", "w_P5", (0, 6)))
+        # 같은 종류의 다른 폰을 같은 칸에 놓으면 같은 포지션이다
+        self.assertEqual(a.hash, b.hash)
+        self.assertEqual(a.hash, compute_hash(a))
+
+    def test_hand_stun_changes_hash(self):
+        # 손패 룩의 stun 2 와 0 은 드롭 후 stun 이 2 와 1 로 다르므로 다른 포지션이다
+        a, b = Game(), Game()
+        for g in (a, b):
+            g.make_action(("drop", "w_K0", (4, 7)))
+            g.make_action(("drop", "b_K0", (4, 0)))
+        a.stack_add("w_R0")
+        # stun 1 은 0 과 같이 1 로 드롭되므로 키도 같다
+        self.assertEqual(a.hash, b.hash)
+        for g in (a, b):
+            g.end_turn(); g.end_turn()
+        a.stack_add("w_R0")
+        self.assertEqual(a.pieces["w_R0"].stun, 2)
+        self.assertEqual(a.hash, compute_hash(a))
+        self.assertNotEqual(a.hash, b.hash)
+
+        # 어느 룩에 쌓였는지는 상관없다
+        c, d = Game(), Game()
+        for g, pid in ((c, "w_R0"), (d, "w_R1")):
+            g.make_action(("drop", "w_K0", (4, 7)))
+            g.make_action(("drop", "b_K0", (4, 0)))
+            for _ in range(2):
+                g.stack_add(pid)
+                g.end_turn(); g.end_turn()
+        self.assertEqual(c.hash, d.hash)
+        self.assertEqual(c.hash, compute_hash(c))
+
+        undo = c.make_action(("drop", "w_R0", (0, 4)), end_turn=False)
+        self.assertEqual(c.pieces["w_R0"].stun, 2)
+        self.assertEqual(c.hash, compute_hash(c))
+        c.unmake_action(undo)
+        self.assertEqual(c.hash, d.hash)
+        d.make_action(("drop", "w_R1", (0, 4)))
+        c.make_action(("drop", "w_R0", (0, 4)))
+        self.assertEqual(c.hash, d.hash)
+
+
+if __name__ == '__main__':
+    unittest.main()